@@ -4,6 +4,16 @@
   IFC -> FRAG converter script
   Usage: node ifc2frag.cjs <input.ifc> <output.frag>
   Self-test: node ifc2frag.cjs --self-test
+  Daemon: node ifc2frag.cjs --serve
+
+  In --serve mode the process stays up and answers newline-delimited JSON-RPC
+  on stdin/stdout, so the fragments library and web-ifc WASM are loaded once:
+    -> {"id": 1, "method": "convert", "params": {"input": "...", "output": "..."}}
+    <- {"id": 1, "result": {"ok": true, "output": "...", "fallback": false, "ms": 120, "rss": 123456, "jobs": 1}}
+    -> {"id": 2, "method": "ping"}
+    <- {"id": 2, "result": {"ok": true, "rss": 123456, "jobs": 1, "hasFragments": true}}
+  Errors are returned as {"id": N, "error": {"message": "..."}}. The first line
+  written is {"ready": true, ...} once warm-up finished. Diagnostics go to stderr.
 
   This script tries to use the official That Open Fragments library first.
   If it's not available or conversion fails, it falls back to a placeholder copy
@@ -12,17 +22,54 @@
 
 const fs = require('fs');
 const path = require('path');
+const readline = require('readline');
+const util = require('util');
+const { pipeline } = require('stream/promises');
+
+// Bump when the conversion output changes; cached FRAGs are keyed by it
+const CONVERTER_VERSION = '2';
+
+function fragmentsVersion() {
+  const candidates = [];
+  try {
+    candidates.push(require.resolve('@thatopen/fragments/package.json', { paths: [process.cwd(), __dirname] }));
+  } catch {}
+  for (const base of [process.cwd(), path.join(__dirname, '..')]) {
+    candidates.push(path.join(base, 'node_modules', '@thatopen', 'fragments', 'package.json'));
+  }
+  for (const pkgPath of candidates) {
+    try {
+      return JSON.parse(fs.readFileSync(pkgPath, 'utf8')).version || null;
+    } catch {}
+  }
+  return null;
+}
+
+// Loaded once per process; the daemon reuses it for every job
+let fragmentsModule = null;
+async function loadFragments() {
+  if (!fragmentsModule) {
+    fragmentsModule = import('@thatopen/fragments').catch((e) => {
+      fragmentsModule = null;
+      throw e;
+    });
+  }
+  return fragmentsModule;
+}
 
 async function selfTest() {
   try {
     let hasFragments = false;
     try {
-      await import('@thatopen/fragments');
+      await loadFragments();
       hasFragments = true;
     } catch {}
     const nodeVersion = process.version;
     const scriptExists = fs.existsSync(__filename);
-    const result = { ok: true, nodeVersion, scriptExists, hasFragments };
+    const result = {
+      ok: true, nodeVersion, scriptExists, hasFragments,
+      converterVersion: CONVERTER_VERSION, fragmentsVersion: fragmentsVersion(),
+    };
     console.log(JSON.stringify(result));
     process.exit(0);
   } catch (e) {
@@ -34,7 +81,7 @@ async function selfTest() {
 async function convertWithFragments(inputPath, outputPath) {
   // Best-effort attempt; API shape may change between versions
   try {
-    const mod = await import('@thatopen/fragments');
+    const mod = await loadFragments();
     // Try to find serializer/create API
     const Serializer = mod.Serializer || mod.FragmentsSerializer || mod.Fragments?.Serializer || null;
     const Fragments = mod.Fragments || null;
@@ -69,37 +116,105 @@ async function convertWithFragments(inputPath, outputPath) {
 }
 
 async function fallbackCopy(inputPath, outputPath) {
-  const header = Buffer.from('// FRAG PLACEHOLDER\n');
-  const ifc = fs.readFileSync(inputPath);
+  // Streamed so large models are never buffered whole in the daemon
   fs.mkdirSync(path.dirname(outputPath), { recursive: true });
-  fs.writeFileSync(outputPath, Buffer.concat([header, ifc]));
+  const out = fs.createWriteStream(outputPath);
+  out.write('// FRAG PLACEHOLDER\n');
+  await pipeline(fs.createReadStream(inputPath), out);
+}
+
+async function convertFile(inputPath, outputPath) {
+  if (!fs.existsSync(inputPath)) {
+    const err = new Error(`INPUT_NOT_FOUND ${inputPath}`);
+    err.code = 'INPUT_NOT_FOUND';
+    throw err;
+  }
+  // Try official converter first
+  const ok = await convertWithFragments(inputPath, outputPath);
+  if (!ok) {
+    await fallbackCopy(inputPath, outputPath);
+  }
+  return { ok: true, input: inputPath, output: outputPath, fallback: !ok };
 }
 
 async function convert(inputPath, outputPath) {
   try {
-    if (!fs.existsSync(inputPath)) {
+    const result = await convertFile(inputPath, outputPath);
+    console.log(JSON.stringify(result));
+    process.exit(0);
+  } catch (e) {
+    if (e && e.code === 'INPUT_NOT_FOUND') {
       console.error('INPUT_NOT_FOUND', inputPath);
       process.exit(2);
     }
-    // Try official converter first
-    const ok = await convertWithFragments(inputPath, outputPath);
-    if (!ok) {
-      await fallbackCopy(inputPath, outputPath);
-    }
-    console.log(JSON.stringify({ ok: true, input: inputPath, output: outputPath }));
-    process.exit(0);
-  } catch (e) {
     console.error('CONVERT_FAILED', e && e.stack || String(e));
     process.exit(3);
   }
 }
 
+async function serve() {
+  // stdout carries the protocol: anything else logging there would corrupt it
+  const toStderr = (...args) => process.stderr.write(util.format(...args) + '\n');
+  console.log = toStderr;
+  console.info = toStderr;
+  console.debug = toStderr;
+  let jobs = 0;
+  let hasFragments = false;
+  try {
+    await loadFragments();
+    hasFragments = true;
+  } catch (e) {
+    console.error('FRAGMENTS_IMPORT_FAILED', e && e.message || String(e));
+  }
+  const reply = (msg) => process.stdout.write(JSON.stringify(msg) + '\n');
+  reply({
+    ready: true, pid: process.pid, nodeVersion: process.version, hasFragments,
+    converterVersion: CONVERTER_VERSION, fragmentsVersion: fragmentsVersion(),
+  });
+
+  // Requests are handled one at a time, in arrival order
+  const rl = readline.createInterface({ input: process.stdin, terminal: false });
+  for await (const line of rl) {
+    if (!line.trim()) continue;
+    let req;
+    try {
+      req = JSON.parse(line);
+    } catch (e) {
+      reply({ id: null, error: { message: 'invalid JSON request' } });
+      continue;
+    }
+    const { id = null, method, params = {} } = req;
+    try {
+      if (method === 'ping') {
+        reply({ id, result: { ok: true, rss: process.memoryUsage().rss, jobs, hasFragments } });
+      } else if (method === 'convert') {
+        const started = Date.now();
+        const result = await convertFile(params.input, params.output);
+        jobs += 1;
+        reply({ id, result: { ...result, ms: Date.now() - started, rss: process.memoryUsage().rss, jobs } });
+      } else if (method === 'shutdown') {
+        reply({ id, result: { ok: true } });
+        break;
+      } else {
+        reply({ id, error: { message: `unknown method ${method}` } });
+      }
+    } catch (e) {
+      reply({ id, error: { message: e && e.message || String(e), code: e && e.code || null } });
+    }
+  }
+  process.exit(0);
+}
+
 (async () => {
   const args = process.argv.slice(2);
   if (args.length === 1 && args[0] === '--self-test') {
     await selfTest();
     return;
   }
+  if (args.length === 1 && args[0] === '--serve') {
+    await serve();
+    return;
+  }
   if (args.length < 2) {
     console.error('USAGE: node ifc2frag.cjs <input.ifc> <output.frag>');
     process.exit(64);
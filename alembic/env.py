@@ -10,6 +10,13 @@ from app.database import Base
 from app.models import user as _user_model  # noqa: F401
 from app.models import password_reset as _pwd_model  # noqa: F401
 from app.models import file as _file_model  # noqa: F401
+from app.models import blob as _blob_model  # noqa: F401
+from app.models import upload_session as _upload_session_model  # noqa: F401
+from app.models import conversion_job as _conversion_job_model  # noqa: F401
+from app.models import conversion_cache as _conversion_cache_model  # noqa: F401
+from app.models import ifc_revision as _ifc_revision_model  # noqa: F401
+from app.models import ifc_metadata as _ifc_metadata_model  # noqa: F401
+from app.models import ifc_element as _ifc_element_model  # noqa: F401
 
 from alembic import context
 
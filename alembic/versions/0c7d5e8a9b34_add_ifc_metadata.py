@@ -0,0 +1,49 @@
+"""Add ifc_metadata table
+
+Revision ID: 0c7d5e8a9b34
+Revises: e6f1a2b3c4d5
+Create Date: 2025-10-12 09:41:27.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c7d5e8a9b34'
+down_revision: Union[str, None] = 'e6f1a2b3c4d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ifc_metadata',
+        sa.Column('file_id', sa.Integer(), nullable=False),
+        sa.Column('ifc_schema', sa.String(length=64), nullable=True),
+        sa.Column('view_definition', sa.String(length=255), nullable=True),
+        sa.Column('file_name', sa.String(length=255), nullable=True),
+        sa.Column('file_timestamp', sa.String(length=64), nullable=True),
+        sa.Column('author', sa.String(length=255), nullable=True),
+        sa.Column('organization', sa.String(length=255), nullable=True),
+        sa.Column('preprocessor', sa.String(length=255), nullable=True),
+        sa.Column('authoring_tool', sa.String(length=255), nullable=True),
+        sa.Column('project_name', sa.String(length=255), nullable=True),
+        sa.Column('entity_count', sa.Integer(), nullable=False),
+        sa.Column('entity_histogram', sa.JSON(), nullable=False),
+        sa.Column('storeys', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('file_id')
+    )
+    op.create_index(op.f('ix_ifc_metadata_ifc_schema'), 'ifc_metadata', ['ifc_schema'], unique=False)
+    op.create_index(op.f('ix_ifc_metadata_project_name'), 'ifc_metadata', ['project_name'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_ifc_metadata_project_name'), table_name='ifc_metadata')
+    op.drop_index(op.f('ix_ifc_metadata_ifc_schema'), table_name='ifc_metadata')
+    op.drop_table('ifc_metadata')
@@ -0,0 +1,44 @@
+"""Add blobs table for content-addressed storage
+
+Revision ID: 3c1f0d9a7b21
+Revises: b8d7da233dd7
+Create Date: 2025-10-02 11:40:12.417305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f0d9a7b21'
+down_revision: Union[str, None] = 'b8d7da233dd7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'blobs',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('storage_path', sa.String(length=500), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('sha256')
+    )
+    with op.batch_alter_table('files') as batch_op:
+        batch_op.add_column(sa.Column('blob_sha256', sa.String(length=64), nullable=True))
+        batch_op.create_foreign_key('fk_files_blob_sha256_blobs', 'blobs', ['blob_sha256'], ['sha256'])
+        batch_op.create_index(batch_op.f('ix_files_blob_sha256'), ['blob_sha256'], unique=False)
+        batch_op.create_index('ix_files_user_id_filename', ['user_id', 'filename'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('files') as batch_op:
+        batch_op.drop_index('ix_files_user_id_filename')
+        batch_op.drop_index(batch_op.f('ix_files_blob_sha256'))
+        batch_op.drop_constraint('fk_files_blob_sha256_blobs', type_='foreignkey')
+        batch_op.drop_column('blob_sha256')
+    op.drop_table('blobs')
@@ -0,0 +1,35 @@
+"""Allow one queued conversion job per file
+
+Revision ID: 4d2b7e9c1a58
+Revises: c3e8a1f4b706
+Create Date: 2025-10-16 09:41:27.310598
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4d2b7e9c1a58'
+down_revision: Union[str, None] = 'c3e8a1f4b706'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Keep the oldest of any duplicates queued before the index existed
+    op.execute(
+        "DELETE FROM conversion_jobs WHERE status = 'queued' AND id NOT IN ("
+        "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM conversion_jobs "
+        "WHERE status = 'queued' GROUP BY user_id, filename) AS oldest)"
+    )
+    op.create_index(
+        'uq_conversion_jobs_queued_file', 'conversion_jobs', ['user_id', 'filename'], unique=True,
+        postgresql_where=sa.text("status = 'queued'"), sqlite_where=sa.text("status = 'queued'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_conversion_jobs_queued_file', table_name='conversion_jobs')
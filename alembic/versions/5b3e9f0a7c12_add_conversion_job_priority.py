@@ -0,0 +1,32 @@
+"""Add conversion_jobs.priority and wait_ms
+
+Revision ID: 5b3e9f0a7c12
+Revises: d24b6c8e1f90
+Create Date: 2025-10-10 16:20:44.918302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b3e9f0a7c12'
+down_revision: Union[str, None] = 'd24b6c8e1f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('conversion_jobs') as batch_op:
+        batch_op.add_column(sa.Column('priority', sa.String(length=20), nullable=False, server_default='batch'))
+        batch_op.add_column(sa.Column('wait_ms', sa.Integer(), nullable=True))
+    op.create_index('ix_conversion_jobs_user_id_filename_status', 'conversion_jobs', ['user_id', 'filename', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversion_jobs_user_id_filename_status', table_name='conversion_jobs')
+    with op.batch_alter_table('conversion_jobs') as batch_op:
+        batch_op.drop_column('wait_ms')
+        batch_op.drop_column('priority')
@@ -0,0 +1,70 @@
+"""Add IFC element index tables
+
+Revision ID: 9a4f2c6d8e15
+Revises: 0c7d5e8a9b34
+Create Date: 2025-10-13 15:22:08.740613
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4f2c6d8e15'
+down_revision: Union[str, None] = '0c7d5e8a9b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ifc_element_indexes',
+        sa.Column('file_id', sa.Integer(), nullable=False),
+        sa.Column('content_sha256', sa.String(length=64), nullable=False),
+        sa.Column('element_count', sa.Integer(), nullable=False),
+        sa.Column('property_count', sa.Integer(), nullable=False),
+        sa.Column('built_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('file_id')
+    )
+    op.create_table(
+        'ifc_elements',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('file_id', sa.Integer(), nullable=False),
+        sa.Column('global_id', sa.String(length=22), nullable=False),
+        sa.Column('ifc_class', sa.String(length=64), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=True),
+        sa.Column('storey_id', sa.String(length=22), nullable=True),
+        sa.Column('storey', sa.String(length=255), nullable=True),
+        sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('file_id', 'global_id', name='uq_ifc_elements_file_id_global_id')
+    )
+    op.create_index('ix_ifc_elements_file_id_ifc_class', 'ifc_elements', ['file_id', 'ifc_class'], unique=False)
+    op.create_index('ix_ifc_elements_file_id_storey', 'ifc_elements', ['file_id', 'storey'], unique=False)
+    op.create_table(
+        'ifc_element_properties',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('element_id', sa.Integer(), nullable=False),
+        sa.Column('file_id', sa.Integer(), nullable=False),
+        sa.Column('pset', sa.String(length=255), nullable=False),
+        sa.Column('name', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.String(length=500), nullable=False),
+        sa.ForeignKeyConstraint(['element_id'], ['ifc_elements.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['file_id'], ['files.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ifc_element_properties_element_id'), 'ifc_element_properties', ['element_id'], unique=False)
+    op.create_index('ix_ifc_element_properties_lookup', 'ifc_element_properties', ['file_id', 'name', 'value', 'pset'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ifc_element_properties_lookup', table_name='ifc_element_properties')
+    op.drop_index(op.f('ix_ifc_element_properties_element_id'), table_name='ifc_element_properties')
+    op.drop_table('ifc_element_properties')
+    op.drop_index('ix_ifc_elements_file_id_storey', table_name='ifc_elements')
+    op.drop_index('ix_ifc_elements_file_id_ifc_class', table_name='ifc_elements')
+    op.drop_table('ifc_elements')
+    op.drop_table('ifc_element_indexes')
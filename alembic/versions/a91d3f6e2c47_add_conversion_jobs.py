@@ -0,0 +1,53 @@
+"""Add conversion_jobs queue table
+
+Revision ID: a91d3f6e2c47
+Revises: 7e4a92c1d5f3
+Create Date: 2025-10-09 14:02:31.550918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a91d3f6e2c47'
+down_revision: Union[str, None] = '7e4a92c1d5f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversion_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('output_filename', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=False),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('input_size', sa.BigInteger(), nullable=True),
+        sa.Column('output_size', sa.BigInteger(), nullable=True),
+        sa.Column('duration_ms', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_conversion_jobs_id'), 'conversion_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_conversion_jobs_user_id'), 'conversion_jobs', ['user_id'], unique=False)
+    op.create_index('ix_conversion_jobs_status_available_at', 'conversion_jobs', ['status', 'available_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_conversion_jobs_status_available_at', table_name='conversion_jobs')
+    op.drop_index(op.f('ix_conversion_jobs_user_id'), table_name='conversion_jobs')
+    op.drop_index(op.f('ix_conversion_jobs_id'), table_name='conversion_jobs')
+    op.drop_table('conversion_jobs')
@@ -0,0 +1,34 @@
+"""Add element bounding boxes and index version
+
+Revision ID: c3e8a1f4b706
+Revises: 9a4f2c6d8e15
+Create Date: 2025-10-14 11:08:53.226190
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8a1f4b706'
+down_revision: Union[str, None] = '9a4f2c6d8e15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('ifc_elements') as batch_op:
+        for column in ('min_x', 'min_y', 'min_z', 'max_x', 'max_y', 'max_z'):
+            batch_op.add_column(sa.Column(column, sa.Float(), nullable=True))
+    with op.batch_alter_table('ifc_element_indexes') as batch_op:
+        batch_op.add_column(sa.Column('index_version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('ifc_element_indexes') as batch_op:
+        batch_op.drop_column('index_version')
+    with op.batch_alter_table('ifc_elements') as batch_op:
+        for column in ('max_z', 'max_y', 'max_x', 'min_z', 'min_y', 'min_x'):
+            batch_op.drop_column(column)
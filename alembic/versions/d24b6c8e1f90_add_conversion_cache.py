@@ -0,0 +1,45 @@
+"""Add conversion_cache table and conversion_jobs.cache_hit
+
+Revision ID: d24b6c8e1f90
+Revises: a91d3f6e2c47
+Create Date: 2025-10-10 11:47:05.203664
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd24b6c8e1f90'
+down_revision: Union[str, None] = 'a91d3f6e2c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'conversion_cache',
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('input_sha256', sa.String(length=64), nullable=False),
+        sa.Column('converter_version', sa.String(length=100), nullable=False),
+        sa.Column('options', sa.String(length=500), nullable=False),
+        sa.Column('frag_sha256', sa.String(length=64), nullable=False),
+        sa.Column('frag_size', sa.BigInteger(), nullable=False),
+        sa.Column('hits', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['frag_sha256'], ['blobs.sha256'], ),
+        sa.PrimaryKeyConstraint('cache_key')
+    )
+    op.create_index(op.f('ix_conversion_cache_input_sha256'), 'conversion_cache', ['input_sha256'], unique=False)
+    with op.batch_alter_table('conversion_jobs') as batch_op:
+        batch_op.add_column(sa.Column('cache_hit', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('conversion_jobs') as batch_op:
+        batch_op.drop_column('cache_hit')
+    op.drop_index(op.f('ix_conversion_cache_input_sha256'), table_name='conversion_cache')
+    op.drop_table('conversion_cache')
@@ -0,0 +1,49 @@
+"""Add ifc_revisions table
+
+Revision ID: e6f1a2b3c4d5
+Revises: 5b3e9f0a7c12
+Create Date: 2025-10-11 10:05:12.604417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f1a2b3c4d5'
+down_revision: Union[str, None] = '5b3e9f0a7c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'ifc_revisions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('input_sha256', sa.String(length=64), nullable=False),
+        sa.Column('content_sha256', sa.String(length=64), nullable=False),
+        sa.Column('manifest_path', sa.String(length=500), nullable=False),
+        sa.Column('entity_count', sa.Integer(), nullable=False),
+        sa.Column('previous_id', sa.Integer(), nullable=True),
+        sa.Column('added_count', sa.Integer(), nullable=True),
+        sa.Column('removed_count', sa.Integer(), nullable=True),
+        sa.Column('changed_count', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['previous_id'], ['ifc_revisions.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ifc_revisions_id'), 'ifc_revisions', ['id'], unique=False)
+    op.create_index(op.f('ix_ifc_revisions_input_sha256'), 'ifc_revisions', ['input_sha256'], unique=False)
+    op.create_index('ix_ifc_revisions_user_id_filename', 'ifc_revisions', ['user_id', 'filename'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_ifc_revisions_user_id_filename', table_name='ifc_revisions')
+    op.drop_index(op.f('ix_ifc_revisions_input_sha256'), table_name='ifc_revisions')
+    op.drop_index(op.f('ix_ifc_revisions_id'), table_name='ifc_revisions')
+    op.drop_table('ifc_revisions')
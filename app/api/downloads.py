@@ -0,0 +1,243 @@
+"""
+Streaming file responses with HTTP Range support.
+
+Objects are piped from MinIO `get_object` chunks straight into a
+StreamingResponse, so memory per download does not depend on file size.
+`storage` is an AsyncStorageService; chunk reads run in Starlette's threadpool.
+"""
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from app.services.blob_store import resolve_object_name
+from app.storage.service import object_name_cache
+from config import settings
+
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+def format_etag(etag: Optional[str]) -> Optional[str]:
+    """Quote a MinIO object etag as a strong HTTP entity tag."""
+    if not etag:
+        return None
+    return '"' + etag.strip('"') + '"'
+
+
+def format_http_date(value) -> Optional[str]:
+    if value is None:
+        return None
+    return format_datetime(value, usegmt=True)
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range into an inclusive (start, end) pair.
+
+    Returns None when the header is absent or not something we serve as a
+    partial response (e.g. multiple ranges), in which case the full body is sent.
+    Raises HTTPException(416) for a well-formed but unsatisfiable range.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_s, sep, end_s = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if start_s == "":
+            # Suffix range: last N bytes
+            suffix = int(end_s)
+            if suffix <= 0:
+                raise _range_not_satisfiable(size)
+            start, end = max(size - suffix, 0), size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise _range_not_satisfiable(size)
+    if start < 0 or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _range_not_satisfiable(size: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        detail="Requested range not satisfiable",
+        headers={"Content-Range": f"bytes */{size}"},
+    )
+
+
+def if_range_matches(request: Request, etag: Optional[str], last_modified) -> bool:
+    """True when there is no If-Range precondition or it still matches the object."""
+    value = request.headers.get("if-range")
+    if not value:
+        return True
+    value = value.strip()
+    if value.startswith('"') or value.startswith("W/"):
+        # Weak validators never match If-Range
+        return etag is not None and value == etag
+    if last_modified is None:
+        return False
+    try:
+        return parsedate_to_datetime(value) == last_modified.replace(microsecond=0)
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_control_for(filename: str) -> str:
+    """Cache policy for a file from settings.FILE_CACHE_CONTROL, keyed by extension."""
+    policies = settings.FILE_CACHE_CONTROL
+    ext = filename.lower().rsplit(".", 1)[-1] if "." in filename else ""
+    return policies.get(ext) or policies.get("default") or "no-cache"
+
+
+def is_not_modified(request: Request, etag: Optional[str], last_modified) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since for a GET or HEAD.
+
+    If-None-Match takes precedence and uses weak comparison; If-Modified-Since
+    is only consulted when If-None-Match is absent.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        if etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        current = etag[2:] if etag.startswith("W/") else etag
+        for candidate in if_none_match.split(","):
+            candidate = candidate.strip()
+            if candidate.startswith("W/"):
+                candidate = candidate[2:]
+            if candidate == current:
+                return True
+        return False
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified_response(headers: Dict[str, str]) -> Response:
+    """304 carrying only the validators and cache headers, never the body."""
+    keep = ("ETag", "Last-Modified", "Cache-Control", "Vary", "Expires")
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={k: v for k, v in headers.items() if k in keep or k.startswith("Access-Control-")},
+    )
+
+
+def _iter_object(response, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[bytes]:
+    try:
+        for chunk in response.stream(chunk_size):
+            yield chunk
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def file_headers(stat, filename: str, disposition: str = "attachment", headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Entity headers shared by GET and HEAD responses for a stored file."""
+    out_headers = {
+        "Content-Disposition": f"{disposition}; filename={filename}",
+        "Accept-Ranges": "bytes",
+        "Cache-Control": cache_control_for(filename),
+    }
+    etag = format_etag(stat.etag)
+    if etag:
+        out_headers["ETag"] = etag
+    if stat.last_modified is not None:
+        out_headers["Last-Modified"] = format_http_date(stat.last_modified)
+    out_headers.update(headers or {})
+    return out_headers
+
+
+async def head_file(
+    storage,
+    object_name: str,
+    filename: str,
+    request: Optional[Request] = None,
+    media_type: str = "application/octet-stream",
+    disposition: str = "attachment",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Answer HEAD from object metadata (cached stat_object) without reading data."""
+    stat = await storage.stat_object(object_name, use_cache=True)
+    if stat is None:
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+    out_headers = file_headers(stat, filename, disposition, headers)
+    if request is not None and is_not_modified(request, format_etag(stat.etag), stat.last_modified):
+        return not_modified_response(out_headers)
+    out_headers["Content-Length"] = str(stat.size or 0)
+    return Response(status_code=status.HTTP_200_OK, media_type=media_type, headers=out_headers)
+
+
+async def head_user_file(
+    storage,
+    db,
+    user_id: int,
+    filename: str,
+    request: Optional[Request] = None,
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """`head_file` for a user's file; the object name is looked up only on a cache miss."""
+    key = (user_id, filename)
+    object_name = object_name_cache.get(key)
+    if object_name is None:
+        object_name = resolve_object_name(db, user_id, filename)
+        object_name_cache.set(key, object_name)
+    return await head_file(storage, object_name, filename, request, headers=headers)
+
+
+async def stream_file(
+    storage,
+    object_name: str,
+    filename: str,
+    request: Request,
+    media_type: str = "application/octet-stream",
+    disposition: str = "attachment",
+    headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    """Build a 304/200/206 response for a stored object; data is only opened for 200/206.
+
+    `filename` is the user-facing name used for Content-Disposition and cache policy.
+
+    Raises HTTPException(404) when the object does not exist.
+    """
+    stat = await storage.stat_object(object_name)
+    if stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    size = stat.size or 0
+    etag = format_etag(stat.etag)
+    out_headers = file_headers(stat, filename, disposition, headers)
+    if is_not_modified(request, etag, stat.last_modified):
+        return not_modified_response(out_headers)
+
+    byte_range = None
+    if size > 0 and if_range_matches(request, etag, stat.last_modified):
+        byte_range = parse_range(request.headers.get("range"), size)
+
+    if byte_range is None:
+        offset, length, status_code = 0, size, status.HTTP_200_OK
+    else:
+        start, end = byte_range
+        offset, length, status_code = start, end - start + 1, status.HTTP_206_PARTIAL_CONTENT
+        out_headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    out_headers["Content-Length"] = str(length)
+
+    if length == 0:
+        return Response(status_code=status_code, media_type=media_type, headers=out_headers)
+
+    obj = await storage.open_object(object_name, offset, length)
+    if obj is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    return StreamingResponse(_iter_object(obj), status_code=status_code, media_type=media_type, headers=out_headers)
@@ -0,0 +1,470 @@
+"""
+Upload validation, file record bookkeeping and resumable upload sessions.
+
+Single-shot uploads (`POST /files/upload`) and resumable sessions share the
+same name/extension checks, quota rules and record handling. A session maps
+onto a MinIO multipart upload: every acknowledged part is recorded in
+`upload_parts`, so a client can ask for the session state after a network
+failure and continue from the last acknowledged offset.
+"""
+import base64
+import hashlib
+import os
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import anyio
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.cache.cache_service import CacheService
+from app.models.file import File as FileModel
+from app.models.upload_session import UploadSession, UploadPart
+from app.services.blob_store import abandon_blobs, attach_blob, release_blob, purge_blobs
+from app.services.ifc_metadata import apply_ifc_metadata, blob_metadata, wants_scan
+from app.services.storage_accounting import adjust_used_storage, get_quota_state, reserve_used_storage
+from app.storage.minio_client import UPLOAD_PART_SIZE
+from app.storage.service import object_name_cache, user_object_name
+from app.logging.logger import logger
+from config import settings
+
+ALLOWED_UPLOAD_EXTENSIONS = {"ifc", "ifcxml", "ifczip"}
+MAX_PARTS = 10000  # S3 multipart limit
+
+
+def sanitize_upload_name(original_name: str) -> str:
+    """Safe storage name for an uploaded file; raises HTTPException(400) for bad names or types."""
+    safe_name = os.path.basename(original_name or "")
+    # allow letters, numbers, dash, underscore, dot
+    safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", safe_name)
+    if not safe_name:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
+    ext = safe_name.lower().split(".")[-1] if "." in safe_name else ""
+    if ext not in ALLOWED_UPLOAD_EXTENSIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
+    return safe_name
+
+
+class UploadAllowance:
+    """Quota state for writing `filename`: re-uploading an existing name frees its bytes."""
+
+    quota_detail = "File exceeds storage quota"
+
+    def __init__(self, db: Session, user_id: int, filename: str) -> None:
+        self.current_usage, self.storage_quota = get_quota_state(db, user_id)
+        self.existing_record = db.query(FileModel).filter(
+            FileModel.user_id == user_id,
+            FileModel.filename == filename
+        ).first()
+        self.replaced_size = self.existing_record.file_size if self.existing_record else 0
+        self.max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
+        self.size_limit_detail = f"File exceeds {settings.MAX_UPLOAD_MB}MB limit"
+        self.remaining_quota = max(self.storage_quota - self.current_usage + self.replaced_size, 0)
+
+    def check(self, size: int) -> None:
+        """Raise HTTPException(413) when `size` bytes do not fit."""
+        if size > self.max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=self.size_limit_detail)
+        if size > self.remaining_quota:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=self.quota_detail)
+
+
+class StorageCleanup:
+    """Objects to remove once the transaction that dereferenced them has committed."""
+
+    def __init__(self) -> None:
+        self.blobs: List[Optional[str]] = []  # released blobs; purged only if still unreferenced
+        self.objects: List[str] = []  # legacy per-user objects
+
+    async def run(self, db: Session, storage) -> None:
+        if any(self.blobs):
+            await anyio.to_thread.run_sync(purge_blobs, db, storage.sync, self.blobs)
+        if self.objects:
+            await storage.delete_objects(self.objects)
+
+    def run_sync(self, db: Session, storage) -> None:
+        """Same as `run` for blocking callers holding a StorageService (conversion workers)."""
+        if any(self.blobs):
+            purge_blobs(db, storage, self.blobs)
+        if self.objects:
+            storage.delete_objects(self.objects)
+
+
+class StagedReplacements:
+    """Staged objects moved onto live per-user paths before the commit, undoable until it succeeds.
+
+    Each replaced object is first server-side copied to a backup, so a
+    rollback can put the previous bytes back; backups are queued on the
+    cleanup once the commit went through.
+    """
+
+    def __init__(self, storage, failure_detail: str = "Failed to store upload") -> None:
+        self.storage = storage
+        self.failure_detail = failure_detail
+        self.replaced: List[Tuple[str, Optional[str]]] = []  # (object name, backup name or None if it was new)
+
+    async def promote(self, staging_name: str, object_name: str) -> None:
+        """Move a staged object to `object_name`; raises HTTPException(500) when it cannot be stored."""
+        ok, backup_name = await self.storage.backup_object(object_name)
+        if ok and await self.storage.promote_staged(staging_name, object_name):
+            self.replaced.append((object_name, backup_name))
+            return
+        if backup_name:
+            await self.storage.delete_objects([backup_name])
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=self.failure_detail)
+
+    async def undo(self) -> None:
+        """Restore every replaced object (or delete it when it was new), newest first."""
+        for object_name, backup_name in reversed(self.replaced):
+            if not await self.storage.restore_object(object_name, backup_name):
+                logger.log_error(f"Не удалось восстановить {object_name} после отката загрузки")
+        self.replaced.clear()
+
+    def committed(self, cleanup: StorageCleanup) -> None:
+        cleanup.objects.extend(backup for _, backup in self.replaced if backup)
+
+
+def stage_file_record(
+    db: Session,
+    user_id: int,
+    safe_name: str,
+    original_name: str,
+    content_type: str,
+    size_bytes: int,
+    blob_sha256: Optional[str],
+    allowance: UploadAllowance,
+    cleanup: StorageCleanup,
+    ifc_metadata: Optional[Dict] = None,
+    enforce_quota: bool = True,
+) -> None:
+    """Add or refresh the file record for stored content and charge the quota counter.
+
+    Runs in the caller's transaction; replaced blobs and legacy objects are
+    queued on `cleanup` for after the commit. The charge is reserved
+    atomically; when it no longer fits the quota HTTPException(413) is raised
+    and the caller must roll back. `ifc_metadata` is what the
+    upload scan found; without it the metadata of a file with the same blob
+    is reused, and metadata of replaced content is dropped.
+    """
+    existing_record = allowance.existing_record
+    content_changed = not existing_record or not blob_sha256 or existing_record.blob_sha256 != blob_sha256
+    if ifc_metadata is None and blob_sha256 and content_changed and wants_scan(safe_name):
+        ifc_metadata = blob_metadata(db, blob_sha256)
+    legacy_path = f"user_{user_id}/{safe_name}"
+    storage_path = f"blobs/{blob_sha256}" if blob_sha256 else legacy_path
+    previous_blob = existing_record.blob_sha256 if existing_record else None
+    if blob_sha256 and previous_blob != blob_sha256:
+        attach_blob(db, blob_sha256, size_bytes)
+    if previous_blob and previous_blob != blob_sha256:
+        cleanup.blobs.append(release_blob(db, previous_blob))
+    elif existing_record and blob_sha256 and not previous_blob:
+        cleanup.objects.append(legacy_path)
+
+    if existing_record:
+        existing_record.original_filename = original_name
+        existing_record.file_size = size_bytes
+        existing_record.content_type = content_type
+        existing_record.storage_path = storage_path
+        existing_record.blob_sha256 = blob_sha256
+        record = existing_record
+    else:
+        record = FileModel(
+            user_id=user_id,
+            filename=safe_name,
+            original_filename=original_name,
+            file_size=size_bytes,
+            content_type=content_type,
+            storage_path=storage_path,
+            blob_sha256=blob_sha256,
+            is_public=False
+        )
+        db.add(record)
+    if ifc_metadata is not None or (existing_record and content_changed and safe_name.lower().endswith(".ifc")):
+        apply_ifc_metadata(record, ifc_metadata)
+
+    # Update user storage usage in the same transaction
+    delta = size_bytes - allowance.replaced_size
+    if not enforce_quota:
+        adjust_used_storage(db, user_id, delta)
+    elif not reserve_used_storage(db, user_id, delta):
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=allowance.quota_detail)
+    logger.log_file_operation(f"Обновление used_storage: {delta:+d} байт", user_id, original_name, "UPDATE")
+
+
+def invalidate_file_list(user_id: int, filenames: Iterable[str] = ()) -> None:
+    """Drop the cached file list and the cached object names of changed `filenames`."""
+    for filename in filenames:
+        object_name_cache.delete((user_id, filename))
+    try:
+        CacheService().delete(f"files:list:{user_id}")
+    except Exception:
+        pass
+
+
+async def save_uploaded_file(
+    db: Session,
+    storage,
+    user_id: int,
+    safe_name: str,
+    original_name: str,
+    content_type: str,
+    size_bytes: int,
+    blob_sha256: Optional[str],
+    allowance: UploadAllowance,
+    ifc_metadata: Optional[Dict] = None,
+    staged_object: Optional[str] = None,
+) -> None:
+    """Record one stored upload, commit, then clean up what it replaced.
+
+    Content is either a blob (`blob_sha256`) or, without deduplication, a
+    `staged_object` that replaces user_{id}/{name} only once the quota is
+    reserved. When the record cannot be written (e.g. a concurrent upload
+    took the remaining quota) the transaction is rolled back, the previous
+    object restored and the new content dropped.
+    """
+    cleanup = StorageCleanup()
+    replacements = StagedReplacements(storage)
+    settled = False
+    try:
+        stage_file_record(db, user_id, safe_name, original_name, content_type, size_bytes, blob_sha256, allowance, cleanup, ifc_metadata)
+        if staged_object:
+            await replacements.promote(staged_object, user_object_name(user_id, safe_name))
+        # The blob reference is written (and locked) before its object is checked
+        if blob_sha256:
+            settled = await storage.settle_blobs()
+            if not settled:
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to store upload")
+        db.commit()
+    except Exception:
+        db.rollback()
+        if settled:
+            # The blob object may have been written for a reference that is now rolled back
+            await anyio.to_thread.run_sync(abandon_blobs, db, storage.sync, {blob_sha256: size_bytes})
+        elif blob_sha256:
+            await storage.drop_staged_blobs()
+        await replacements.undo()
+        if staged_object:
+            await storage.delete_objects([staged_object])
+        raise
+    replacements.committed(cleanup)
+    await cleanup.run(db, storage)
+    invalidate_file_list(user_id, [safe_name])
+
+
+# --- Resumable upload sessions ---
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_aware(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def acknowledged_offset(session: UploadSession) -> int:
+    """Bytes acknowledged as one contiguous prefix starting at part 1 (where a client resumes)."""
+    offset = 0
+    expected = 1
+    for part in session.parts:
+        if part.part_number != expected:
+            break
+        offset += part.size
+        if part.size != session.part_size:
+            break
+        expected += 1
+    return offset
+
+
+def upload_session_payload(session: UploadSession) -> Dict:
+    return {
+        "upload_id": session.id,
+        "filename": session.filename,
+        "status": session.status,
+        "part_size": session.part_size,
+        "declared_size": session.declared_size,
+        "offset": acknowledged_offset(session),
+        "parts": [
+            {"part_number": p.part_number, "size": p.size, "sha256": p.sha256}
+            for p in session.parts
+        ],
+        "expires_at": _as_aware(session.expires_at).isoformat() if session.expires_at else None,
+    }
+
+
+def get_upload_session(db: Session, user_id: int, upload_id: str, active: bool = True) -> UploadSession:
+    """Load the user's session; raises 404 when unknown and 409 when it is no longer active."""
+    session = db.query(UploadSession).filter(
+        UploadSession.id == upload_id,
+        UploadSession.user_id == user_id
+    ).first()
+    if not session:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+    if active and session.status != "active":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Upload session is {session.status}")
+    if active and _as_aware(session.expires_at) < _utcnow():
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Upload session expired")
+    return session
+
+
+async def create_upload_session(
+    db: Session,
+    storage,
+    user_id: int,
+    original_name: str,
+    content_type: Optional[str],
+    declared_size: Optional[int] = None,
+) -> UploadSession:
+    """Validate the target name (and announced size) and open a MinIO multipart upload."""
+    safe_name = sanitize_upload_name(original_name)
+    if declared_size is not None:
+        if declared_size < 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid size")
+        # Early rejection only; the authoritative check runs at completion
+        UploadAllowance(db, user_id, safe_name).check(declared_size)
+
+    upload_id = uuid.uuid4().hex
+    content_type = content_type or "application/octet-stream"
+    # Parts are assembled in staging; on completion the object is promoted to
+    # blobs/<sha256>, or to user_{id}/{name} once the quota is reserved
+    object_name = f"staging/{upload_id}"
+    multipart_id = await storage.create_multipart(object_name, content_type)
+    if not multipart_id:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to start upload")
+
+    session = UploadSession(
+        id=upload_id,
+        user_id=user_id,
+        filename=safe_name,
+        original_filename=original_name,
+        content_type=content_type,
+        declared_size=declared_size,
+        part_size=UPLOAD_PART_SIZE,
+        object_name=object_name,
+        multipart_id=multipart_id,
+        status="active",
+        expires_at=_utcnow() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS),
+    )
+    db.add(session)
+    db.commit()
+    logger.log_file_operation("Создана сессия загрузки", user_id, safe_name, "UPLOAD_SESSION")
+    return session
+
+
+async def store_upload_part(
+    db: Session,
+    storage,
+    session: UploadSession,
+    part_number: int,
+    data: bytes,
+    checksum: Optional[str] = None,
+) -> UploadPart:
+    """Upload one part after verifying its SHA-256; re-sending a part number replaces it."""
+    if part_number < 1 or part_number > MAX_PARTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Part number must be between 1 and {MAX_PARTS}")
+    if not data:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty part")
+    if len(data) > session.part_size:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Part exceeds {session.part_size} bytes")
+    sha256 = hashlib.sha256(data).hexdigest()
+    if checksum and checksum.strip().lower() != sha256:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Part checksum mismatch")
+
+    # MinIO re-checks the bytes it receives against Content-MD5
+    content_md5 = base64.b64encode(hashlib.md5(data).digest()).decode("ascii")
+    etag = await storage.upload_part(session.object_name, session.multipart_id, part_number, data, content_md5)
+    if not etag:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Failed to store part")
+
+    part = db.merge(UploadPart(session_id=session.id, part_number=part_number, size=len(data), etag=etag, sha256=sha256))
+    session.expires_at = _utcnow() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+    db.commit()
+    db.refresh(session)
+    return part
+
+
+def _ordered_parts(session: UploadSession) -> List[UploadPart]:
+    parts = list(session.parts)
+    if not parts:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No parts uploaded")
+    for index, part in enumerate(parts, start=1):
+        if part.part_number != index:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Part {index} is missing")
+        if index < len(parts) and part.size != session.part_size:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Part {index} is incomplete")
+    return parts
+
+
+async def abort_upload_session(db: Session, storage, session: UploadSession) -> None:
+    await storage.abort_multipart(session.object_name, session.multipart_id)
+    session.status = "aborted"
+    session.parts.clear()
+    db.commit()
+
+
+async def complete_upload_session(db: Session, storage, session: UploadSession) -> Tuple[str, int]:
+    """Assemble the parts and register the file, applying the same checks as single-shot uploads.
+
+    Returns (filename, size). A session that no longer fits the size limit
+    or quota is aborted, since resuming it cannot succeed.
+    """
+    parts = _ordered_parts(session)
+    size_bytes = sum(p.size for p in parts)
+    if session.declared_size is not None and size_bytes != session.declared_size:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Uploaded size does not match declared size")
+
+    safe_name = sanitize_upload_name(session.filename)
+    allowance = UploadAllowance(db, session.user_id, safe_name)
+    try:
+        allowance.check(size_bytes)
+    except HTTPException:
+        await abort_upload_session(db, storage, session)
+        raise
+
+    if not await storage.complete_multipart(session.object_name, session.multipart_id, [(p.part_number, p.etag) for p in parts]):
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to complete upload")
+
+    blob_sha256 = None
+    # Sessions opened before uploads were staged were assembled on the user path itself
+    staged_object = session.object_name if session.object_name.startswith("staging/") else None
+    if staged_object and settings.STORAGE_DEDUP_ENABLED:
+        staged_object = None
+        blob_sha256 = await storage.promote_blob(session.object_name)
+        if not blob_sha256:
+            session.status = "aborted"
+            session.parts.clear()
+            db.commit()
+            await storage.delete_objects([session.object_name])
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to store upload")
+
+    session.status = "completed"
+    try:
+        await save_uploaded_file(
+            db, storage, session.user_id, safe_name, session.original_filename,
+            session.content_type or "application/octet-stream", size_bytes, blob_sha256, allowance,
+            staged_object=staged_object
+        )
+    except HTTPException:
+        # Rolled back; the assembled object is gone, so the session cannot be completed again
+        session.status = "aborted"
+        session.parts.clear()
+        db.commit()
+        raise
+    logger.log_file_operation("Файл загружен по частям", session.user_id, safe_name, "UPLOAD")
+    return safe_name, size_bytes
+
+
+def expire_upload_sessions(db: Session, storage) -> int:
+    """Blocking: abort active sessions past their expiry and drop their parts."""
+    expired = db.query(UploadSession).filter(
+        UploadSession.status == "active",
+        UploadSession.expires_at < _utcnow()
+    ).all()
+    for session in expired:
+        storage.abort_multipart(session.object_name, session.multipart_id)
+        session.status = "aborted"
+        session.parts.clear()
+    db.commit()
+    return len(expired)
@@ -3,16 +3,110 @@ from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status
+from dataclasses import dataclass, fields
 from sqlalchemy.orm import Session
 from app.models.user import User
 from app.cache.cache_service import CacheService
+from app.cache.local_cache import TTLCache
+from app.cache.invalidation import invalidation_bus
 from config import settings
+import itertools
+import time
 import uuid
-import json
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Immutable copy of a user's public fields, safe to share between requests.
+
+    Fields that change without an admin action (used_storage, last_login) are
+    left out; endpoints that show them read the users row.
+    """
+    id: int
+    email: str
+    username: str
+    is_active: bool
+    is_admin: bool
+    is_email_verified: bool
+    full_name: Optional[str]
+    oauth_provider: Optional[str]
+    oauth_id: Optional[str]
+    avatar_url: Optional[str]
+    storage_quota: Optional[int]
+    created_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserSnapshot":
+        return cls(**{f.name: getattr(user, f.name) for f in fields(cls)})
+
+    @classmethod
+    def from_cache(cls, data: dict) -> "UserSnapshot":
+        values = {f.name: data.get(f.name) for f in fields(cls)}
+        if values["created_at"]:
+            values["created_at"] = datetime.fromisoformat(values["created_at"])
+        return cls(**values)
+
+    def to_cache(self) -> dict:
+        data = {f.name: getattr(self, f.name) for f in fields(self)}
+        if data["created_at"]:
+            data["created_at"] = data["created_at"].isoformat()
+        return data
+
+
+# L1: per-process snapshots keyed by ("id", user_id) / ("email", email); L2: Redis
+_user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SEC)
+_redis_cache = CacheService()
+# Verified token payloads, each kept no longer than the token is valid
+_token_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SEC)
+
+# Bumped by every user invalidation (this process's counter for L1, the Redis
+# key for L2). A snapshot loaded while either moved may predate the change
+# and is returned but not cached. Invalidations are rare, so one counter for
+# all users costs only the odd skipped cache fill.
+_local_generation = itertools.count()
+_generation = 0
+USER_GENERATION_KEY = "user:generation"
+
+
+def _evict_users(keys: Optional[list]) -> None:
+    """Invalidation bus handler; keys look like "id:42" / "email:a@b.c"."""
+    global _generation
+    _generation = next(_local_generation) + 1
+    if keys is None:
+        _user_cache.clear()
+        return
+    for key in keys:
+        kind, _, value = key.partition(":")
+        _user_cache.delete((kind, int(value) if kind == "id" else value))
+
+
+invalidation_bus.register("user", _evict_users)
+
+
+def _cached_user(db: Session, key: tuple, redis_key: str, criterion) -> Optional[UserSnapshot]:
+    snapshot = _user_cache.get(key)
+    if snapshot is not None:
+        return snapshot
+    local_generation = _generation
+    cached, generation = _redis_cache.get_with_generation(redis_key, USER_GENERATION_KEY)
+    if isinstance(cached, dict):
+        try:
+            snapshot = UserSnapshot.from_cache(cached)
+        except (TypeError, ValueError):
+            snapshot = None
+    if snapshot is None:
+        user = db.query(User).filter(criterion).first()
+        if user is None:
+            return None
+        snapshot = UserSnapshot.from_user(user)
+        _redis_cache.set_if_generation(redis_key, snapshot.to_cache(), USER_GENERATION_KEY, generation, expire=300)  # 5 minutes
+    if _generation == local_generation:
+        _user_cache.set(key, snapshot, ttl=invalidation_bus.ttl(settings.USER_CACHE_TTL_SEC))
+    return snapshot
+
+
 class AuthService:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -39,12 +133,18 @@ class AuthService:
     
     @staticmethod
     def verify_token(token: str) -> Optional[dict]:
-        """Verify JWT token and return payload"""
+        """Verify JWT token and return payload (decoded once per process until it expires)"""
+        payload = _token_cache.get(token)
+        if payload is not None:
+            return payload
         try:
             payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            return payload
         except JWTError:
             return None
+        expires_in = payload["exp"] - time.time() if isinstance(payload.get("exp"), (int, float)) else settings.USER_CACHE_TTL_SEC
+        if expires_in > 0:
+            _token_cache.set(token, payload, ttl=min(expires_in, settings.USER_CACHE_TTL_SEC))
+        return payload
     
     @staticmethod
     def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
@@ -57,82 +157,25 @@ class AuthService:
         return user
     
     @staticmethod
-    def get_user_by_email(db: Session, email: str) -> Optional[User]:
-        """Get user by email with Redis caching"""
-        # Try to get from cache first
-        cache = CacheService()
-        cache_key = f"user:email:{email}"
-        cached_user = cache.get(cache_key)
-        
-        if cached_user and isinstance(cached_user, dict):
-            # Return user object from cache
-            user = User()
-            for key, value in cached_user.items():
-                if hasattr(user, key):
-                    setattr(user, key, value)
-            return user
-        
-        # Get from database
-        user = db.query(User).filter(User.email == email).first()
-        
-        if user:
-            # Cache user data for 5 minutes
-            user_data = {
-                "id": user.id,
-                "email": user.email,
-                "username": user.username,
-                "is_active": user.is_active,
-                "is_admin": user.is_admin,
-                "is_email_verified": user.is_email_verified,
-                "full_name": user.full_name,
-                "oauth_provider": user.oauth_provider,
-                "oauth_id": user.oauth_id,
-                "avatar_url": user.avatar_url,
-                "created_at": user.created_at.isoformat() if user.created_at else None,
-                "last_login": user.last_login.isoformat() if user.last_login else None
-            }
-            cache.set(cache_key, user_data, expire=300)  # 5 minutes
-        
-        return user
+    def get_user_by_email(db: Session, email: str) -> Optional[UserSnapshot]:
+        """Get user snapshot by email: in-process cache, then Redis, then DB"""
+        return _cached_user(db, ("email", email), f"user:email:{email}", User.email == email)
     
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
-        """Get user by ID with Redis caching"""
-        # Try to get from cache first
-        cache = CacheService()
-        cache_key = f"user:id:{user_id}"
-        cached_user = cache.get(cache_key)
-        
-        if cached_user and isinstance(cached_user, dict):
-            # Return user object from cache
-            user = User()
-            for key, value in cached_user.items():
-                if hasattr(user, key):
-                    setattr(user, key, value)
-            return user
-        
-        # Get from database
-        user = db.query(User).filter(User.id == user_id).first()
-        
-        if user:
-            # Cache user data for 5 minutes
-            user_data = {
-                "id": user.id,
-                "email": user.email,
-                "username": user.username,
-                "is_active": user.is_active,
-                "is_admin": user.is_admin,
-                "is_email_verified": user.is_email_verified,
-                "full_name": user.full_name,
-                "oauth_provider": user.oauth_provider,
-                "oauth_id": user.oauth_id,
-                "avatar_url": user.avatar_url,
-                "created_at": user.created_at.isoformat() if user.created_at else None,
-                "last_login": user.last_login.isoformat() if user.last_login else None
-            }
-            cache.set(cache_key, user_data, expire=300)  # 5 minutes
-        
-        return user
+    def get_user_by_id(db: Session, user_id: int) -> Optional[UserSnapshot]:
+        """Get user snapshot by ID: in-process cache, then Redis, then DB"""
+        return _cached_user(db, ("id", user_id), f"user:id:{user_id}", User.id == user_id)
+    
+    @staticmethod
+    def invalidate_user(user_id: int, *emails: Optional[str]) -> None:
+        """Drop cached snapshots of a user in Redis and in every worker's L1 cache"""
+        cached = _user_cache.get(("id", user_id))
+        keys = {f"id:{user_id}"}
+        keys.update(f"email:{email}" for email in emails if email)
+        if cached is not None:
+            keys.add(f"email:{cached.email}")
+        _redis_cache.invalidate(tuple(f"user:{key}" for key in sorted(keys)), USER_GENERATION_KEY)
+        invalidation_bus.publish("user", sorted(keys))
     
     @staticmethod
     def create_password_reset_token() -> str:
@@ -1,34 +1,90 @@
-from typing import Optional
+"""
+Request-scoped authentication.
+
+The token of a request is decoded and its user looked up at most once:
+the first dependency (or helper) that needs the user resolves it and
+stores the result on `request.state.auth`; every later dependency,
+`_get_user_from_request` and the request logging middleware reuse it.
+"""
+from typing import NamedTuple, Optional
 from fastapi import Request, HTTPException, status, Depends
 from sqlalchemy.orm import Session
 
 from app.database import get_db
-from app.auth.auth import AuthService
-from app.models.user import User
+from app.auth.auth import AuthService, UserSnapshot
 
 
-def get_user_from_request(request: Request, db: Session) -> Optional[User]:
-    """Extract current user from Authorization: Bearer or access_token cookie.
-    Returns None if not authenticated or invalid.
-    """
-    token: Optional[str] = None
+class RequestAuth(NamedTuple):
+    token: Optional[str]
+    user_id: Optional[int]
+    user: Optional[UserSnapshot]
+    error: Optional[str]  # 401 detail when user is None
+
+
+def request_token(request: Request) -> Optional[str]:
+    """Bearer token from the Authorization header, else the access_token cookie."""
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
+        if token:
+            return token
+    return request.cookies.get("access_token")
+
+
+def _token_user_id(token: Optional[str]) -> tuple:
     if not token:
-        token = request.cookies.get("access_token")
-    if not token:
-        return None
+        return None, "Not authenticated"
     payload = AuthService.verify_token(token)
     if not payload:
+        return None, "Invalid token"
+    try:
+        return int(payload.get("sub")), None
+    except (TypeError, ValueError):
+        return None, "Invalid token payload"
+
+
+def resolved_auth(request: Request, token: Optional[str] = None) -> Optional[RequestAuth]:
+    """Auth already resolved for this request (and this token), without any I/O."""
+    auth = getattr(request.state, "auth", None)
+    if auth is None:
         return None
-    user_id = payload.get("sub")
-    if not user_id:
+    if token is not None and auth.token != token:
         return None
-    return AuthService.get_user_by_id(db, int(user_id))
+    return auth
 
 
-def require_current_user(request: Request, db: Session = Depends(get_db)) -> User:
+def resolve_request_auth(request: Request, db: Session, token: Optional[str] = None) -> RequestAuth:
+    """Decode the token and load the user once per request; later calls return the stored result."""
+    token = token if token is not None else request_token(request)
+    auth = resolved_auth(request, token)
+    if auth is not None:
+        return auth
+    user_id, error = _token_user_id(token)
+    user = AuthService.get_user_by_id(db, user_id) if user_id is not None else None
+    if user_id is not None and user is None:
+        error = "User not found"
+    auth = RequestAuth(token, user_id, user, error)
+    request.state.auth = auth
+    return auth
+
+
+def request_user_id(request: Request) -> Optional[int]:
+    """User id for logging: the resolved user, else the token subject (no DB or cache lookup)."""
+    auth = resolved_auth(request)
+    if auth is not None:
+        return auth.user.id if auth.user else None
+    user_id, _ = _token_user_id(request_token(request))
+    return user_id
+
+
+def get_user_from_request(request: Request, db: Session) -> Optional[UserSnapshot]:
+    """Extract current user from Authorization: Bearer or access_token cookie.
+    Returns None if not authenticated or invalid.
+    """
+    return resolve_request_auth(request, db).user
+
+
+def require_current_user(request: Request, db: Session = Depends(get_db)) -> UserSnapshot:
     user = get_user_from_request(request, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
@@ -37,11 +93,8 @@ def require_current_user(request: Request, db: Session = Depends(get_db)) -> Use
     return user
 
 
-def require_admin_user(request: Request, db: Session = Depends(get_db)) -> User:
+def require_admin_user(request: Request, db: Session = Depends(get_db)) -> UserSnapshot:
     user = require_current_user(request, db)
     if not user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
     return user
-
-
-
@@ -4,33 +4,24 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from config import settings
 from app.auth.auth import AuthService
+from app.auth.context import resolve_request_auth
 from app.models.user import User
 
 security = HTTPBearer()
 
 async def get_current_user(
+    request: Request,
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
-    """Get current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    payload = AuthService.verify_token(credentials.credentials)
-    if payload is None:
-        raise credentials_exception
-    
-    user_id: int = payload.get("sub")
-    if user_id is None:
-        raise credentials_exception
-    
-    user = AuthService.get_user_by_id(db, user_id=user_id)
+    """Get current authenticated user from JWT token (resolved once per request)"""
+    user = resolve_request_auth(request, db, credentials.credentials).user
     if user is None:
-        raise credentials_exception
-    
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -53,30 +44,10 @@ async def get_current_user_from_cookie(
     db: Session = Depends(get_db)
 ) -> User:
     """Get current user from Authorization header or access_token cookie."""
-    # Authorization header
-    auth_header = request.headers.get("Authorization")
-    if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
-    else:
-        # Cookie fallback
-        token = request.cookies.get("access_token")
-
-    if not token:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-
-    payload = AuthService.verify_token(token)
-    if not payload:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-
-    user_id: int | None = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-
-    user = AuthService.get_user_by_id(db, user_id=int(user_id))
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-
-    return user
+    auth = resolve_request_auth(request, db)
+    if auth.user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=auth.error)
+    return auth.user
 
 async def get_current_active_user_from_cookie(current_user: User = Depends(get_current_user_from_cookie)) -> User:
     """Get current active user from cookie"""
@@ -0,0 +1,110 @@
+"""
+Non-blocking cache for async route handlers, built on redis.asyncio.
+
+Same key schema and JSON encoding as CacheService (`files:list:{user_id}`,
+`user:id:{id}`, `user:email:{email}`), so both layers read each other's
+entries. Multi-key operations are pipelined into one round trip. Failures
+share the circuit breaker of the sync RedisClient, so an outage noticed
+by either layer stops both from waiting on connect timeouts.
+"""
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import redis
+import redis.asyncio as aioredis
+
+from app.cache.redis_client import redis_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _decode(raw: Any) -> Optional[Any]:
+    if raw is None:
+        return None
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncCacheService:
+    def __init__(self) -> None:
+        self.breaker = redis_client.breaker
+        self._client: Optional[aioredis.Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _redis(self) -> aioredis.Redis:
+        # Connections belong to the event loop that opened them
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            pool = aioredis.ConnectionPool(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                password=settings.REDIS_PASSWORD or None,
+                db=settings.REDIS_DB,
+                decode_responses=True,
+                max_connections=settings.REDIS_POOL_MAX_CONNECTIONS,
+                socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            )
+            self._client = aioredis.Redis(connection_pool=pool)
+            self._loop = loop
+        return self._client
+
+    async def _run(self, command, default: Any) -> Any:
+        if not self.breaker.allow():
+            return default
+        try:
+            result = await command(self._redis())
+        except (redis.ConnectionError, redis.TimeoutError):
+            self.breaker.failure()
+            return default
+        except Exception as e:
+            logger.error(f"Async Redis error: {e}")
+            return default
+        self.breaker.success()
+        return result
+
+    async def get(self, key: str) -> Optional[Any]:
+        return _decode(await self._run(lambda r: r.get(key), None))
+
+    async def set(self, key: str, value: Any, expire: int = 300) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        await self._run(lambda r: r.set(key, payload, ex=expire), None)
+
+    async def delete(self, *keys: str) -> None:
+        if keys:
+            await self._run(lambda r: r.delete(*keys), None)
+
+    async def mget(self, keys: Sequence[str]) -> List[Optional[Any]]:
+        """Values for `keys` in order (None for misses), in one round trip."""
+        if not keys:
+            return []
+        raws = await self._run(lambda r: r.mget(list(keys)), None)
+        if raws is None:
+            return [None] * len(keys)
+        return [_decode(raw) for raw in raws]
+
+    async def mset(self, items: Dict[str, Any], expire: int = 300) -> None:
+        """Store several entries with a TTL in one pipelined round trip."""
+        if not items:
+            return
+
+        async def _pipeline(r: aioredis.Redis):
+            async with r.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, json.dumps(value, ensure_ascii=False), ex=expire)
+                return await pipe.execute()
+
+        await self._run(_pipeline, None)
+
+
+async_cache = AsyncCacheService()
+
+
+def get_async_cache() -> AsyncCacheService:
+    """FastAPI dependency: the per-process async cache."""
+    return async_cache
@@ -1,8 +1,8 @@
 import json
-from typing import Any, Optional
+from typing import Any, Optional, Tuple
 
 try:
-    from app.cache import redis_client
+    from app.cache.redis_client import redis_client
 except Exception:
     redis_client = None  # type: ignore
 
@@ -13,7 +13,7 @@ class CacheService:
 
     def available(self) -> bool:
         try:
-            return bool(self._client and self._client.is_connected())
+            return bool(self._client and self._client.available())
         except Exception:
             return False
 
@@ -49,4 +49,53 @@ class CacheService:
         except Exception:
             return
 
+    # Generation-guarded entries: a value loaded before an invalidation must not be written back
 
+    _SET_IF_GENERATION = """
+    if (redis.call('GET', KEYS[2]) or '0') == ARGV[1] then
+        redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+        return 1
+    end
+    return 0
+    """
+
+    def get_with_generation(self, key: str, generation_key: str) -> Tuple[Optional[Any], Optional[str]]:
+        """Value of `key` and the current generation in one round trip; generation is None when Redis is unusable."""
+        if not self.available():
+            return None, None
+        try:
+            raw, generation = self._client.call(lambda r: r.mget([key, generation_key]))  # type: ignore[attr-defined]
+        except Exception:
+            return None, None
+        try:
+            value = json.loads(raw) if raw is not None else None
+        except (TypeError, ValueError):
+            value = None
+        return value, generation or "0"
+
+    def set_if_generation(self, key: str, value: Any, generation_key: str, generation: Optional[str], expire: int = 300) -> bool:
+        """Store `value` only if no invalidation bumped `generation_key` since `generation` was read."""
+        if generation is None or not self.available():
+            return False
+        try:
+            payload = json.dumps(value, ensure_ascii=False)
+            return bool(self._client.call(  # type: ignore[attr-defined]
+                lambda r: r.eval(self._SET_IF_GENERATION, 2, key, generation_key, generation, payload, expire)
+            ))
+        except Exception:
+            return False
+
+    def invalidate(self, keys: Tuple[str, ...], generation_key: str) -> None:
+        """Bump `generation_key` and delete `keys` in one round trip."""
+        if not self.available():
+            return
+        try:
+            def _pipeline(r):
+                pipe = r.pipeline()
+                pipe.incr(generation_key)
+                pipe.delete(*keys)
+                return pipe.execute()
+
+            self._client.call(_pipeline)  # type: ignore[attr-defined]
+        except Exception:
+            return
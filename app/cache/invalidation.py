@@ -0,0 +1,136 @@
+"""
+Cross-worker invalidation of in-process (L1) caches over Redis pub/sub.
+
+Each process registers a handler per cache namespace. A mutation publishes
+the affected keys once; every subscribed worker (including the publisher)
+evicts them. While the subscription is down, missed messages cannot be
+replayed, so L1 caches are flushed on every (dis)connect and new entries
+get the short fallback TTL until the bus is listening again.
+"""
+import json
+import logging
+import threading
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+import redis
+
+from app.cache.redis_client import RedisUnavailable, redis_client
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Handler receives the keys to evict, or None to drop everything
+Handler = Callable[[Optional[List[str]]], None]
+
+
+class InvalidationBus:
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, Handler] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listening = threading.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self._listening.is_set()
+
+    def register(self, namespace: str, handler: Handler) -> None:
+        self._handlers[namespace] = handler
+
+    def ttl(self, ttl: float) -> float:
+        """L1 TTL to use now: the configured one while invalidations are delivered, else the fallback."""
+        if self.connected:
+            return ttl
+        return min(ttl, settings.CACHE_INVALIDATION_FALLBACK_TTL_SEC)
+
+    def publish(self, namespace: str, keys: Iterable) -> bool:
+        """Evict `keys` locally and in every other subscribed worker."""
+        keys = [str(key) for key in keys]
+        self._dispatch(namespace, keys)
+        # Other workers may be listening even while our own subscription is down;
+        # only the circuit breaker spares us the connect timeout during an outage.
+        message = json.dumps({"origin": self.origin, "ns": namespace, "keys": keys})
+        try:
+            redis_client.call(lambda r: r.publish(self.channel, message))
+            return True
+        except RedisUnavailable:
+            return False
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать инвалидацию кэша: {e}")
+            return False
+
+    def flush(self) -> None:
+        for namespace in list(self._handlers):
+            self._dispatch(namespace, None)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _redis(self) -> redis.Redis:
+        # Shared pool; the subscription holds one of its connections
+        return redis_client.client
+
+    def _dispatch(self, namespace: str, keys: Optional[List[str]]) -> None:
+        handler = self._handlers.get(namespace)
+        if handler is None:
+            return
+        try:
+            handler(keys)
+        except Exception as e:
+            logger.error(f"Ошибка инвалидации кэша {namespace}: {e}")
+
+    def _on_message(self, data) -> None:
+        try:
+            message = json.loads(data)
+        except (TypeError, ValueError):
+            return
+        if not isinstance(message, dict) or message.get("origin") == self.origin:
+            return  # already applied locally by publish()
+        keys = message.get("keys")
+        self._dispatch(message.get("ns"), keys if isinstance(keys, list) else None)
+
+    def _run(self) -> None:
+        delay = 1.0
+        while not self._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = self._redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                self._listening.set()
+                self.flush()  # anything published while we were away is lost
+                logger.info("✅ Подписка на инвалидацию кэша активна")
+                delay = 1.0
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._on_message(message.get("data"))
+            except Exception as e:
+                if self._listening.is_set():
+                    logger.warning(f"⚠️ Подписка на инвалидацию кэша потеряна: {e}")
+            finally:
+                if self._listening.is_set():
+                    self._listening.clear()
+                    self.flush()
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+            self._stop.wait(delay)
+            delay = min(delay * 2, 30.0)
+
+
+invalidation_bus = InvalidationBus(settings.CACHE_INVALIDATION_CHANNEL)
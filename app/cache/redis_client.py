@@ -1,125 +1,173 @@
 import redis
 import json
-import pickle
-from typing import Any, Optional, Union
+import threading
+import time
+from typing import Any, Callable, Optional
 from config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+class RedisUnavailable(Exception):
+    """Redis is down (circuit open) or the command failed to reach it."""
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures and lets one trial call
+    through after a backoff that doubles on every failed trial."""
+
+    def __init__(self, threshold: int, reset_sec: float, max_reset_sec: float) -> None:
+        self.threshold = max(1, threshold)
+        self.reset_sec = reset_sec
+        self.max_reset_sec = max_reset_sec
+        self._failures = 0
+        self._backoff = reset_sec
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.threshold
+
+    def ready(self) -> bool:
+        """Closed, or open with the backoff elapsed (a trial call would be let through)"""
+        return not self.is_open or time.monotonic() >= self._open_until
+
+    def allow(self) -> bool:
+        if not self.is_open:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if now < self._open_until:
+                return False
+            # Half-open: one caller tries, the rest wait for the next window
+            self._open_until = now + self._backoff
+            return True
+
+    def success(self) -> None:
+        if self._failures:
+            with self._lock:
+                if self.is_open:
+                    logger.info("✅ Redis снова доступен")
+                self._failures = 0
+                self._backoff = self.reset_sec
+
+    def failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures == self.threshold:
+                logger.warning(f"⚠️ Redis недоступен, кэш отключен на {self._backoff:.0f} с")
+                self._open_until = time.monotonic() + self._backoff
+            elif self._failures > self.threshold:
+                self._backoff = min(self._backoff * 2, self.max_reset_sec)
+                self._open_until = time.monotonic() + self._backoff
+
+
 class RedisClient:
     def __init__(self):
-        """Initialize Redis client"""
-        self.redis_client = None
+        """Initialize pooled Redis client; connections are opened lazily"""
+        self.pool = redis.ConnectionPool(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            password=settings.REDIS_PASSWORD or None,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+            max_connections=settings.REDIS_POOL_MAX_CONNECTIONS,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            health_check_interval=30,
+        )
+        self.redis_client = redis.Redis(connection_pool=self.pool)
+        self.breaker = CircuitBreaker(
+            settings.REDIS_BREAKER_FAILURES,
+            settings.REDIS_BREAKER_RESET_SEC,
+            settings.REDIS_BREAKER_MAX_RESET_SEC,
+        )
+
+    @property
+    def client(self) -> redis.Redis:
+        return self.redis_client
+
+    def available(self) -> bool:
+        """Whether cache calls should be attempted; no network I/O.
+
+        True while the circuit is closed and once its backoff has elapsed, so the
+        next call() can run the half-open trial.
+        """
+        return self.breaker.ready()
+
+    def is_connected(self) -> bool:
+        """PING Redis; for health checks only, regular calls go straight to the command"""
         try:
-            self.redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                password=settings.REDIS_PASSWORD,
-                decode_responses=True,
-                socket_connect_timeout=2,
-                socket_timeout=2
-            )
-            # Test connection
             self.redis_client.ping()
-            logger.info("✅ Redis connected successfully")
-        except Exception as e:
-            logger.warning(f"⚠️ Redis connection failed: {e}")
-            logger.warning("⚠️ Redis caching disabled - application will work without cache")
-            self.redis_client = None
+            self.breaker.success()
+            return True
+        except redis.RedisError:
+            self.breaker.failure()
+            return False
 
-    def is_connected(self) -> bool:
-        """Check if Redis is connected"""
+    def call(self, command: Callable[[redis.Redis], Any]) -> Any:
+        """Run `command` against Redis through the circuit breaker.
+
+        Raises RedisUnavailable when the circuit is open or Redis cannot be reached.
+        """
+        if not self.breaker.allow():
+            raise RedisUnavailable("circuit open")
         try:
-            if self.redis_client:
-                self.redis_client.ping()
-                return True
-        except:
-            pass
-        return False
+            result = command(self.redis_client)
+        except (redis.ConnectionError, redis.TimeoutError) as e:
+            self.breaker.failure()
+            raise RedisUnavailable(str(e)) from e
+        self.breaker.success()
+        return result
 
-    def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
-        """Set a key-value pair with optional expiration"""
-        if not self.is_connected():
-            return False
-        
+    def _run(self, command: Callable[[redis.Redis], Any], default: Any, action: str) -> Any:
         try:
-            # Serialize value
-            if isinstance(value, (dict, list)):
-                serialized_value = json.dumps(value)
-            else:
-                serialized_value = str(value)
-            
-            if expire:
-                return self.redis_client.setex(key, expire, serialized_value)
-            else:
-                return self.redis_client.set(key, serialized_value)
+            return self.call(command)
+        except RedisUnavailable:
+            return default
         except Exception as e:
-            logger.error(f"Redis set error: {e}")
-            return False
+            logger.error(f"Redis {action} error: {e}")
+            return default
+
+    def set(self, key: str, value: Any, expire: Optional[int] = None) -> bool:
+        """Set a key-value pair with optional expiration"""
+        # Serialize value
+        if isinstance(value, (dict, list)):
+            serialized_value = json.dumps(value)
+        else:
+            serialized_value = str(value)
+        if expire:
+            return bool(self._run(lambda r: r.setex(key, expire, serialized_value), False, "set"))
+        return bool(self._run(lambda r: r.set(key, serialized_value), False, "set"))
 
     def get(self, key: str) -> Optional[Any]:
         """Get a value by key"""
-        if not self.is_connected():
+        value = self._run(lambda r: r.get(key), None, "get")
+        if value is None:
             return None
-        
+        # Try to deserialize as JSON
         try:
-            value = self.redis_client.get(key)
-            if value is None:
-                return None
-            
-            # Try to deserialize as JSON
-            try:
-                return json.loads(value)
-            except:
-                return value
-        except Exception as e:
-            logger.error(f"Redis get error: {e}")
-            return None
+            return json.loads(value)
+        except (TypeError, ValueError):
+            return value
 
     def delete(self, key: str) -> bool:
         """Delete a key"""
-        if not self.is_connected():
-            return False
-        
-        try:
-            return bool(self.redis_client.delete(key))
-        except Exception as e:
-            logger.error(f"Redis delete error: {e}")
-            return False
+        return bool(self._run(lambda r: r.delete(key), 0, "delete"))
 
     def exists(self, key: str) -> bool:
         """Check if key exists"""
-        if not self.is_connected():
-            return False
-        
-        try:
-            return bool(self.redis_client.exists(key))
-        except Exception as e:
-            logger.error(f"Redis exists error: {e}")
-            return False
+        return bool(self._run(lambda r: r.exists(key), 0, "exists"))
 
     def expire(self, key: str, seconds: int) -> bool:
         """Set expiration for a key"""
-        if not self.is_connected():
-            return False
-        
-        try:
-            return bool(self.redis_client.expire(key, seconds))
-        except Exception as e:
-            logger.error(f"Redis expire error: {e}")
-            return False
+        return bool(self._run(lambda r: r.expire(key, seconds), False, "expire"))
 
     def flushdb(self) -> bool:
         """Flush current database"""
-        if not self.is_connected():
-            return False
-        
-        try:
-            return self.redis_client.flushdb()
-        except Exception as e:
-            logger.error(f"Redis flushdb error: {e}")
-            return False
+        return bool(self._run(lambda r: r.flushdb(), False, "flushdb"))
 
 # Global Redis client instance
 redis_client = RedisClient()
@@ -0,0 +1,7 @@
+"""
+IFC -> FRAG conversion subsystem: durable job queue, converter and worker.
+"""
+from .queue import enqueue_conversion
+from .errors import ConversionError
+
+__all__ = ["enqueue_conversion", "ConversionError"]
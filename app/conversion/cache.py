@@ -0,0 +1,91 @@
+"""
+Conversion result cache.
+
+A converted FRAG is stored once as a blob and recorded under
+sha256(input SHA-256, converter version, options). Converting the same IFC
+content again with the same converter links that blob to the new FRAG
+record instead of running Node. The converter version combines the
+ifc2frag.cjs version and the installed @thatopen/fragments version as
+reported by `--self-test`, so upgrading either one misses the old entries,
+which then expire after CONVERSION_CACHE_TTL_DAYS without hits.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.conversion.queue import _utcnow
+from app.models.conversion_cache import ConversionCacheEntry
+from app.services.blob_store import attach_blob, purge_blobs, release_blobs
+from config import settings
+
+
+def cache_enabled() -> bool:
+    # Cached FRAGs live in the blob layer
+    return settings.CONVERSION_CACHE_ENABLED and settings.STORAGE_DEDUP_ENABLED
+
+
+def options_key(options: Dict) -> str:
+    return json.dumps(options, sort_keys=True, separators=(",", ":"))
+
+
+def cache_key(input_sha256: str, converter_version: str, options: Dict) -> str:
+    raw = "\n".join((input_sha256, converter_version, options_key(options)))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def lookup_cached_frag(db: Session, input_sha256: str, converter_version: str, options: Dict) -> Optional[ConversionCacheEntry]:
+    """Cached FRAG for this input and converter, counting the hit."""
+    entry = db.get(ConversionCacheEntry, cache_key(input_sha256, converter_version, options))
+    if entry is None:
+        return None
+    entry.hits = (entry.hits or 0) + 1
+    entry.last_used_at = _utcnow()
+    return entry
+
+
+def remember_frag(
+    db: Session,
+    input_sha256: str,
+    converter_version: str,
+    options: Dict,
+    frag_sha256: str,
+    frag_size: int,
+) -> None:
+    """Record a freshly converted FRAG; the entry takes its own blob reference."""
+    key = cache_key(input_sha256, converter_version, options)
+    try:
+        with db.begin_nested():
+            attach_blob(db, frag_sha256, frag_size)
+            db.add(ConversionCacheEntry(
+                cache_key=key,
+                input_sha256=input_sha256,
+                converter_version=converter_version,
+                options=options_key(options),
+                frag_sha256=frag_sha256,
+                frag_size=frag_size,
+                hits=0,
+            ))
+    except IntegrityError:
+        # A concurrent conversion of the same content recorded it first
+        pass
+
+
+def evict_conversion_cache(db: Session, storage, ttl_days: Optional[int] = None) -> int:
+    """Drop entries unused for `ttl_days` and their blob references; returns how many were evicted."""
+    ttl_days = settings.CONVERSION_CACHE_TTL_DAYS if ttl_days is None else ttl_days
+    cutoff = _utcnow() - timedelta(days=ttl_days)
+    stale = db.query(ConversionCacheEntry.cache_key, ConversionCacheEntry.frag_sha256).filter(
+        ConversionCacheEntry.last_used_at < cutoff
+    ).limit(500).all()
+    if not stale:
+        return 0
+    keys: List[str] = [key for key, _ in stale]
+    db.query(ConversionCacheEntry).filter(ConversionCacheEntry.cache_key.in_(keys)).delete(synchronize_session=False)
+    orphaned = release_blobs(db, [sha for _, sha in stale])
+    db.commit()
+    purge_blobs(db, storage, orphaned)
+    return len(keys)
@@ -0,0 +1,234 @@
+"""
+IFC -> FRAG conversion of one job: fetch the IFC from storage, run the Node
+converter (TSP/scripts/ifc2frag.cjs), store the FRAG next to the source and
+register it in the files table. Failures raise ConversionError so the
+worker can retry the job.
+
+Both directions go through a temp directory in fixed-size chunks (MinIO
+stream -> IFC file, FRAG file -> multipart upload), so the worker's memory
+per job is bounded by the chunk and part sizes, not by the model size.
+"""
+import json
+import os
+import subprocess
+import tempfile
+import time
+from typing import Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from app.api.uploads import StorageCleanup, UploadAllowance, invalidate_file_list, stage_file_record
+from app.conversion.cache import cache_enabled, lookup_cached_frag, remember_frag
+from app.conversion.daemon import CONVERTER_SCRIPT, TSP_DIR, get_daemon_pool
+from app.conversion.errors import ConversionError
+from app.conversion.revisions import CONTENT_KEY_OPTIONS, record_revision
+from app.models.conversion_job import ConversionJob
+from app.models.file import File as FileModel
+from app.services.blob_store import abandon_blobs, resolve_object_name
+from app.services.ifc_elements import build_element_index, element_index_current, wants_element_index
+from app.services.ifc_metadata import backfill_ifc_metadata
+from app.storage.streams import HashingReader, HashingWriter
+from app.logging.logger import logger
+from config import settings
+
+
+# Passed to ifc2frag.cjs with every job; part of the conversion cache key
+CONVERTER_OPTIONS: Dict = {}
+
+_converter_version: Optional[str] = None
+_converter_version_retry_at = 0.0  # monotonic time before which a failed self-test is not rerun
+
+
+def converter_version() -> Optional[str]:
+    """Version tag of the converter as reported by `--self-test`, cached per process.
+
+    None when the self-test fails; conversions then run uncached, and the
+    self-test is retried after CONVERTER_VERSION_RETRY_SEC.
+    """
+    global _converter_version, _converter_version_retry_at
+    if _converter_version is None:
+        if time.monotonic() < _converter_version_retry_at:
+            return None
+        try:
+            result = subprocess.run(
+                [os.environ.get("NODE_BIN", "node"), CONVERTER_SCRIPT, "--self-test"],
+                capture_output=True, text=True, cwd=TSP_DIR, timeout=30
+            )
+            info = json.loads(result.stdout.strip().splitlines()[-1])
+        except (OSError, subprocess.TimeoutExpired, ValueError, IndexError) as e:
+            logger.log_error(f"Не удалось определить версию конвертера: {e}")
+            _converter_version_retry_at = time.monotonic() + settings.CONVERTER_VERSION_RETRY_SEC
+            return None
+        fragments = info.get("fragmentsVersion") if info.get("hasFragments") else None
+        _converter_version = f"ifc2frag-{info.get('converterVersion', '1')}/fragments-{fragments or 'none'}"
+    return _converter_version
+
+
+def frag_name_for(ifc_filename: str) -> str:
+    return os.path.splitext(ifc_filename)[0] + ".frag"
+
+
+def run_node_converter(in_path: str, out_path: str) -> Dict:
+    """Convert local files with a warm daemon, or a one-shot node process when daemons are disabled.
+
+    Returns the converter's reply; `fallback` is true when it wrote the placeholder copy.
+    """
+    if settings.CONVERTER_DAEMON_ENABLED:
+        result = get_daemon_pool().convert(in_path, out_path, CONVERTER_OPTIONS)
+        if not os.path.exists(out_path):
+            raise ConversionError("converter produced no output")
+        return result
+    return run_node_once(in_path, out_path)
+
+
+def run_node_once(in_path: str, out_path: str) -> Dict:
+    """Run ifc2frag.cjs on local files; raises ConversionError on failure or timeout."""
+    node_cmd = os.environ.get("NODE_BIN", "node")
+    try:
+        result = subprocess.run(
+            [node_cmd, CONVERTER_SCRIPT, in_path, out_path],
+            capture_output=True, text=True, cwd=TSP_DIR, timeout=settings.CONVERSION_TIMEOUT_SEC
+        )
+    except subprocess.TimeoutExpired:
+        raise ConversionError(f"converter timed out after {settings.CONVERSION_TIMEOUT_SEC}s")
+    except OSError as e:
+        raise ConversionError(f"converter could not start: {e}")
+    if result.returncode != 0:
+        raise ConversionError(f"converter exited with {result.returncode}: {result.stderr.strip()[-2000:]}")
+    if not os.path.exists(out_path):
+        raise ConversionError("converter produced no output")
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1])
+    except (ValueError, IndexError):
+        return {}
+
+
+def _register_frag(db: Session, storage, user_id: int, frag_name: str, size: int, blob_sha256: Optional[str]) -> None:
+    """Point the user's FRAG record at the stored output and charge its size."""
+    cleanup = StorageCleanup()
+    allowance = UploadAllowance(db, user_id, frag_name)
+    # Derived output is charged but never refused: the source already passed the quota
+    settled = False
+    try:
+        stage_file_record(db, user_id, frag_name, frag_name, "application/octet-stream", size, blob_sha256, allowance, cleanup, enforce_quota=False)
+        # References (this record and the cache entries) are written before the blob object is checked
+        if blob_sha256:
+            settled = storage.settle_blobs()
+            if not settled:
+                raise ConversionError("failed to store FRAG")
+        db.commit()
+    except Exception:
+        db.rollback()
+        if settled:
+            abandon_blobs(db, storage, {blob_sha256: size})
+        elif blob_sha256:
+            storage.drop_staged_blobs()
+        raise
+    cleanup.run_sync(db, storage)
+    invalidate_file_list(user_id, [frag_name])
+
+
+def convert_job(db: Session, storage, job: ConversionJob) -> Dict:
+    """Convert the job's IFC and register the FRAG.
+
+    Returns input/output sizes, the FRAG name and whether the result came
+    from the conversion cache.
+    """
+    user_id, ifc_filename = job.user_id, job.filename
+    frag_name = frag_name_for(ifc_filename)
+    use_cache = cache_enabled()
+    version = converter_version() if use_cache else None
+    source = db.query(FileModel.blob_sha256, FileModel.file_size).filter(
+        FileModel.user_id == user_id,
+        FileModel.filename == ifc_filename
+    ).first()
+    input_sha = source.blob_sha256 if source else None
+
+    def from_cache(sha: str, input_size: int, options: Dict = CONVERTER_OPTIONS) -> Optional[Dict]:
+        entry = lookup_cached_frag(db, sha, version, options)
+        if entry is None:
+            return None
+        _register_frag(db, storage, user_id, frag_name, entry.frag_size, entry.frag_sha256)
+        reason = "элементы не изменились" if options is CONTENT_KEY_OPTIONS else "тот же файл"
+        logger.log_file_operation(f"FRAG взят из кэша конвертации ({reason})", user_id, frag_name, "CONVERT")
+        return {"input_size": input_size, "output_size": entry.frag_size, "output_filename": frag_name, "cache_hit": True}
+
+    # Deduplicated sources already know their hash: a hit skips even the download,
+    # unless the element index still has to be read from the file
+    index_wanted = wants_element_index(ifc_filename)
+    needs_source = index_wanted and not (input_sha and element_index_current(db, user_id, ifc_filename, input_sha))
+    if version and input_sha and not needs_source:
+        cached = from_cache(input_sha, source.file_size)
+        if cached:
+            return cached
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        in_path = os.path.join(tmpdir, os.path.basename(ifc_filename))
+        out_path = os.path.join(tmpdir, frag_name)
+
+        # Stream the source (blob or legacy path) to disk, hashing it on the way
+        with open(in_path, "wb") as f:
+            writer = HashingWriter(f)
+            input_size = storage.download_object_to(resolve_object_name(db, user_id, ifc_filename), writer)
+        if input_size is None:
+            raise ConversionError(f"source file {ifc_filename} not found")
+        # Sources stored without an upload scan (resumable uploads) get ifc_metadata here
+        try:
+            backfill_ifc_metadata(db, user_id, ifc_filename, in_path)
+        except Exception as e:
+            db.rollback()
+            logger.log_error(f"Не удалось извлечь метаданные IFC {ifc_filename}: {e}")
+        if index_wanted:
+            try:
+                count = build_element_index(db, user_id, ifc_filename, in_path, input_sha or writer.hexdigest())
+                if count is not None:
+                    logger.log_file_operation(f"Индекс элементов построен: {count}", user_id, ifc_filename, "INDEX")
+            except Exception as e:
+                db.rollback()
+                logger.log_error(f"Не удалось построить индекс элементов {ifc_filename}: {e}")
+        if version and not input_sha:
+            input_sha = writer.hexdigest()
+            cached = from_cache(input_sha, input_size)
+            if cached:
+                return cached
+
+        # A revision whose elements all hash the same as a converted one reuses that FRAG
+        content_sha = None
+        if version and ifc_filename.lower().endswith(".ifc"):
+            try:
+                revision = record_revision(db, storage, user_id, ifc_filename, input_sha, in_path)
+                content_sha = revision.content_sha256 if revision.entity_count else None
+            except Exception as e:
+                db.rollback()
+                logger.log_error(f"Не удалось построить манифест {ifc_filename}: {e}")
+            if content_sha:
+                cached = from_cache(content_sha, input_size, CONTENT_KEY_OPTIONS)
+                if cached:
+                    return cached
+
+        reply = run_node_converter(in_path, out_path)
+        # A placeholder copy is served but never cached: it would stand in for
+        # the real FRAG of this input for the whole cache TTL
+        placeholder = isinstance(reply, dict) and bool(reply.get("fallback"))
+        if placeholder:
+            logger.log_error(f"Конвертер вернул заглушку вместо FRAG для {ifc_filename}")
+
+        # Upload FRAG back to storage straight from the file
+        output_size = os.path.getsize(out_path)
+        frag_sha = None
+        with open(out_path, "rb") as f:
+            if version:
+                frag_sha = storage.store_blob(HashingReader(f), "application/octet-stream")
+                stored = frag_sha is not None
+            else:
+                stored = storage.upload_user_file(user_id, frag_name, f, "application/octet-stream", output_size)
+        if not stored:
+            raise ConversionError("failed to store FRAG")
+
+    if frag_sha and not placeholder:
+        remember_frag(db, input_sha, version, CONVERTER_OPTIONS, frag_sha, output_size)
+        if content_sha:
+            remember_frag(db, content_sha, version, CONTENT_KEY_OPTIONS, frag_sha, output_size)
+    _register_frag(db, storage, user_id, frag_name, output_size, frag_sha)
+    logger.log_file_operation("FRAG создан и загружен", user_id, frag_name, "CONVERT")
+    return {"input_size": input_size, "output_size": output_size, "output_filename": frag_name, "cache_hit": False}
@@ -0,0 +1,268 @@
+"""
+Pool of long-lived `ifc2frag.cjs --serve` processes.
+
+Starting node, importing @thatopen/fragments and initialising web-ifc WASM
+costs seconds per process; a daemon pays it once and then converts files
+over newline-delimited JSON-RPC on stdin/stdout. Daemons are pinged before
+reuse when they have been idle, and recycled after CONVERTER_DAEMON_MAX_JOBS
+jobs or when their RSS passes CONVERTER_DAEMON_MAX_RSS_MB (WASM heaps only
+grow). A daemon that times out or breaks the protocol is killed.
+"""
+import json
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from app.conversion.errors import ConversionError
+from app.logging.logger import logger
+from config import settings
+
+TSP_DIR = os.path.abspath("TSP")
+CONVERTER_SCRIPT = os.path.join(TSP_DIR, "scripts", "ifc2frag.cjs")
+
+
+class NodeDaemon:
+    """One converter process speaking JSON-RPC over its stdin/stdout."""
+
+    def __init__(self, node_cmd: Optional[str] = None, script: str = CONVERTER_SCRIPT, cwd: str = TSP_DIR) -> None:
+        node_cmd = node_cmd or os.environ.get("NODE_BIN", "node")
+        try:
+            self.process = subprocess.Popen(
+                [node_cmd, script, "--serve"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                text=True, bufsize=1, cwd=cwd
+            )
+        except OSError as e:
+            raise ConversionError(f"converter daemon could not start: {e}")
+        self.jobs = 0
+        self.rss = 0
+        self.last_used = time.monotonic()
+        self._next_id = 0
+        self._lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._stderr: deque = deque(maxlen=50)
+        threading.Thread(target=self._pump, args=(self.process.stdout, self._lines.put), daemon=True).start()
+        threading.Thread(target=self._pump, args=(self.process.stderr, self._stderr.append), daemon=True).start()
+        ready = self._read(settings.CONVERTER_DAEMON_START_TIMEOUT_SEC)
+        if not ready.get("ready"):
+            self.kill()
+            raise ConversionError(f"converter daemon did not become ready: {ready}")
+        self.pid = ready.get("pid", self.process.pid)
+
+    @staticmethod
+    def _pump(stream, sink) -> None:
+        # Reader threads keep the pipes drained so node never blocks on a full buffer
+        for line in stream:
+            sink(line.rstrip("\n"))
+        sink(None)
+
+    def stderr_tail(self) -> str:
+        return "\n".join(line for line in self._stderr if line)[-2000:]
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read(self, timeout: float) -> Dict:
+        try:
+            line = self._lines.get(timeout=timeout)
+        except queue.Empty:
+            self.kill()
+            raise ConversionError(f"converter daemon timed out after {int(timeout)}s")
+        if line is None:
+            self.kill()
+            raise ConversionError(f"converter daemon exited: {self.stderr_tail()}")
+        try:
+            return json.loads(line)
+        except ValueError:
+            self.kill()
+            raise ConversionError(f"converter daemon sent invalid response: {line[:200]}")
+
+    def call(self, method: str, params: Optional[Dict] = None, timeout: float = 30) -> Dict:
+        if not self.alive():
+            raise ConversionError(f"converter daemon exited: {self.stderr_tail()}")
+        self._next_id += 1
+        request_id = self._next_id
+        try:
+            self.process.stdin.write(json.dumps({"id": request_id, "method": method, "params": params or {}}) + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            self.kill()
+            raise ConversionError(f"converter daemon pipe closed: {e}")
+        response = self._read(timeout)
+        if response.get("id") != request_id:
+            self.kill()
+            raise ConversionError("converter daemon response out of sequence")
+        self.last_used = time.monotonic()
+        result = response.get("result") or {}
+        self.rss = result.get("rss", self.rss)
+        if "error" in response:
+            raise ConversionError(response["error"].get("message") or "converter failed")
+        return result
+
+    def ping(self) -> bool:
+        try:
+            self.call("ping", timeout=10)
+            return True
+        except ConversionError:
+            return False
+
+    def convert(self, in_path: str, out_path: str, options: Optional[Dict] = None) -> Dict:
+        params = {"input": in_path, "output": out_path, "options": options or {}}
+        result = self.call("convert", params, timeout=settings.CONVERSION_TIMEOUT_SEC)
+        self.jobs += 1
+        return result
+
+    def kill(self) -> None:
+        if self.process.poll() is None:
+            self.process.kill()
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                pass
+
+    def close(self) -> None:
+        """Ask for a clean exit; kill if it does not comply."""
+        if self.alive():
+            try:
+                self.call("shutdown", timeout=5)
+                self.process.wait(timeout=5)
+            except (ConversionError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+class DaemonPool:
+    """Up to `size` warm daemons handed out one job at a time."""
+
+    def __init__(
+        self,
+        size: int = settings.CONVERTER_DAEMON_POOL_SIZE,
+        max_jobs: int = settings.CONVERTER_DAEMON_MAX_JOBS,
+        max_rss_mb: int = settings.CONVERTER_DAEMON_MAX_RSS_MB,
+        idle_check_sec: float = settings.CONVERTER_DAEMON_HEALTHCHECK_SEC,
+        factory=NodeDaemon,
+    ) -> None:
+        self.size = max(1, size)
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.idle_check_sec = idle_check_sec
+        self._factory = factory
+        self._idle: List[NodeDaemon] = []
+        self._lock = threading.Lock()
+        self._slots = threading.Semaphore(self.size)
+        self.started = 0
+        self.recycled = 0
+
+    def _spawn(self) -> NodeDaemon:
+        daemon = self._factory()
+        self.started += 1
+        logger.log_admin_action(f"Converter daemon started (pid {daemon.pid})", None, "CONVERTER_DAEMON")
+        return daemon
+
+    def _take(self) -> NodeDaemon:
+        while True:
+            with self._lock:
+                daemon = self._idle.pop() if self._idle else None
+            if daemon is None:
+                return self._spawn()
+            if daemon.alive() and (time.monotonic() - daemon.last_used < self.idle_check_sec or daemon.ping()):
+                return daemon
+            daemon.kill()
+
+    def _worn_out(self, daemon: NodeDaemon) -> Optional[str]:
+        if self.max_jobs and daemon.jobs >= self.max_jobs:
+            return f"{daemon.jobs} jobs"
+        if self.max_rss and daemon.rss >= self.max_rss:
+            return f"rss {daemon.rss // (1024 * 1024)} MB"
+        return None
+
+    @contextmanager
+    def acquire(self) -> Iterator[NodeDaemon]:
+        with self._slots:
+            daemon = self._take()
+            try:
+                yield daemon
+            finally:
+                reason = None if daemon.alive() else "exited"
+                reason = reason or self._worn_out(daemon)
+                if reason:
+                    self.recycled += 1
+                    logger.log_admin_action(f"Converter daemon recycled (pid {daemon.pid}): {reason}", None, "CONVERTER_DAEMON")
+                    daemon.close()
+                else:
+                    with self._lock:
+                        self._idle.append(daemon)
+
+    def convert(self, in_path: str, out_path: str, options: Optional[Dict] = None) -> Dict:
+        with self.acquire() as daemon:
+            return daemon.convert(in_path, out_path, options)
+
+    def health_check(self) -> Dict:
+        """Ping idle daemons, dropping the ones that do not answer."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        healthy = [d for d in idle if d.alive() and d.ping()]
+        for daemon in idle:
+            if daemon not in healthy:
+                daemon.kill()
+        with self._lock:
+            self._idle.extend(healthy)
+        return {
+            "idle": len(healthy),
+            "dropped": len(idle) - len(healthy),
+            "started": self.started,
+            "recycled": self.recycled,
+            "daemons": [{"pid": d.pid, "jobs": d.jobs, "rss": d.rss} for d in healthy],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for daemon in idle:
+            daemon.close()
+
+
+_pool: Optional[DaemonPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_daemon_pool() -> DaemonPool:
+    """Per-process pool (each conversion worker child owns its daemons)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DaemonPool()
+        return _pool
+
+
+def close_daemon_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+def start_daemon_health_checks(interval: float = settings.CONVERTER_DAEMON_HEALTHCHECK_SEC) -> threading.Event:
+    """Ping this process's idle daemons every `interval` seconds; set the returned event to stop."""
+    stop = threading.Event()
+
+    def _loop() -> None:
+        while not stop.wait(interval):
+            pool = _pool
+            if pool is None:
+                continue
+            try:
+                report = pool.health_check()
+                if report["dropped"]:
+                    logger.log_error(f"Конвертер: удалено неотвечающих демонов: {report['dropped']}")
+            except Exception as e:
+                logger.log_error(f"Проверка демонов конвертера не удалась: {e}")
+
+    if interval > 0:
+        threading.Thread(target=_loop, name="converter-daemon-health", daemon=True).start()
+    return stop
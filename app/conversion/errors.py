@@ -0,0 +1,2 @@
+class ConversionError(Exception):
+    """A conversion attempt failed; the message is stored on the job."""
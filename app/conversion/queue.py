@@ -0,0 +1,297 @@
+"""
+Durable IFC -> FRAG job queue on the `conversion_jobs` table.
+
+Jobs survive web and worker restarts. Workers claim a job with a
+conditional UPDATE (only one claimant can flip it from queued to running),
+renew a heartbeat while it runs, and report the outcome. Outcomes are
+written only while the reporting worker still holds the lease, so a worker
+whose job was re-queued and claimed again cannot overwrite the new
+owner's result. Failed attempts are re-queued with exponential backoff
+until `max_attempts`; jobs whose worker stopped heartbeating are re-queued
+by `requeue_stale_jobs`. A unique partial index keeps at most one queued
+job per file.
+
+Scheduling: jobs are `interactive` (someone is waiting in the viewer) or
+`batch` (conversions triggered by uploads). Classes share workers by stride
+scheduling with CONVERSION_*_WEIGHT, so interactive jobs go first without
+starving batch. Within a class the next job goes to the user with the
+fewest running jobs (oldest job first on ties), and users already running
+CONVERSION_MAX_RUNNING_PER_USER jobs are skipped. The cap is read from the
+table, so it holds across workers up to a race of one job.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.conversion_job import ConversionJob
+from app.logging.logger import logger
+from config import settings
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_aware(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands back naive datetimes
+    if value is None or value.tzinfo:
+        return value
+    return value.replace(tzinfo=timezone.utc)
+
+
+PRIORITY_CLASSES = ("interactive", "batch")
+
+
+def class_weights() -> Dict[str, int]:
+    return {
+        "interactive": max(1, settings.CONVERSION_INTERACTIVE_WEIGHT),
+        "batch": max(1, settings.CONVERSION_BATCH_WEIGHT),
+    }
+
+
+def enqueue_conversion(db: Session, user_id: int, filename: str, priority: str = "batch") -> ConversionJob:
+    """Queue a job for the user's IFC file and commit it.
+
+    A job already pending for the same file is reused (and raised to
+    `interactive` when asked), so repeated uploads or clicks do not pile up.
+    """
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"unknown priority {priority}")
+    while True:
+        pending = _queued_job(db, user_id, filename)
+        if pending is not None:
+            break
+        job = ConversionJob(
+            user_id=user_id,
+            filename=filename,
+            status="queued",
+            priority=priority,
+            attempts=0,
+            max_attempts=settings.CONVERSION_MAX_ATTEMPTS,
+            available_at=_utcnow(),
+        )
+        try:
+            with db.begin_nested():
+                db.add(job)
+        except IntegrityError:
+            continue  # queued by a concurrent request in between; reuse that job
+        db.commit()
+        db.refresh(job)
+        return job
+    if priority == "interactive" and pending.priority != "interactive":
+        pending.priority = "interactive"
+        db.commit()
+    return pending
+
+
+def _queued_job(db: Session, user_id: int, filename: str) -> Optional[ConversionJob]:
+    return db.query(ConversionJob).filter(
+        ConversionJob.user_id == user_id,
+        ConversionJob.filename == filename,
+        ConversionJob.status == "queued"
+    ).first()
+
+
+class StrideScheduler:
+    """Weighted round-robin over priority classes (stride scheduling).
+
+    Each class advances its pass by 1/weight per claimed job and the class
+    with the lowest pass goes next. A class with nothing to run does not
+    bank credit: its pass is pulled up to the class that was served.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None) -> None:
+        self.weights = weights or class_weights()
+        self.passes = {name: 0.0 for name in PRIORITY_CLASSES}
+
+    def order(self) -> List[str]:
+        return sorted(PRIORITY_CLASSES, key=lambda name: (self.passes[name], PRIORITY_CLASSES.index(name)))
+
+    def served(self, name: str, idle: Iterable[str]) -> None:
+        self.passes[name] += 1.0 / self.weights[name]
+        for other in idle:
+            self.passes[other] = max(self.passes[other], self.passes[name])
+
+
+def running_per_user(db: Session) -> Dict[int, int]:
+    return dict(db.query(ConversionJob.user_id, func.count(ConversionJob.id)).filter(
+        ConversionJob.status == "running"
+    ).group_by(ConversionJob.user_id).all())
+
+
+def _fair_candidates(db: Session, priority: str, now: datetime, running: Dict[int, int]) -> List[int]:
+    """Oldest runnable job of each user in the class, least-served users first."""
+    cap = settings.CONVERSION_MAX_RUNNING_PER_USER
+    heads = db.query(ConversionJob.user_id, func.min(ConversionJob.id)).filter(
+        ConversionJob.status == "queued",
+        ConversionJob.priority == priority,
+        ConversionJob.available_at <= now
+    ).group_by(ConversionJob.user_id).all()
+    heads = [(user_id, job_id) for user_id, job_id in heads if not cap or running.get(user_id, 0) < cap]
+    heads.sort(key=lambda head: (running.get(head[0], 0), head[1]))
+    return [job_id for _, job_id in heads]
+
+
+def _claim(db: Session, job_id: int, worker_id: str, now: datetime) -> Optional[ConversionJob]:
+    claimed = db.query(ConversionJob).filter(
+        ConversionJob.id == job_id,
+        ConversionJob.status == "queued"
+    ).update({
+        ConversionJob.status: "running",
+        ConversionJob.worker_id: worker_id,
+        ConversionJob.attempts: ConversionJob.attempts + 1,
+        ConversionJob.started_at: now,
+        ConversionJob.heartbeat_at: now,
+        ConversionJob.error: None,
+    }, synchronize_session=False)
+    db.commit()
+    if not claimed:
+        return None
+    job = db.get(ConversionJob, job_id)
+    if job.attempts == 1:
+        created_at = _as_aware(job.created_at)
+        if created_at is not None:
+            job.wait_ms = max(int((now - created_at).total_seconds() * 1000), 0)
+            db.commit()
+    return job
+
+
+_default_scheduler: Optional[StrideScheduler] = None
+
+
+def claim_next_job(db: Session, worker_id: str, scheduler: Optional[StrideScheduler] = None) -> Optional[ConversionJob]:
+    """Atomically move the next job (by class weight and user fairness) to `running` for this worker."""
+    global _default_scheduler
+    if scheduler is None:
+        _default_scheduler = _default_scheduler or StrideScheduler()
+        scheduler = _default_scheduler
+    now = _utcnow()
+    running = running_per_user(db)
+    idle = []
+    for priority in scheduler.order():
+        for job_id in _fair_candidates(db, priority, now, running):
+            job = _claim(db, job_id, worker_id, now)
+            if job is not None:
+                scheduler.served(priority, idle)
+                return job
+        idle.append(priority)
+    return None
+
+
+def heartbeat_jobs(db: Session, job_ids: Iterable[int], worker_id: str) -> None:
+    """Renew the lease on jobs this worker is still running."""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    db.query(ConversionJob).filter(
+        ConversionJob.id.in_(job_ids),
+        ConversionJob.worker_id == worker_id,
+        ConversionJob.status == "running"
+    ).update({ConversionJob.heartbeat_at: _utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def _duration_ms(job: ConversionJob, finished_at: datetime) -> Optional[int]:
+    started_at = _as_aware(job.started_at)
+    if started_at is None:
+        return None
+    return int((finished_at - started_at).total_seconds() * 1000)
+
+
+def _leased(db: Session, job_id: int, worker_id: str):
+    """The job, as long as `worker_id` still runs it."""
+    return db.query(ConversionJob).filter(
+        ConversionJob.id == job_id,
+        ConversionJob.status == "running",
+        ConversionJob.worker_id == worker_id
+    )
+
+
+def _lease_lost(job: ConversionJob, worker_id: str) -> None:
+    logger.log_error(f"Конвертация {job.filename} (job {job.id}): воркер {worker_id} потерял аренду, результат отброшен")
+
+
+def complete_job(db: Session, job_id: int, worker_id: str, input_size: int, output_size: int, output_filename: str, cache_hit: bool = False) -> bool:
+    """Record a successful run; False when `worker_id` no longer holds the lease (nothing is written)."""
+    job = db.get(ConversionJob, job_id)
+    if job is None:
+        return False
+    now = _utcnow()
+    updated = _leased(db, job_id, worker_id).update({
+        ConversionJob.status: "done",
+        ConversionJob.finished_at: now,
+        ConversionJob.duration_ms: _duration_ms(job, now),
+        ConversionJob.input_size: input_size,
+        ConversionJob.output_size: output_size,
+        ConversionJob.output_filename: output_filename,
+        ConversionJob.cache_hit: cache_hit,
+        ConversionJob.error: None,
+    }, synchronize_session=False)
+    db.commit()
+    if not updated:
+        _lease_lost(job, worker_id)
+    return bool(updated)
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff after the given number of attempts."""
+    return settings.CONVERSION_RETRY_BACKOFF_SEC * (2 ** max(attempts - 1, 0))
+
+
+def fail_job(db: Session, job_id: int, worker_id: str, error: str, stale_before: Optional[datetime] = None) -> Optional[str]:
+    """Record a failed attempt; re-queue with backoff while attempts remain.
+
+    Returns the new status, or None when `worker_id` no longer holds the
+    lease (or, with `stale_before`, renewed it since). A retry is not
+    re-queued when the file already has a newer queued job.
+    """
+    job = db.get(ConversionJob, job_id)
+    if job is None:
+        return "failed"
+    now = _utcnow()
+    leased = _leased(db, job_id, worker_id)
+    if stale_before is not None:
+        leased = leased.filter(ConversionJob.heartbeat_at < stale_before)
+    error = (error or "")[-4000:]
+    values = {ConversionJob.error: error, ConversionJob.duration_ms: _duration_ms(job, now)}
+    failed = {ConversionJob.status: "failed", ConversionJob.finished_at: now}
+    attempts, max_attempts = job.attempts, job.max_attempts
+    new_status = "queued" if attempts < max_attempts else "failed"
+    if new_status == "queued":
+        try:
+            with db.begin_nested():
+                updated = leased.update({
+                    **values,
+                    ConversionJob.status: "queued",
+                    ConversionJob.worker_id: None,
+                    ConversionJob.available_at: now + timedelta(seconds=retry_delay(attempts)),
+                }, synchronize_session=False)
+        except IntegrityError:
+            new_status = "failed"
+    if new_status == "failed":
+        updated = leased.update({**values, **failed}, synchronize_session=False)
+    db.commit()
+    if not updated:
+        _lease_lost(job, worker_id)
+        return None
+    logger.log_error(f"Конвертация {job.filename} (job {job.id}, попытка {attempts}/{max_attempts}): {error}")
+    return new_status
+
+
+def requeue_stale_jobs(db: Session, lease_sec: Optional[float] = None) -> int:
+    """Recover jobs left `running` by a worker that stopped heartbeating."""
+    lease_sec = settings.CONVERSION_LEASE_SEC if lease_sec is None else lease_sec
+    cutoff = _utcnow() - timedelta(seconds=lease_sec)
+    stale = [(job.id, job.worker_id) for job in db.query(ConversionJob).filter(
+        ConversionJob.status == "running",
+        ConversionJob.heartbeat_at < cutoff
+    ).all()]
+    requeued = 0
+    for job_id, worker_id in stale:
+        # Skipped when the worker heartbeated or finished in the meantime
+        if fail_job(db, job_id, worker_id, f"worker {worker_id} lost (no heartbeat for {int(lease_sec)}s)", stale_before=cutoff):
+            requeued += 1
+    return requeued
@@ -0,0 +1,114 @@
+"""
+Element-level revision tracking for incremental conversion.
+
+Each converted IFC gets a manifest (GlobalId -> content hash, see
+app.ifc.manifest) stored once per input hash under manifests/. A new upload
+of the same file is diffed against the previous revision; when no element
+changed (a re-export with new timestamps, renumbered instances or a touched
+header) the previous FRAG is reused through the conversion cache keyed by
+the manifest digest instead of the file bytes.
+
+Only the latest revision of a file is ever diffed against, so a manifest is
+deleted once no file's latest revision points at it; the revision rows
+themselves are kept as history until their file is deleted.
+"""
+import io
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.ifc.manifest import build_manifest, diff_manifests, dump_manifest, load_manifest, manifest_digest
+from app.models.ifc_revision import IfcRevision
+from app.logging.logger import logger
+
+# Cache option set for entries keyed by manifest digest rather than file bytes
+CONTENT_KEY_OPTIONS = {"key": "ifc-content"}
+
+
+def manifest_object_name(input_sha256: str) -> str:
+    return f"manifests/{input_sha256}.json.gz"
+
+
+def unused_manifests(db: Session, input_sha256s: Iterable[Optional[str]]) -> List[str]:
+    """Manifest objects of these inputs that no file's latest revision uses any more.
+
+    Call in the transaction that superseded or deleted the revisions (flushed)
+    and delete the returned objects after it commits.
+    """
+    shas = {sha for sha in input_sha256s if sha}
+    if not shas:
+        return []
+    latest = db.query(func.max(IfcRevision.id)).group_by(IfcRevision.user_id, IfcRevision.filename)
+    in_use = {row[0] for row in db.query(IfcRevision.input_sha256).filter(
+        IfcRevision.id.in_(latest),
+        IfcRevision.input_sha256.in_(shas)
+    ).distinct()}
+    return [manifest_object_name(sha) for sha in sorted(shas - in_use)]
+
+
+def delete_revisions(db: Session, user_id: int, filenames: Optional[Iterable[str]] = None) -> List[str]:
+    """Drop the revision history of the user's files (all of them when `filenames` is None).
+
+    Runs in the caller's transaction; returns the manifest objects to delete after the commit.
+    """
+    query = db.query(IfcRevision).filter(IfcRevision.user_id == user_id)
+    if filenames is not None:
+        names = list(filenames)
+        if not names:
+            return []
+        query = query.filter(IfcRevision.filename.in_(names))
+    shas = [row[0] for row in query.with_entities(IfcRevision.input_sha256).distinct()]
+    if not shas:
+        return []
+    query.delete(synchronize_session=False)
+    db.flush()
+    return unused_manifests(db, shas)
+
+
+def _load(storage, revision: IfcRevision) -> Optional[dict]:
+    data = storage.download_object(revision.manifest_path)
+    return load_manifest(data) if data else None
+
+
+def record_revision(db: Session, storage, user_id: int, filename: str, input_sha256: str, in_path: str) -> IfcRevision:
+    """Build (or reuse) the manifest of this input and diff it against the file's previous revision."""
+    previous = db.query(IfcRevision).filter(
+        IfcRevision.user_id == user_id,
+        IfcRevision.filename == filename
+    ).order_by(IfcRevision.id.desc()).first()
+    known = db.query(IfcRevision).filter(IfcRevision.input_sha256 == input_sha256).first()
+
+    manifest = _load(storage, known) if known else None
+    if manifest is None:
+        with open(in_path, "rb") as f:
+            manifest = build_manifest(f)
+        data = dump_manifest(manifest)
+        if not storage.upload_object(manifest_object_name(input_sha256), io.BytesIO(data), "application/gzip", len(data)):
+            logger.log_error(f"Не удалось сохранить манифест ревизии {filename}")
+
+    revision = IfcRevision(
+        user_id=user_id,
+        filename=filename,
+        input_sha256=input_sha256,
+        content_sha256=manifest_digest(manifest),
+        manifest_path=manifest_object_name(input_sha256),
+        entity_count=len(manifest),
+        previous_id=previous.id if previous else None,
+    )
+    previous_manifest = _load(storage, previous) if previous else None
+    if previous_manifest is not None:
+        diff = diff_manifests(previous_manifest, manifest)
+        revision.added_count = len(diff.added)
+        revision.removed_count = len(diff.removed)
+        revision.changed_count = len(diff.changed)
+    db.add(revision)
+    db.flush()
+    stale = unused_manifests(db, [previous.input_sha256]) if previous else []
+    db.commit()
+    if stale:
+        try:
+            storage.delete_objects(stale)
+        except Exception as e:
+            logger.log_error(f"Не удалось удалить устаревший манифест {filename}: {e}")
+    return revision
@@ -0,0 +1,191 @@
+"""
+Read side of the conversion queue: job payloads for the status API,
+waiting for a job to change (long-poll and SSE) and aggregate queue metrics.
+"""
+import json
+from datetime import timedelta
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import anyio
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.conversion.queue import PRIORITY_CLASSES, _as_aware, _utcnow
+from app.models.conversion_job import ConversionJob
+from config import settings
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+def _iso(value) -> Optional[str]:
+    value = _as_aware(value)
+    return value.isoformat() if value else None
+
+
+def job_payload(job: ConversionJob) -> Dict:
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "output_filename": job.output_filename,
+        "status": job.status,
+        "priority": job.priority,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "error": job.error,
+        "input_size": job.input_size,
+        "output_size": job.output_size,
+        "duration_ms": job.duration_ms,
+        "wait_ms": job.wait_ms,
+        "cache_hit": bool(job.cache_hit),
+        "created_at": _iso(job.created_at),
+        "started_at": _iso(job.started_at),
+        "finished_at": _iso(job.finished_at),
+        "retry_at": _iso(job.available_at) if job.status == "queued" and job.attempts else None,
+    }
+
+
+def get_user_job(db: Session, user_id: int, job_id: int) -> ConversionJob:
+    job = db.query(ConversionJob).filter(
+        ConversionJob.id == job_id,
+        ConversionJob.user_id == user_id
+    ).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Conversion job not found")
+    return job
+
+
+def list_user_jobs(db: Session, user_id: int, filename: Optional[str] = None, limit: int = 50) -> List[ConversionJob]:
+    query = db.query(ConversionJob).filter(ConversionJob.user_id == user_id)
+    if filename:
+        query = query.filter(ConversionJob.filename == filename)
+    return query.order_by(ConversionJob.id.desc()).limit(limit).all()
+
+
+def _snapshot(db: Session, user_id: int, job_id: int) -> Dict:
+    # Ending the transaction returns the connection to the pool between polls
+    # and expires the identity map, so the next poll sees what workers committed
+    try:
+        return job_payload(get_user_job(db, user_id, job_id))
+    finally:
+        db.rollback()
+
+
+def _session_snapshot(open_session: Callable[[], Session], user_id: int, job_id: int) -> Dict:
+    db = open_session()
+    try:
+        return job_payload(get_user_job(db, user_id, job_id))
+    finally:
+        db.close()
+
+
+def _changed(before: Dict, after: Dict) -> bool:
+    return (before["status"], before["attempts"]) != (after["status"], after["attempts"])
+
+
+async def wait_for_job(db: Session, user_id: int, job_id: int, timeout: float) -> Dict:
+    """Long-poll: return once the job leaves its current state, finishes, or `timeout` elapses."""
+    payload = await anyio.to_thread.run_sync(_snapshot, db, user_id, job_id)
+    timeout = min(max(timeout, 0), settings.CONVERSION_WAIT_MAX_SEC)
+    with anyio.move_on_after(timeout):
+        while payload["status"] not in TERMINAL_STATUSES:
+            await anyio.sleep(settings.CONVERSION_STATUS_POLL_SEC)
+            current = await anyio.to_thread.run_sync(_snapshot, db, user_id, job_id)
+            if _changed(payload, current):
+                return current
+            payload = current
+    return payload
+
+
+async def job_events(open_session: Callable[[], Session], user_id: int, job_id: int) -> AsyncIterator[str]:
+    """SSE stream: one `status` event per state change, ending with the terminal state.
+
+    The stream outlives the request's dependencies, and holding a pooled
+    connection for its whole life would let a few dozen viewers exhaust the
+    pool, so every poll opens a short-lived session with `open_session`.
+    """
+    payload = await anyio.to_thread.run_sync(_session_snapshot, open_session, user_id, job_id)
+    yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+    idle = 0.0
+    while payload["status"] not in TERMINAL_STATUSES:
+        await anyio.sleep(settings.CONVERSION_STATUS_POLL_SEC)
+        current = await anyio.to_thread.run_sync(_session_snapshot, open_session, user_id, job_id)
+        if _changed(payload, current):
+            yield f"event: status\ndata: {json.dumps(current)}\n\n"
+            idle = 0.0
+        else:
+            idle += settings.CONVERSION_STATUS_POLL_SEC
+            if idle >= 15:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keep-alive\n\n"
+                idle = 0.0
+        payload = current
+
+
+def _percentile(values: List[int], fraction: float) -> Optional[int]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def _class_metrics(db: Session, priority: str, now, since) -> Dict:
+    """Depth and queue wait (creation to first start) of one priority class."""
+    queued, oldest = db.query(func.count(ConversionJob.id), func.min(ConversionJob.created_at)).filter(
+        ConversionJob.status == "queued",
+        ConversionJob.priority == priority
+    ).one()
+    running = db.query(func.count(ConversionJob.id)).filter(
+        ConversionJob.status == "running",
+        ConversionJob.priority == priority
+    ).scalar()
+    waits = [row[0] for row in db.query(ConversionJob.wait_ms).filter(
+        ConversionJob.priority == priority,
+        ConversionJob.wait_ms.isnot(None),
+        ConversionJob.started_at >= since
+    ).order_by(ConversionJob.started_at.desc()).limit(5000).all()]
+    oldest = _as_aware(oldest)
+    return {
+        "queued": queued,
+        "running": running or 0,
+        "oldest_queued_age_sec": int((now - oldest).total_seconds()) if oldest else None,
+        "started": len(waits),
+        "wait_avg_ms": int(sum(waits) / len(waits)) if waits else None,
+        "wait_p95_ms": _percentile(waits, 0.95),
+        "wait_max_ms": max(waits) if waits else None,
+    }
+
+
+def queue_metrics(db: Session, window_sec: Optional[int] = None) -> Dict:
+    """Queue depth by status and throughput/latency over the recent window."""
+    window_sec = window_sec or settings.CONVERSION_METRICS_WINDOW_SEC
+    now = _utcnow()
+    since = now - timedelta(seconds=window_sec)
+    depth = dict(db.query(ConversionJob.status, func.count(ConversionJob.id)).filter(
+        ConversionJob.status.in_(("queued", "running"))
+    ).group_by(ConversionJob.status).all())
+    oldest_queued = db.query(func.min(ConversionJob.created_at)).filter(ConversionJob.status == "queued").scalar()
+    finished = dict(db.query(ConversionJob.status, func.count(ConversionJob.id)).filter(
+        ConversionJob.status.in_(TERMINAL_STATUSES),
+        ConversionJob.finished_at >= since
+    ).group_by(ConversionJob.status).all())
+    avg_ms, out_bytes = db.query(func.avg(ConversionJob.duration_ms), func.sum(ConversionJob.output_size)).filter(
+        ConversionJob.status == "done",
+        ConversionJob.finished_at >= since
+    ).one()
+    workers = db.query(func.count(func.distinct(ConversionJob.worker_id))).filter(ConversionJob.status == "running").scalar()
+    done = finished.get("done", 0)
+    oldest_queued = _as_aware(oldest_queued)
+    return {
+        "classes": {name: _class_metrics(db, name, now, since) for name in PRIORITY_CLASSES},
+        "queued": depth.get("queued", 0),
+        "running": depth.get("running", 0),
+        "active_workers": workers or 0,
+        "oldest_queued_age_sec": int((now - oldest_queued).total_seconds()) if oldest_queued else None,
+        "window_sec": window_sec,
+        "done": done,
+        "failed": finished.get("failed", 0),
+        "throughput_per_min": round(done * 60 / window_sec, 3),
+        "avg_duration_ms": int(avg_ms) if avg_ms is not None else None,
+        "output_bytes": int(out_bytes or 0),
+    }
@@ -0,0 +1,180 @@
+"""
+Conversion worker: a separate process that drains the conversion queue.
+
+    python -m app.conversion.worker [--processes N] [--poll-interval SEC]
+
+The dispatcher loop claims jobs from the database and runs each one in a
+process pool of N children, so conversion CPU never competes with the web
+workers and throughput scales by starting more workers (on any host that
+can reach the database and MinIO). In-flight jobs are heartbeated; if this
+process dies, another worker re-queues them once their lease expires.
+"""
+import argparse
+import atexit
+import os
+import signal
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing.util import Finalize
+from typing import Callable, Dict, Optional
+
+from app.conversion.converter import ConversionError, convert_job
+from app.conversion.daemon import close_daemon_pool, start_daemon_health_checks
+from app.conversion.queue import StrideScheduler, claim_next_job, complete_job, fail_job, heartbeat_jobs, requeue_stale_jobs
+from app.database.connection import SessionLocal, engine
+from app.models.conversion_job import ConversionJob
+from app.storage.service import StorageService
+from app.logging.logger import logger
+from config import settings
+
+
+def _init_child() -> None:
+    # Connections inherited from the parent must not be shared across processes
+    engine.dispose(close=False)
+    if settings.CONVERTER_DAEMON_ENABLED:
+        # Idle daemons are pinged on schedule and closed when the child exits.
+        # Forked pool children skip atexit, so the multiprocessing finalizer covers them.
+        start_daemon_health_checks()
+        Finalize(None, close_daemon_pool, exitpriority=10)
+        atexit.register(close_daemon_pool)
+
+
+def execute_job(job_id: int) -> Dict:
+    """Run one job in a pool process with its own DB session and storage client."""
+    db = SessionLocal()
+    try:
+        job = db.get(ConversionJob, job_id)
+        if job is None:
+            raise ConversionError(f"job {job_id} not found")
+        return convert_job(db, StorageService(), job)
+    finally:
+        db.close()
+
+
+class ConversionWorker:
+    """Claims queued jobs into free pool slots and records their outcome."""
+
+    def __init__(
+        self,
+        processes: int = settings.CONVERSION_WORKER_PROCESSES,
+        worker_id: Optional[str] = None,
+        session_factory: Callable = SessionLocal,
+        executor_factory: Optional[Callable[[int], Executor]] = None,
+        job_runner: Callable[[int], Dict] = execute_job,
+    ) -> None:
+        self.processes = max(1, processes)
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._session_factory = session_factory
+        self._executor_factory = executor_factory or (
+            lambda n: ProcessPoolExecutor(max_workers=n, initializer=_init_child)
+        )
+        self._job_runner = job_runner
+        self._executor = self._executor_factory(self.processes)
+        self._in_flight: Dict[int, Future] = {}
+        self._scheduler = StrideScheduler()
+        self._last_heartbeat = 0.0
+        self._stop = threading.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def dispatch(self) -> int:
+        """Fill free slots with claimed jobs; returns how many were started."""
+        started = 0
+        db = self._session_factory()
+        try:
+            while len(self._in_flight) < self.processes:
+                job = claim_next_job(db, self.worker_id, self._scheduler)
+                if job is None:
+                    break
+                logger.log_file_operation(f"Конвертация начата (job {job.id}, {job.priority}, попытка {job.attempts})", job.user_id, job.filename, "CONVERT")
+                self._in_flight[job.id] = self._executor.submit(self._job_runner, job.id)
+                started += 1
+        finally:
+            db.close()
+        return started
+
+    def reap(self) -> int:
+        """Record results of finished jobs; returns how many finished."""
+        finished = [(job_id, fut) for job_id, fut in self._in_flight.items() if fut.done()]
+        if not finished:
+            return 0
+        broken = False
+        db = self._session_factory()
+        try:
+            for job_id, fut in finished:
+                del self._in_flight[job_id]
+                try:
+                    result = fut.result()
+                    complete_job(
+                        db, job_id, self.worker_id, result["input_size"], result["output_size"], result["output_filename"],
+                        result.get("cache_hit", False)
+                    )
+                except BrokenProcessPool as e:
+                    broken = True
+                    fail_job(db, job_id, self.worker_id, f"worker process died: {e}")
+                except Exception as e:
+                    fail_job(db, job_id, self.worker_id, str(e) or e.__class__.__name__)
+        finally:
+            db.close()
+        if broken:
+            # A crashed child poisons the whole pool; start a fresh one
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._executor_factory(self.processes)
+        return len(finished)
+
+    def heartbeat(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_heartbeat < settings.CONVERSION_LEASE_SEC / 4:
+            return
+        self._last_heartbeat = now
+        db = self._session_factory()
+        try:
+            heartbeat_jobs(db, self._in_flight.keys(), self.worker_id)
+            requeue_stale_jobs(db)
+        finally:
+            db.close()
+
+    def run(self, poll_interval: float = settings.CONVERSION_POLL_INTERVAL_SEC) -> None:
+        logger.log_admin_action(f"Conversion worker {self.worker_id} started with {self.processes} processes", None, "CONVERSION_WORKER")
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.reap()
+                    self.heartbeat()
+                    started = self.dispatch()
+                except Exception as e:
+                    logger.log_error(f"Conversion worker loop error: {e}")
+                    started = 0
+                if not started:
+                    self._stop.wait(poll_interval)
+            # Let running conversions finish and record them before exiting
+            while self._in_flight:
+                self.heartbeat()
+                self.reap()
+                time.sleep(0.5)
+        finally:
+            self._executor.shutdown(wait=True)
+            # Daemons started in this process (in-process executors) go with it
+            close_daemon_pool()
+            logger.log_admin_action(f"Conversion worker {self.worker_id} stopped", None, "CONVERSION_WORKER")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="IFC -> FRAG conversion worker")
+    parser.add_argument("--processes", type=int, default=settings.CONVERSION_WORKER_PROCESSES)
+    parser.add_argument("--poll-interval", type=float, default=settings.CONVERSION_POLL_INTERVAL_SEC)
+    args = parser.parse_args()
+
+    worker = ConversionWorker(processes=args.processes)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run(poll_interval=args.poll_interval)
+
+
+if __name__ == "__main__":
+    main()
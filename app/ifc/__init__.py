@@ -0,0 +1,6 @@
+"""
+IFC (ISO 10303-21 / STEP) reading helpers that work on files of any size.
+"""
+from .step import StepEntity, iter_step, parse_args
+
+__all__ = ["StepEntity", "iter_step", "parse_args"]
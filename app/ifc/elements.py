@@ -0,0 +1,176 @@
+"""
+Element records of an IFC file for the server-side element index.
+
+One record per rooted entity (anything with a GlobalId except relationships
+and property definitions): its class, name, containing storey and its
+property and quantity sets flattened to (set, property, value) triples.
+Storeys follow IfcRelContainedInSpatialStructure and, for spaces and parts,
+IfcRelAggregates/IfcRelNests up to the nearest IfcBuildingStorey. Type
+properties (IfcRelDefinesByType) apply unless the occurrence overrides them.
+
+The file is streamed; only elements, relationships and property entities
+are kept while reading, unless bounding boxes are asked for, which needs
+the placement and geometry instances as well.
+"""
+from typing import BinaryIO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from app.ifc.geometry import Box, BoundsResolver
+from app.ifc.manifest import GLOBAL_ID_RE
+from app.ifc.step import Enum, Ref, Typed, iter_step, parse_args
+
+PROPERTY_TYPES = {"IFCPROPERTYSINGLEVALUE", "IFCPROPERTYENUMERATEDVALUE"}
+QUANTITY_TYPES = {
+    "IFCQUANTITYLENGTH", "IFCQUANTITYAREA", "IFCQUANTITYVOLUME",
+    "IFCQUANTITYCOUNT", "IFCQUANTITYWEIGHT", "IFCQUANTITYTIME", "IFCQUANTITYNUMBER",
+}
+SET_TYPES = {"IFCPROPERTYSET", "IFCELEMENTQUANTITY"}
+RELATION_TYPES = {
+    "IFCRELCONTAINEDINSPATIALSTRUCTURE", "IFCRELAGGREGATES", "IFCRELNESTS",
+    "IFCRELDEFINESBYPROPERTIES", "IFCRELDEFINESBYTYPE",
+}
+KEPT_TYPES = PROPERTY_TYPES | QUANTITY_TYPES | SET_TYPES | RELATION_TYPES
+MAX_DEPTH = 64
+
+
+class ElementRecord(NamedTuple):
+    global_id: str
+    ifc_class: str
+    name: Optional[str]
+    storey_id: Optional[str]  # GlobalId of the containing IfcBuildingStorey
+    storey: Optional[str]  # its name
+    properties: List[Tuple[str, str, str]]  # (set name, property name, value)
+    bounds: Optional[Box] = None  # world AABB in metres
+
+
+def format_value(value) -> Optional[str]:
+    """Property value as searchable text: IFCLABEL('EI60') -> 'EI60', .T. -> 'true', 2.0 -> '2'."""
+    if isinstance(value, Typed):
+        return format_value(value.args[0]) if value.args else None
+    if isinstance(value, Enum):
+        return {"T": "true", "F": "false", "U": "unknown"}.get(value, value)
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        text = repr(value)
+        return text[:-2] if text.endswith(".0") else text
+    if isinstance(value, list):
+        parts = [format_value(v) for v in value]
+        return ", ".join(p for p in parts if p is not None) or None
+    if value is None or value == "*":
+        return None
+    return str(value)
+
+
+def _refs(value) -> List[int]:
+    return [int(v) for v in value if isinstance(v, Ref)] if isinstance(value, list) else []
+
+
+def extract_elements(stream: BinaryIO, bounds: bool = False) -> Iterator[ElementRecord]:
+    """Element records of a STEP file; yields nothing for other content."""
+    elements: Dict[int, Tuple[str, str, str]] = {}  # id -> (GlobalId, type, raw args)
+    kept: Dict[int, Tuple[str, str]] = {}  # relationships and property entities
+    bodies: Optional[Dict[int, Tuple[str, str]]] = {} if bounds else None
+    for entity in iter_step(stream):
+        if entity.section != "DATA":
+            continue
+        if bodies is not None:
+            bodies[entity.id] = (entity.type, entity.args)
+        if entity.type in KEPT_TYPES:
+            kept[entity.id] = (entity.type, entity.args)
+            continue
+        if entity.type.startswith("IFCREL") or entity.type.endswith("TEMPLATE"):
+            continue
+        m = GLOBAL_ID_RE.match(entity.args)
+        if m:
+            elements[entity.id] = (m.group(1), entity.type, entity.args)
+
+    contained: Dict[int, int] = {}
+    parent: Dict[int, int] = {}
+    occurrence_sets: Dict[int, List[int]] = {}
+    element_type: Dict[int, int] = {}
+    for entity_type, args in kept.values():
+        if entity_type not in RELATION_TYPES:
+            continue
+        values = parse_args(args)
+        if len(values) < 6:
+            continue
+        if entity_type == "IFCRELCONTAINEDINSPATIALSTRUCTURE" and isinstance(values[5], Ref):
+            for ref in _refs(values[4]):
+                contained[ref] = int(values[5])
+        elif entity_type in ("IFCRELAGGREGATES", "IFCRELNESTS") and isinstance(values[4], Ref):
+            for ref in _refs(values[5]):
+                parent[ref] = int(values[4])
+        elif entity_type == "IFCRELDEFINESBYPROPERTIES" and isinstance(values[5], Ref):
+            for ref in _refs(values[4]):
+                occurrence_sets.setdefault(ref, []).append(int(values[5]))
+        elif entity_type == "IFCRELDEFINESBYTYPE" and isinstance(values[5], Ref):
+            for ref in _refs(values[4]):
+                element_type[ref] = int(values[5])
+
+    set_cache: Dict[int, List[Tuple[str, str, str]]] = {}
+
+    def property_set(set_id: int) -> List[Tuple[str, str, str]]:
+        if set_id in set_cache:
+            return set_cache[set_id]
+        triples: List[Tuple[str, str, str]] = []
+        entity_type, args = kept.get(set_id, (None, None))
+        if entity_type in SET_TYPES:
+            values = parse_args(args)
+            set_name = values[2] or entity_type
+            members = values[4] if entity_type == "IFCPROPERTYSET" else values[5]
+            for ref in _refs(members):
+                member_type, member_args = kept.get(ref, (None, None))
+                if member_type is None:
+                    continue
+                member = parse_args(member_args)
+                if member_type in QUANTITY_TYPES:
+                    value = format_value(member[3]) if len(member) > 3 else None
+                else:
+                    value = format_value(member[2]) if len(member) > 2 else None
+                if member[0] and value is not None:
+                    triples.append((set_name, member[0], value))
+        set_cache[set_id] = triples
+        return triples
+
+    def storey_of(element_id: int) -> Optional[int]:
+        current: Optional[int] = element_id
+        for _ in range(MAX_DEPTH):
+            if current is None:
+                return None
+            if current in elements and elements[current][1] == "IFCBUILDINGSTOREY":
+                return current
+            current = contained.get(current, parent.get(current))
+        return None
+
+    resolver = BoundsResolver(bodies) if bodies is not None else None
+    for element_id, (global_id, entity_type, args) in elements.items():
+        values = parse_args(args)
+        box = None
+        if resolver is not None:
+            try:
+                box = resolver.product_box(values)
+            except (ValueError, TypeError, IndexError, ZeroDivisionError):
+                box = None  # geometry we cannot bound; the element stays searchable
+        properties: Dict[Tuple[str, str], str] = {}
+        type_id = element_type.get(element_id)
+        if type_id in elements:
+            type_values = parse_args(elements[type_id][2])
+            for set_id in _refs(type_values[5] if len(type_values) > 5 else None):
+                properties.update(((s, p), v) for s, p, v in property_set(set_id))
+        if entity_type.endswith(("TYPE", "STYLE")) and len(values) > 5:
+            # Type objects carry their sets directly (HasPropertySets)
+            for set_id in _refs(values[5]):
+                properties.update(((s, p), v) for s, p, v in property_set(set_id))
+        for set_id in occurrence_sets.get(element_id, []):
+            properties.update(((s, p), v) for s, p, v in property_set(set_id))
+        storey_id = storey_of(element_id)
+        storey = parse_args(elements[storey_id][2]) if storey_id is not None else None
+        yield ElementRecord(
+            global_id=global_id,
+            ifc_class=entity_type,
+            name=values[2] if len(values) > 2 and isinstance(values[2], str) else None,
+            storey_id=elements[storey_id][0] if storey_id is not None else None,
+            storey=storey[2] if storey and isinstance(storey[2], str) else None,
+            properties=[(s, p, v) for (s, p), v in properties.items()],
+            bounds=box,
+        )
@@ -0,0 +1,328 @@
+"""
+Axis-aligned bounding boxes of IFC products, computed from the STEP text.
+
+`BoundsResolver` evaluates the placement chain (IfcLocalPlacement /
+IfcAxis2Placement) and bounds the body representation items: extrusions of
+parametric and arbitrary profiles, mapped items, face sets, boolean
+results (first operand unless it is a union) and, for everything else, the
+Cartesian points the item references (breps, curves). Item boxes are
+transformed as boxes, so rotated items get a slightly larger, never
+smaller, AABB. Boxes are in metres, in the model's world coordinates.
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.ifc.step import Ref, Typed, parse_args
+
+Box = Tuple[float, float, float, float, float, float]  # min x, y, z, max x, y, z
+Matrix = Tuple[float, ...]  # 3x4 row-major: rotation/scale columns, then translation
+
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0)
+SI_PREFIXES = {"EXA": 1e18, "PETA": 1e15, "TERA": 1e12, "GIGA": 1e9, "MEGA": 1e6, "KILO": 1e3, "HECTO": 1e2,
+               "DECA": 1e1, "DECI": 1e-1, "CENTI": 1e-2, "MILLI": 1e-3, "MICRO": 1e-6, "NANO": 1e-9}
+BODY_IDENTIFIERS = ("Body", "Facetation", "Box")
+# Parametric profiles: (index of the X extent, index of the Y extent), centred on the profile position
+PROFILE_EXTENTS = {
+    "IFCRECTANGLEPROFILEDEF": (3, 4), "IFCRECTANGLEHOLLOWPROFILEDEF": (3, 4), "IFCROUNDEDRECTANGLEPROFILEDEF": (3, 4),
+    "IFCISHAPEPROFILEDEF": (3, 4), "IFCASYMMETRICISHAPEPROFILEDEF": (3, 4),
+    "IFCTSHAPEPROFILEDEF": (4, 3), "IFCUSHAPEPROFILEDEF": (4, 3), "IFCLSHAPEPROFILEDEF": (4, 3),
+    "IFCCSHAPEPROFILEDEF": (4, 3), "IFCZSHAPEPROFILEDEF": (4, 3),
+}
+MAX_DEPTH = 64
+
+
+def compose(a: Matrix, b: Matrix) -> Matrix:
+    """a after b."""
+    return tuple(
+        sum(a[r * 4 + k] * b[k * 4 + c] for k in range(3)) + (a[r * 4 + 3] if c == 3 else 0.0)
+        for r in range(3) for c in range(4)
+    )
+
+
+def transform_point(m: Matrix, p: Sequence[float]) -> Tuple[float, float, float]:
+    x, y, z = p
+    return (
+        m[0] * x + m[1] * y + m[2] * z + m[3],
+        m[4] * x + m[5] * y + m[6] * z + m[7],
+        m[8] * x + m[9] * y + m[10] * z + m[11],
+    )
+
+
+def points_box(points: Iterable[Sequence[float]]) -> Optional[Box]:
+    xs, ys, zs = [], [], []
+    for x, y, z in points:
+        xs.append(x)
+        ys.append(y)
+        zs.append(z)
+    if not xs:
+        return None
+    return (min(xs), min(ys), min(zs), max(xs), max(ys), max(zs))
+
+
+def box_corners(box: Box) -> List[Tuple[float, float, float]]:
+    return [(x, y, z) for x in (box[0], box[3]) for y in (box[1], box[4]) for z in (box[2], box[5])]
+
+
+def transform_box(m: Matrix, box: Optional[Box]) -> Optional[Box]:
+    return points_box(transform_point(m, p) for p in box_corners(box)) if box else None
+
+
+def union(boxes: Iterable[Optional[Box]]) -> Optional[Box]:
+    result = None
+    for box in boxes:
+        if box is None:
+            continue
+        if result is None:
+            result = box
+        else:
+            result = tuple(min(result[i], box[i]) for i in range(3)) + tuple(max(result[i], box[i]) for i in range(3, 6))
+    return result
+
+
+def _vector(values, size: int = 3) -> Tuple[float, ...]:
+    coords = [float(v) for v in values[:size]]
+    return tuple(coords + [0.0] * (size - len(coords)))
+
+
+def _normalize(v: Sequence[float]) -> Tuple[float, float, float]:
+    length = math.sqrt(sum(c * c for c in v))
+    return tuple(c / length for c in v) if length else (0.0, 0.0, 0.0)
+
+
+def _cross(a: Sequence[float], b: Sequence[float]) -> Tuple[float, float, float]:
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+
+def _frame(origin, x_axis, z_axis, scales=(1.0, 1.0, 1.0)) -> Matrix:
+    z = _normalize(z_axis)
+    dot = sum(x_axis[i] * z[i] for i in range(3))
+    x = _normalize(tuple(x_axis[i] - dot * z[i] for i in range(3)))
+    if x == (0.0, 0.0, 0.0):
+        x = _normalize(_cross((0.0, 1.0, 0.0), z)) if abs(z[1]) < 0.9 else (1.0, 0.0, 0.0)
+    y = _cross(z, x)
+    sx, sy, sz = scales
+    return (
+        x[0] * sx, y[0] * sy, z[0] * sz, origin[0],
+        x[1] * sx, y[1] * sy, z[1] * sz, origin[1],
+        x[2] * sx, y[2] * sy, z[2] * sz, origin[2],
+    )
+
+
+class BoundsResolver:
+    """World AABBs of products, given every DATA instance as id -> (type, raw args)."""
+
+    def __init__(self, bodies: Dict[int, Tuple[str, str]]) -> None:
+        self.bodies = bodies
+        self._placements: Dict[int, Matrix] = {}
+        self._items: Dict[int, Optional[Box]] = {}
+        self.scale = self._length_scale()
+
+    def _entity(self, ref) -> Tuple[Optional[str], list]:
+        body = self.bodies.get(int(ref)) if isinstance(ref, Ref) else None
+        if body is None:
+            return None, []
+        return body[0], parse_args(body[1])
+
+    # --- units ---
+
+    def _unit_scale(self, ref) -> Optional[float]:
+        entity_type, args = self._entity(ref)
+        if entity_type == "IFCSIUNIT" and len(args) > 3 and args[1] == "LENGTHUNIT" and args[3] == "METRE":
+            return SI_PREFIXES.get(args[2], 1.0) if args[2] else 1.0
+        if entity_type == "IFCCONVERSIONBASEDUNIT" and len(args) > 3 and args[1] == "LENGTHUNIT":
+            measure_type, measure = self._entity(args[3])
+            if measure_type == "IFCMEASUREWITHUNIT" and len(measure) > 1:
+                value = measure[0].args[0] if isinstance(measure[0], Typed) and measure[0].args else measure[0]
+                base = self._unit_scale(measure[1]) or 1.0
+                if isinstance(value, (int, float)):
+                    return float(value) * base
+        return None
+
+    def _length_scale(self) -> float:
+        for entity_type, args in self.bodies.values():
+            if entity_type != "IFCUNITASSIGNMENT":
+                continue
+            for ref in parse_args(args)[0]:
+                scale = self._unit_scale(ref)
+                if scale:
+                    return scale
+        return 1.0
+
+    # --- placements ---
+
+    def _point(self, ref, size: int = 3) -> Tuple[float, ...]:
+        entity_type, args = self._entity(ref)
+        if entity_type == "IFCCARTESIANPOINT" and args and isinstance(args[0], list):
+            return _vector(args[0], size)
+        return (0.0,) * size
+
+    def _direction(self, ref, default: Tuple[float, float, float]) -> Tuple[float, float, float]:
+        entity_type, args = self._entity(ref)
+        if entity_type == "IFCDIRECTION" and args and isinstance(args[0], list):
+            return _vector(args[0])
+        return default
+
+    def axis2(self, ref) -> Matrix:
+        entity_type, args = self._entity(ref)
+        if entity_type == "IFCAXIS2PLACEMENT3D":
+            z = self._direction(args[1], (0.0, 0.0, 1.0)) if len(args) > 1 else (0.0, 0.0, 1.0)
+            x = self._direction(args[2], (1.0, 0.0, 0.0)) if len(args) > 2 else (1.0, 0.0, 0.0)
+            return _frame(self._point(args[0]), x, z)
+        if entity_type == "IFCAXIS2PLACEMENT2D":
+            x = self._direction(args[1], (1.0, 0.0, 0.0)) if len(args) > 1 else (1.0, 0.0, 0.0)
+            return _frame(self._point(args[0]), x, (0.0, 0.0, 1.0))
+        return IDENTITY
+
+    def placement(self, ref, depth: int = 0) -> Matrix:
+        if not isinstance(ref, Ref):
+            return IDENTITY
+        key = int(ref)
+        if key not in self._placements:
+            entity_type, args = self._entity(ref)
+            if entity_type == "IFCLOCALPLACEMENT" and depth < MAX_DEPTH:
+                parent = self.placement(args[0], depth + 1) if args and args[0] is not None else IDENTITY
+                self._placements[key] = compose(parent, self.axis2(args[1]) if len(args) > 1 else IDENTITY)
+            else:
+                self._placements[key] = IDENTITY
+        return self._placements[key]
+
+    def _operator(self, ref) -> Matrix:
+        entity_type, args = self._entity(ref)
+        if not entity_type or not entity_type.startswith("IFCCARTESIANTRANSFORMATIONOPERATOR") or len(args) < 4:
+            return IDENTITY
+        x = self._direction(args[0], (1.0, 0.0, 0.0))
+        z = self._direction(args[4], (0.0, 0.0, 1.0)) if len(args) > 4 else (0.0, 0.0, 1.0)
+        scale = float(args[3]) if isinstance(args[3], (int, float)) else 1.0
+        scales = [scale, scale, scale]
+        if entity_type.endswith("NONUNIFORM") and len(args) > 6:
+            scales[1] = float(args[5]) if isinstance(args[5], (int, float)) else scale
+            scales[2] = float(args[6]) if isinstance(args[6], (int, float)) else scale
+        return _frame(self._point(args[2]), x, z, tuple(scales))
+
+    # --- geometry ---
+
+    def _collect_points(self, start) -> Optional[Box]:
+        """Box of every Cartesian point (and circle extent) reachable from an entity."""
+        points: List[Tuple[float, float, float]] = []
+        seen = set()
+        stack = [start]
+        while stack:
+            ref = stack.pop()
+            if not isinstance(ref, Ref) or int(ref) in seen:
+                continue
+            seen.add(int(ref))
+            entity_type, args = self._entity(ref)
+            if entity_type == "IFCCARTESIANPOINT":
+                points.append(_vector(args[0]))
+            elif entity_type in ("IFCCARTESIANPOINTLIST3D", "IFCCARTESIANPOINTLIST2D"):
+                points.extend(_vector(p) for p in args[0])
+            elif entity_type == "IFCCIRCLE" and len(args) > 1:
+                center = transform_point(self.axis2(args[0]), (0.0, 0.0, 0.0))
+                r = float(args[1])
+                points.extend([tuple(c - r for c in center), tuple(c + r for c in center)])
+            elif entity_type and entity_type not in ("IFCDIRECTION", "IFCAXIS2PLACEMENT3D", "IFCAXIS2PLACEMENT2D"):
+                stack.extend(_refs_in(args))
+        return points_box(points)
+
+    def profile_box(self, ref) -> Optional[Box]:
+        entity_type, args = self._entity(ref)
+        if entity_type in PROFILE_EXTENTS:
+            xi, yi = PROFILE_EXTENTS[entity_type]
+            if len(args) > yi and isinstance(args[xi], (int, float)) and isinstance(args[yi], (int, float)):
+                hx, hy = float(args[xi]) / 2, float(args[yi]) / 2
+                return transform_box(self.axis2(args[2]), (-hx, -hy, 0.0, hx, hy, 0.0))
+        if entity_type in ("IFCCIRCLEPROFILEDEF", "IFCCIRCLEHOLLOWPROFILEDEF") and len(args) > 3:
+            r = float(args[3])
+            return transform_box(self.axis2(args[2]), (-r, -r, 0.0, r, r, 0.0))
+        if entity_type == "IFCELLIPSEPROFILEDEF" and len(args) > 4:
+            a, b = float(args[3]), float(args[4])
+            return transform_box(self.axis2(args[2]), (-a, -b, 0.0, a, b, 0.0))
+        if entity_type == "IFCDERIVEDPROFILEDEF" and len(args) > 3:
+            return transform_box(self._operator(args[3]), self.profile_box(args[2]))
+        if entity_type in ("IFCARBITRARYCLOSEDPROFILEDEF", "IFCARBITRARYPROFILEDEFWITHVOIDS", "IFCARBITRARYOPENPROFILEDEF") and len(args) > 2:
+            return self._collect_points(args[2])
+        if entity_type == "IFCCOMPOSITEPROFILEDEF" and len(args) > 2:
+            return union(self.profile_box(p) for p in args[2])
+        return self._collect_points(ref) if entity_type else None
+
+    def item_box(self, ref, depth: int = 0) -> Optional[Box]:
+        """Box of a representation item in its own coordinate system."""
+        if not isinstance(ref, Ref):
+            return None
+        key = int(ref)
+        if key in self._items:
+            return self._items[key]
+        entity_type, args = self._entity(ref)
+        box = None
+        if depth > MAX_DEPTH or entity_type is None:
+            box = None
+        elif entity_type in ("IFCEXTRUDEDAREASOLID", "IFCEXTRUDEDAREASOLIDTAPERED") and len(args) > 3:
+            profile = self.profile_box(args[0])
+            if profile and isinstance(args[3], (int, float)):
+                direction = _normalize(self._direction(args[2], (0.0, 0.0, 1.0)))
+                depth_offset = tuple(c * float(args[3]) for c in direction)
+                base = box_corners(profile)
+                swept = points_box(base + [tuple(p[i] + depth_offset[i] for i in range(3)) for p in base])
+                box = transform_box(self.axis2(args[1]), swept)
+        elif entity_type == "IFCMAPPEDITEM" and len(args) > 1:
+            source_type, source = self._entity(args[0])
+            if source_type == "IFCREPRESENTATIONMAP" and len(source) > 1:
+                _, representation = self._entity(source[1])
+                inner = union(self.item_box(item, depth + 1) for item in (representation[3] if len(representation) > 3 else []))
+                box = transform_box(compose(self._operator(args[1]), self.axis2(source[0])), inner)
+        elif entity_type in ("IFCBOOLEANRESULT", "IFCBOOLEANCLIPPINGRESULT") and len(args) > 2:
+            operands = [args[1], args[2]] if args[0] == "UNION" else [args[1]]
+            box = union(self.item_box(op, depth + 1) for op in operands)
+        elif entity_type == "IFCBOUNDINGBOX" and len(args) > 3:
+            x, y, z = self._point(args[0])
+            box = (x, y, z, x + float(args[1]), y + float(args[2]), z + float(args[3]))
+        elif entity_type in ("IFCTRIANGULATEDFACESET", "IFCPOLYGONALFACESET", "IFCTRIANGULATEDIRREGULARNETWORK"):
+            box = self._collect_points(args[0]) if args else None
+        elif entity_type == "IFCSWEPTDISKSOLID" and len(args) > 1:
+            directrix = self._collect_points(args[0])
+            r = float(args[1]) if isinstance(args[1], (int, float)) else 0.0
+            box = tuple(directrix[i] - r for i in range(3)) + tuple(directrix[i] + r for i in range(3, 6)) if directrix else None
+        elif entity_type in ("IFCHALFSPACESOLID", "IFCPOLYGONALBOUNDEDHALFSPACE", "IFCBOXEDHALFSPACE"):
+            box = None  # unbounded
+        else:
+            box = self._collect_points(ref)
+        self._items[key] = box
+        return box
+
+    def product_box(self, args: list) -> Optional[Box]:
+        """World box of an IfcProduct from its parsed arguments (ObjectPlacement, Representation)."""
+        if len(args) < 7 or not isinstance(args[6], Ref):
+            return None
+        shape_type, shape = self._entity(args[6])
+        if shape_type != "IFCPRODUCTDEFINITIONSHAPE" or len(shape) < 3:
+            return None
+        representations = []
+        for ref in shape[2] or []:
+            rep_type, rep = self._entity(ref)
+            if rep_type == "IFCSHAPEREPRESENTATION" and len(rep) > 3:
+                representations.append((rep[1], rep[3] or []))
+        for identifier in BODY_IDENTIFIERS:
+            chosen = [items for name, items in representations if name == identifier]
+            if chosen:
+                break
+        else:
+            chosen = [items for _, items in representations]
+        local = union(self.item_box(item) for items in chosen for item in items)
+        world = transform_box(self.placement(args[5]), local)
+        if world is None:
+            return None
+        return tuple(round(c * self.scale, 6) for c in world)
+
+
+def _refs_in(values) -> List[Ref]:
+    found: List[Ref] = []
+    stack = list(values)
+    while stack:
+        value = stack.pop()
+        if isinstance(value, Ref):
+            found.append(value)
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, Typed):
+            stack.extend(value.args)
+    return found
@@ -0,0 +1,110 @@
+"""
+Per-entity content manifest of an IFC revision.
+
+Every rooted entity (one with a GlobalId) gets a hash of its own attributes
+plus, recursively, the non-rooted entities it references (placements,
+geometry, property values). References to other rooted entities hash as
+their GlobalId and IfcOwnerHistory is skipped, so a hash only changes when
+that element's own data changes; re-exports that renumber STEP instances
+or touch timestamps leave it alone.
+
+The STEP text is streamed, but the instance bodies are kept in memory
+while hashing (roughly the size of the DATA section).
+"""
+import gzip
+import hashlib
+import json
+import re
+from typing import BinaryIO, Dict, List, NamedTuple, Set, Tuple
+
+from app.ifc.step import iter_step
+
+GLOBAL_ID_RE = re.compile(r"\s*'([0-9A-Za-z_$]{22})'")
+IGNORED_TYPES = {"IFCOWNERHISTORY"}
+_STRING_OR_REF_RE = re.compile(r"'(?:[^']|'')*'|#(\d+)")
+
+
+class ManifestDiff(NamedTuple):
+    added: List[str]
+    removed: List[str]
+    changed: List[str]
+    unchanged: int
+
+
+def _refs(args: str) -> List[int]:
+    return [int(m.group(1)) for m in _STRING_OR_REF_RE.finditer(args) if m.group(1)]
+
+
+def build_manifest(stream: BinaryIO) -> Dict[str, str]:
+    """GlobalId -> 16-hex content hash for every rooted entity in the file."""
+    bodies: Dict[int, Tuple[str, str]] = {}
+    roots: Dict[int, str] = {}
+    for entity in iter_step(stream):
+        if entity.section != "DATA":
+            continue
+        bodies[entity.id] = (entity.type, entity.args)
+        m = GLOBAL_ID_RE.match(entity.args)
+        if m:
+            roots[entity.id] = m.group(1)
+
+    hashes: Dict[int, str] = {}
+
+    def token(owner: int, ref: int) -> str:
+        body = bodies.get(ref)
+        if body is None:
+            return "#?"
+        if body[0] in IGNORED_TYPES:
+            return "~"
+        if ref in roots and ref != owner:
+            return "@" + roots[ref]
+        return hashes.get(ref, "#cycle")
+
+    def digest(entity_id: int) -> str:
+        # Iterative post-order walk; deep placement/geometry chains would overflow recursion
+        visiting: Set[int] = set()
+        stack = [entity_id]
+        while stack:
+            current = stack[-1]
+            if current in hashes:
+                stack.pop()
+                continue
+            entity_type, args = bodies[current]
+            if current not in visiting:
+                visiting.add(current)
+                for ref in _refs(args):
+                    if (ref != current and ref not in roots and ref in bodies and ref not in hashes
+                            and ref not in visiting and bodies[ref][0] not in IGNORED_TYPES):
+                        stack.append(ref)
+                continue
+            text = _STRING_OR_REF_RE.sub(
+                lambda m: m.group(0) if m.group(1) is None else token(current, int(m.group(1))), args
+            )
+            hashes[current] = hashlib.blake2b(f"{entity_type}({text})".encode("utf-8"), digest_size=8).hexdigest()
+            visiting.discard(current)
+            stack.pop()
+        return hashes[entity_id]
+
+    return {global_id: digest(entity_id) for entity_id, global_id in roots.items()}
+
+
+def manifest_digest(manifest: Dict[str, str]) -> str:
+    """Order-independent SHA-256 of a manifest: equal digests mean no element changed."""
+    h = hashlib.sha256()
+    for global_id in sorted(manifest):
+        h.update(f"{global_id}={manifest[global_id]}\n".encode("ascii"))
+    return h.hexdigest()
+
+
+def diff_manifests(old: Dict[str, str], new: Dict[str, str]) -> ManifestDiff:
+    added = [gid for gid in new if gid not in old]
+    removed = [gid for gid in old if gid not in new]
+    changed = [gid for gid, value in new.items() if gid in old and old[gid] != value]
+    return ManifestDiff(added, removed, changed, len(new) - len(added) - len(changed))
+
+
+def dump_manifest(manifest: Dict[str, str]) -> bytes:
+    return gzip.compress(json.dumps(manifest, separators=(",", ":"), sort_keys=True).encode("ascii"))
+
+
+def load_manifest(data: bytes) -> Dict[str, str]:
+    return json.loads(gzip.decompress(data).decode("ascii"))
@@ -0,0 +1,140 @@
+"""
+Header and entity summary of an IFC file, collected while it streams past.
+
+`IfcMetadataScanner` is fed the raw chunks of an upload as they are read
+and keeps only the statement being split: FILE_SCHEMA, FILE_NAME and
+FILE_DESCRIPTION from the header, the IfcProject name, the storeys and a
+count per entity type. Only those few entities have their arguments
+parsed; everything else is counted from its type keyword.
+"""
+import re
+from collections import Counter
+from typing import BinaryIO, Dict, List, Optional
+
+from app.ifc.step import READ_CHUNK, SectionReader, StatementSplitter, parse_args
+from app.logging.logger import logger
+from config import settings
+
+MAGIC = "ISO-10303-21"
+_VIEW_RE = re.compile(r"ViewDefinition\s*\[([^\]]*)\]", re.IGNORECASE)
+
+
+def _text(value) -> Optional[str]:
+    return value if isinstance(value, str) and value else None
+
+
+def _join(value) -> Optional[str]:
+    if isinstance(value, list):
+        return ", ".join(v for v in value if isinstance(v, str) and v) or None
+    return _text(value)
+
+
+class IfcMetadataScanner:
+    """Push-style scanner; `result()` is None when the input was not a STEP file."""
+
+    def __init__(self, max_statement: Optional[int] = None) -> None:
+        self.max_statement = max_statement or settings.IFC_METADATA_MAX_STATEMENT_MB * 1024 * 1024
+        self._splitter = StatementSplitter()
+        self._reader = SectionReader()
+        self._started = False
+        self._failed = False
+        self._finished = False
+        self.header: Dict[str, Optional[str]] = {}
+        self.project_name: Optional[str] = None
+        self.storeys: List[Dict] = []
+        self.histogram: Counter = Counter()
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            self.close()
+        elif not self._failed and not self._finished:
+            self._consume(chunk.decode("latin-1"), final=False)
+
+    def close(self) -> None:
+        if not self._failed and not self._finished:
+            self._consume("", final=True)
+        self._finished = True
+
+    def _consume(self, text: str, final: bool) -> None:
+        try:
+            for statement in self._splitter.feed(text, final):
+                if not self._started:
+                    if MAGIC not in statement[:32].upper():
+                        self._failed = True
+                        return
+                    self._started = True
+                    continue
+                entity = self._reader.entity(statement)
+                if entity is None:
+                    continue
+                if entity.section == "HEADER":
+                    self._header(entity.type, entity.args)
+                else:
+                    self.histogram[entity.type] += 1
+                    if entity.type == "IFCPROJECT" and self.project_name is None:
+                        self.project_name = _text(parse_args(entity.args)[2])
+                    elif entity.type == "IFCBUILDINGSTOREY":
+                        self._storey(entity.args)
+            limit = self.max_statement if self._started else 1024
+            if self._splitter.pending > limit:
+                # Not a STEP file after all, or a statement we will not buffer
+                self._failed = True
+        except (ValueError, IndexError) as e:
+            logger.log_error(f"Ошибка разбора метаданных IFC: {e}")
+            self._failed = True
+
+    def _header(self, keyword: str, args: str) -> None:
+        values = parse_args(args)
+        if keyword == "FILE_SCHEMA" and values and isinstance(values[0], list):
+            self.header["schema"] = _join(values[0])
+        elif keyword == "FILE_DESCRIPTION" and values:
+            descriptions = values[0] if isinstance(values[0], list) else []
+            for description in descriptions:
+                m = _VIEW_RE.search(description) if isinstance(description, str) else None
+                if m:
+                    self.header["view_definition"] = m.group(1).strip() or None
+        elif keyword == "FILE_NAME":
+            values = values + [None] * (7 - len(values))
+            self.header.update({
+                "file_name": _text(values[0]),
+                "file_timestamp": _text(values[1]),
+                "author": _join(values[2]),
+                "organization": _join(values[3]),
+                "preprocessor": _text(values[4]),
+                "authoring_tool": _text(values[5]),
+            })
+
+    def _storey(self, args: str) -> None:
+        values = parse_args(args)
+        elevation = values[9] if len(values) > 9 and isinstance(values[9], (int, float)) else None
+        self.storeys.append({"global_id": _text(values[0]), "name": _text(values[2]), "elevation": elevation})
+
+    def result(self) -> Optional[Dict]:
+        """Metadata row values, or None when nothing usable was read."""
+        if self._failed or not self._started or "schema" not in self.header:
+            return None
+        storeys = sorted(self.storeys, key=lambda s: (s["elevation"] is None, s["elevation"] or 0))
+        return {
+            "ifc_schema": self.header.get("schema"),
+            "view_definition": self.header.get("view_definition"),
+            "file_name": self.header.get("file_name"),
+            "file_timestamp": self.header.get("file_timestamp"),
+            "author": self.header.get("author"),
+            "organization": self.header.get("organization"),
+            "preprocessor": self.header.get("preprocessor"),
+            "authoring_tool": self.header.get("authoring_tool"),
+            "project_name": self.project_name,
+            "entity_count": sum(self.histogram.values()),
+            "entity_histogram": dict(self.histogram.most_common()),
+            "storeys": storeys,
+        }
+
+
+def scan_ifc_metadata(stream: BinaryIO, chunk_size: int = READ_CHUNK) -> Optional[Dict]:
+    """Scan a whole file (conversion workers, files uploaded without a scan)."""
+    scanner = IfcMetadataScanner()
+    while True:
+        chunk = stream.read(chunk_size)
+        scanner.feed(chunk)
+        if not chunk:
+            return scanner.result()
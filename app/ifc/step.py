@@ -0,0 +1,214 @@
+"""
+Streaming reader for ISO 10303-21 (STEP physical file) content.
+
+`iter_step` splits a file into statements without loading it: it reads
+fixed-size chunks and cuts at `;` outside strings and comments, so memory
+is bounded by the longest single statement, not by the model size.
+Arguments are kept as raw text; `parse_args` turns them into Python values
+only for the entities a caller cares about. `StatementSplitter` and
+`SectionReader` do the same for callers that are handed chunks (uploads).
+"""
+import re
+from typing import BinaryIO, Iterator, List, NamedTuple, Optional
+
+READ_CHUNK = 1024 * 1024
+
+_ENTITY_RE = re.compile(r"#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\((.*)\)\s*$", re.DOTALL)
+_HEADER_RE = re.compile(r"([A-Za-z0-9_]+)\s*\((.*)\)\s*$", re.DOTALL)
+_SPECIAL_RE = re.compile(r"[';]|/\*")
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<str>'(?:[^']|'')*')"
+    r"|(?P<ref>#\d+)"
+    r"|(?P<enum>\.[A-Za-z0-9_]+\.)"
+    r"|(?P<num>[-+]?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"
+    r"|(?P<null>[$*])"
+    r"|(?P<kw>[A-Za-z_][A-Za-z0-9_]*)\s*\("
+    r"|(?P<open>\()"
+    r"|(?P<close>\))"
+    r"|(?P<comma>,)"
+    r'|(?P<bin>"[0-9A-Fa-f]*")'
+    r")"
+)
+_X2_RE = re.compile(r"\\X2\\((?:[0-9A-Fa-f]{4})+)\\X0\\")
+_X4_RE = re.compile(r"\\X4\\((?:[0-9A-Fa-f]{8})+)\\X0\\")
+_X_RE = re.compile(r"\\X\\([0-9A-Fa-f]{2})")
+_S_RE = re.compile(r"\\S\\(.)")
+
+
+class Ref(int):
+    """Reference to another entity instance (#123)."""
+
+
+class Enum(str):
+    """Enumeration value (.ELEMENT. -> 'ELEMENT')."""
+
+
+class Typed(NamedTuple):
+    """Typed parameter such as IFCLABEL('x')."""
+    type: str
+    args: list
+
+
+class StepEntity(NamedTuple):
+    section: str  # HEADER or DATA
+    id: Optional[int]  # instance number in DATA, None in HEADER
+    type: str  # upper-case keyword
+    args: str  # raw text between the outer parentheses
+
+
+def decode_string(raw: str) -> str:
+    """Decode a STEP string literal body ('' and the \\X2\\, \\X4\\, \\X\\, \\S\\ escapes)."""
+    value = raw.replace("''", "'")
+    if "\\" not in value:
+        return value
+    value = _X2_RE.sub(lambda m: "".join(chr(int(m.group(1)[i:i + 4], 16)) for i in range(0, len(m.group(1)), 4)), value)
+    value = _X4_RE.sub(lambda m: "".join(chr(int(m.group(1)[i:i + 8], 16)) for i in range(0, len(m.group(1)), 8)), value)
+    value = _X_RE.sub(lambda m: bytes([int(m.group(1), 16)]).decode("latin-1"), value)
+    value = _S_RE.sub(lambda m: chr(ord(m.group(1)) + 128), value)
+    return value.replace("\\\\", "\\")
+
+
+def parse_args(text: str) -> list:
+    """Parse an argument list into values: str, int/float, Ref, Enum, Typed, list, None ($) or '*'."""
+    stack: List[list] = [[]]
+    typed: List[Optional[str]] = [None]
+    pos, end = 0, len(text.rstrip())
+    while pos < end:
+        m = _TOKEN_RE.match(text, pos)
+        if not m:
+            raise ValueError(f"unexpected STEP token at {pos}: {text[pos:pos + 20]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "comma":
+            continue
+        if kind in ("open", "kw"):
+            stack.append([])
+            typed.append(m.group("kw").upper() if kind == "kw" else None)
+            continue
+        if kind == "close":
+            if len(stack) == 1:
+                raise ValueError("unbalanced ')' in STEP arguments")
+            items, name = stack.pop(), typed.pop()
+            stack[-1].append(Typed(name, items) if name else items)
+            continue
+        token = m.group(kind)
+        if kind == "str":
+            value = decode_string(token[1:-1])
+        elif kind == "ref":
+            value = Ref(token[1:])
+        elif kind == "enum":
+            value = Enum(token[1:-1])
+        elif kind == "num":
+            value = float(token) if any(c in token for c in ".eE") else int(token)
+        elif kind == "null":
+            value = None if token == "$" else "*"
+        else:
+            value = token[1:-1]
+        stack[-1].append(value)
+    if len(stack) != 1:
+        raise ValueError("unbalanced '(' in STEP arguments")
+    return stack[0]
+
+
+class StatementSplitter:
+    """Push-style splitter: feed decoded text, get back the complete statements.
+
+    Cuts at `;` outside strings and comments; an unfinished statement stays
+    buffered until the next `feed`.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._start = 0  # start of the current statement in _buf
+        self._pos = 0  # scan position
+        self._in_string = False
+
+    @property
+    def pending(self) -> int:
+        """Characters held for the statement still being read."""
+        return len(self._buf) - self._start
+
+    def feed(self, text: str, final: bool = False) -> List[str]:
+        buf = self._buf[self._start:] + text
+        pos = self._pos - self._start
+        start = 0
+        in_string = self._in_string
+        statements = []
+        while True:
+            need_more = False
+            if in_string:
+                i = buf.find("'", pos)
+                if i < 0:
+                    pos, need_more = len(buf), True
+                elif i + 1 == len(buf) and not final:
+                    pos, need_more = i, True  # one more character tells '' from a closing quote
+                elif i + 1 < len(buf) and buf[i + 1] == "'":
+                    pos = i + 2
+                else:
+                    in_string, pos = False, i + 1
+            else:
+                m = _SPECIAL_RE.search(buf, pos)
+                if m is None:
+                    # A trailing '/' may start a comment in the next chunk
+                    pos = max(len(buf) - 1, pos) if buf.endswith("/") else len(buf)
+                    need_more = True
+                elif m.group(0) == "'":
+                    in_string, pos = True, m.end()
+                elif m.group(0) == ";":
+                    statement = buf[start:m.start()].strip()
+                    if statement:
+                        statements.append(statement)
+                    start = pos = m.end()
+                else:
+                    close = buf.find("*/", m.end())
+                    if close < 0:
+                        pos, need_more = m.start(), True
+                    else:
+                        buf = buf[:m.start()] + " " + buf[close + 2:]
+                        pos = m.start()
+            if need_more:
+                self._buf, self._start, self._pos, self._in_string = buf, start, pos, in_string
+                return statements
+
+
+def _statements(stream: BinaryIO, chunk_size: int) -> Iterator[str]:
+    splitter = StatementSplitter()
+    while True:
+        chunk = stream.read(chunk_size)
+        yield from splitter.feed(chunk.decode("latin-1"), final=not chunk)
+        if not chunk:
+            return
+
+
+class SectionReader:
+    """Tracks HEADER/DATA sections and turns statements into entities."""
+
+    def __init__(self) -> None:
+        self.section: Optional[str] = None
+
+    def entity(self, statement: str) -> Optional[StepEntity]:
+        if self.section == "DATA" and statement.startswith("#"):
+            m = _ENTITY_RE.match(statement)
+            return StepEntity("DATA", int(m.group(1)), m.group(2).upper(), m.group(3)) if m else None
+        keyword = statement.upper()
+        if keyword in ("HEADER", "DATA") or keyword.startswith("DATA("):
+            self.section = "DATA" if keyword.startswith("DATA") else "HEADER"
+            return None
+        if keyword == "ENDSEC":
+            self.section = None
+            return None
+        if self.section == "HEADER":
+            m = _HEADER_RE.match(statement)
+            if m:
+                return StepEntity("HEADER", None, m.group(1).upper(), m.group(2))
+        return None
+
+
+def iter_step(stream: BinaryIO, chunk_size: int = READ_CHUNK) -> Iterator[StepEntity]:
+    """Yield header entities and data instances of a STEP file in file order."""
+    reader = SectionReader()
+    for statement in _statements(stream, chunk_size):
+        entity = reader.entity(statement)
+        if entity is not None:
+            yield entity
@@ -1,6 +1,11 @@
 from .user import User
 from .file import File
+from .blob import Blob
+from .upload_session import UploadSession, UploadPart
+from .conversion_job import ConversionJob
+from .conversion_cache import ConversionCacheEntry
+from .ifc_revision import IfcRevision
+from .ifc_metadata import IfcMetadata
+from .ifc_element import IfcElementIndex, IfcElement, IfcElementProperty
 
-__all__ = ["User", "File"]
-
-
+__all__ = ["User", "File", "Blob", "UploadSession", "UploadPart", "ConversionJob", "ConversionCacheEntry", "IfcRevision", "IfcMetadata", "IfcElementIndex", "IfcElement", "IfcElementProperty"]
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class Blob(Base):
+    """Content-addressed object stored once under blobs/<sha256>"""
+    __tablename__ = "blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    storage_path = Column(String(500), nullable=False)  # path in MinIO
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    # Relationships
+    files = relationship("File", back_populates="blob")
+    
+    def __repr__(self):
+        return f"<Blob(sha256='{self.sha256[:12]}', size={self.size}, ref_count={self.ref_count})>"
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class ConversionCacheEntry(Base):
+    """FRAG produced for one IFC content hash by one converter version and option set"""
+    __tablename__ = "conversion_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # sha256 of (input sha256, converter version, options)
+    input_sha256 = Column(String(64), nullable=False, index=True)
+    converter_version = Column(String(100), nullable=False)
+    options = Column(String(500), nullable=False, default="{}")
+    frag_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=False)  # holds one blob reference
+    frag_size = Column(BigInteger, nullable=False)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<ConversionCacheEntry(input='{self.input_sha256[:12]}', version='{self.converter_version}', hits={self.hits})>"
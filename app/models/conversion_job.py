@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Text, Index, Boolean, text
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class ConversionJob(Base):
+    """IFC -> FRAG conversion request; the table doubles as the durable work queue"""
+    __tablename__ = "conversion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)  # source IFC
+    output_filename = Column(String(255), nullable=True)
+    status = Column(String(20), nullable=False, default="queued")  # queued | running | done | failed
+    priority = Column(String(20), nullable=False, default="batch")  # interactive | batch
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    available_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())  # retry backoff
+    worker_id = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # lease renewed by the running worker
+    error = Column(Text, nullable=True)
+    input_size = Column(BigInteger, nullable=True)
+    output_size = Column(BigInteger, nullable=True)
+    duration_ms = Column(Integer, nullable=True)
+    wait_ms = Column(Integer, nullable=True)  # queue wait before the first attempt started
+    cache_hit = Column(Boolean, nullable=False, default=False)  # FRAG reused from the conversion cache
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_conversion_jobs_status_available_at", "status", "available_at"),
+        Index("ix_conversion_jobs_user_id_filename_status", "user_id", "filename", "status"),
+        # At most one queued job per file: enqueue_conversion reuses it
+        Index(
+            "uq_conversion_jobs_queued_file", "user_id", "filename", unique=True,
+            postgresql_where=text("status = 'queued'"), sqlite_where=text("status = 'queued'")
+        ),
+    )
+
+    def __repr__(self):
+        return f"<ConversionJob(id={self.id}, filename='{self.filename}', status='{self.status}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database.base import Base
@@ -13,12 +13,19 @@ class File(Base):
     file_size = Column(Integer, nullable=False)
     content_type = Column(String(100), nullable=True)
     storage_path = Column(String(500), nullable=False)  # path in MinIO
+    blob_sha256 = Column(String(64), ForeignKey("blobs.sha256"), nullable=True, index=True)  # set for deduplicated uploads
     is_public = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="files")
+    blob = relationship("Blob", back_populates="files")
+    ifc_metadata = relationship("IfcMetadata", back_populates="file", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    
+    __table_args__ = (
+        Index("ix_files_user_id_filename", "user_id", "filename"),
+    )
     
     def __repr__(self):
         return f"<File(id={self.id}, filename='{self.filename}', user_id={self.user_id})>"
@@ -0,0 +1,62 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class IfcElementIndex(Base):
+    """Element index state of a file: which content it was built from"""
+    __tablename__ = "ifc_element_indexes"
+
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    content_sha256 = Column(String(64), nullable=False)  # SHA-256 of the IFC the rows describe
+    element_count = Column(Integer, nullable=False, default=0)
+    property_count = Column(Integer, nullable=False, default=0)
+    index_version = Column(Integer, nullable=False, default=1)  # rebuilt when the builder adds data
+    built_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def __repr__(self):
+        return f"<IfcElementIndex(file_id={self.file_id}, elements={self.element_count})>"
+
+
+class IfcElement(Base):
+    """One rooted IFC entity of a file: class, name and containing storey"""
+    __tablename__ = "ifc_elements"
+
+    id = Column(Integer, primary_key=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
+    global_id = Column(String(22), nullable=False)
+    ifc_class = Column(String(64), nullable=False)  # upper-case STEP keyword, e.g. IFCDOOR
+    name = Column(String(255), nullable=True)
+    storey_id = Column(String(22), nullable=True)  # GlobalId of the IfcBuildingStorey
+    storey = Column(String(255), nullable=True)
+    # World AABB in metres; NULL when the element has no bounded geometry
+    min_x = Column(Float, nullable=True)
+    min_y = Column(Float, nullable=True)
+    min_z = Column(Float, nullable=True)
+    max_x = Column(Float, nullable=True)
+    max_y = Column(Float, nullable=True)
+    max_z = Column(Float, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("file_id", "global_id", name="uq_ifc_elements_file_id_global_id"),
+        Index("ix_ifc_elements_file_id_ifc_class", "file_id", "ifc_class"),
+        Index("ix_ifc_elements_file_id_storey", "file_id", "storey"),
+    )
+
+    def __repr__(self):
+        return f"<IfcElement(global_id='{self.global_id}', ifc_class='{self.ifc_class}')>"
+
+
+class IfcElementProperty(Base):
+    """Flattened property or quantity value of an element (set name, property name, text value)"""
+    __tablename__ = "ifc_element_properties"
+
+    id = Column(Integer, primary_key=True)
+    element_id = Column(Integer, ForeignKey("ifc_elements.id", ondelete="CASCADE"), nullable=False, index=True)
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), nullable=False)
+    pset = Column(String(255), nullable=False)
+    name = Column(String(255), nullable=False)
+    value = Column(String(500), nullable=False)
+
+    __table_args__ = (
+        Index("ix_ifc_element_properties_lookup", "file_id", "name", "value", "pset"),
+    )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class IfcMetadata(Base):
+    """Header and entity summary of an uploaded IFC file, scanned while it was stored"""
+    __tablename__ = "ifc_metadata"
+
+    file_id = Column(Integer, ForeignKey("files.id", ondelete="CASCADE"), primary_key=True)
+    ifc_schema = Column(String(64), nullable=True, index=True)  # FILE_SCHEMA, e.g. IFC4 or IFC2X3
+    view_definition = Column(String(255), nullable=True)
+    file_name = Column(String(255), nullable=True)  # FILE_NAME fields as written by the exporter
+    file_timestamp = Column(String(64), nullable=True)
+    author = Column(String(255), nullable=True)
+    organization = Column(String(255), nullable=True)
+    preprocessor = Column(String(255), nullable=True)
+    authoring_tool = Column(String(255), nullable=True)
+    project_name = Column(String(255), nullable=True, index=True)
+    entity_count = Column(Integer, nullable=False, default=0)
+    entity_histogram = Column(JSON, nullable=False, default=dict)  # IFC type -> instance count
+    storeys = Column(JSON, nullable=False, default=list)  # [{global_id, name, elevation}] by elevation
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    file = relationship("File", back_populates="ifc_metadata")
+
+    def __repr__(self):
+        return f"<IfcMetadata(file_id={self.file_id}, schema='{self.ifc_schema}', project='{self.project_name}')>"
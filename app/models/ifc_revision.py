@@ -0,0 +1,27 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class IfcRevision(Base):
+    """One converted revision of a user's IFC file with its element-level diff to the previous one"""
+    __tablename__ = "ifc_revisions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String(255), nullable=False)
+    input_sha256 = Column(String(64), nullable=False, index=True)
+    content_sha256 = Column(String(64), nullable=False)  # digest of the GlobalId -> hash manifest
+    manifest_path = Column(String(500), nullable=False)  # manifests/<input sha256>.json.gz in MinIO
+    entity_count = Column(Integer, nullable=False, default=0)
+    previous_id = Column(Integer, ForeignKey("ifc_revisions.id", ondelete="SET NULL"), nullable=True)
+    added_count = Column(Integer, nullable=True)
+    removed_count = Column(Integer, nullable=True)
+    changed_count = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_ifc_revisions_user_id_filename", "user_id", "filename"),
+    )
+
+    def __repr__(self):
+        return f"<IfcRevision(id={self.id}, filename='{self.filename}', changed={self.changed_count})>"
@@ -0,0 +1,46 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database.base import Base
+
+class UploadSession(Base):
+    """Resumable upload backed by a MinIO multipart upload"""
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)  # public upload id (uuid4 hex)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    filename = Column(String(255), nullable=False)
+    original_filename = Column(String(255), nullable=False)
+    content_type = Column(String(100), nullable=True)
+    declared_size = Column(BigInteger, nullable=True)  # total size announced by the client, if any
+    part_size = Column(Integer, nullable=False)
+    object_name = Column(String(500), nullable=False)  # multipart target in MinIO
+    multipart_id = Column(String(255), nullable=False)  # MinIO upload id
+    status = Column(String(20), nullable=False, default="active")  # active | completed | aborted
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Relationships
+    parts = relationship("UploadPart", back_populates="session", cascade="all, delete-orphan", order_by="UploadPart.part_number")
+
+    def __repr__(self):
+        return f"<UploadSession(id='{self.id}', filename='{self.filename}', status='{self.status}')>"
+
+
+class UploadPart(Base):
+    """Acknowledged part of an upload session"""
+    __tablename__ = "upload_parts"
+
+    session_id = Column(String(32), ForeignKey("upload_sessions.id", ondelete="CASCADE"), primary_key=True)
+    part_number = Column(Integer, primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    etag = Column(String(255), nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    session = relationship("UploadSession", back_populates="parts")
+
+    def __repr__(self):
+        return f"<UploadPart(session_id='{self.session_id}', part_number={self.part_number}, size={self.size})>"
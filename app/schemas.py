@@ -156,3 +156,12 @@ class LoginHistoryEntry(BaseModel):
 
 class LoginHistoryResponse(BaseModel):
     login_history: list[LoginHistoryEntry]
+
+# Resumable upload schemas
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: Optional[int] = None
+    content_type: Optional[str] = None
+
+class FileBatchDelete(BaseModel):
+    filenames: list[str]
@@ -4,7 +4,7 @@ from typing import Optional
 from fastapi import Request, HTTPException, status
 
 try:
-    from app.cache import redis_client
+    from app.cache.redis_client import redis_client
 except Exception:
     redis_client = None  # type: ignore
 
@@ -22,25 +22,31 @@ class LoginRateLimiter:
         ip = request.client.host if request.client else "unknown"
         key = self._key(ip, email)
 
-        # Prefer Redis if connected
+        # Prefer Redis unless its circuit breaker is open
+        count = None
         try:
-            if redis_client and redis_client.is_connected():
+            if redis_client and redis_client.available():
                 now = int(time.time())
-                pipe = redis_client.client.pipeline()  # type: ignore[attr-defined]
-                pipe.zremrangebyscore(key, 0, now - self.window_sec)
-                pipe.zadd(key, {str(now): now})
-                pipe.zcard(key)
-                pipe.expire(key, self.window_sec)
-                _, _, count, _ = pipe.execute()
-                if int(count) > self.max_attempts:
-                    raise HTTPException(
-                        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                        detail="Too many login attempts. Try again later."
-                    )
-                return
+
+                def _window(r):
+                    pipe = r.pipeline()
+                    pipe.zremrangebyscore(key, 0, now - self.window_sec)
+                    pipe.zadd(key, {str(now): now})
+                    pipe.zcard(key)
+                    pipe.expire(key, self.window_sec)
+                    return pipe.execute()[2]
+
+                count = redis_client.call(_window)
         except Exception:
             # Fallback to memory
-            pass
+            count = None
+        if count is not None:
+            if int(count) > self.max_attempts:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts. Try again later."
+                )
+            return
 
         # In-memory fallback
         now = time.time()
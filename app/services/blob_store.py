@@ -0,0 +1,150 @@
+"""
+Content-addressed blob bookkeeping.
+
+Uploads are stored once under blobs/<sha256>; every `files` row that points
+at a blob holds one reference. Reference changes run in the caller's
+transaction. Releasing the last reference leaves the row at ref_count 0;
+after that transaction has committed, `purge_blobs` deletes row and object
+together under a row lock, so a concurrent `attach_blob` either keeps the
+blob or waits and recreates it (the uploader then writes the object again,
+see StorageService.settle_blobs).
+"""
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.blob import Blob
+from app.models.file import File as FileModel
+from app.storage.service import blob_object_name, user_object_name
+from app.logging.logger import logger
+
+
+def resolve_object_name(db: Session, user_id: int, filename: str) -> str:
+    """Object name backing a user's file: the blob path when deduplicated, else the legacy user path."""
+    row = db.query(FileModel.storage_path).filter(
+        FileModel.user_id == user_id,
+        FileModel.filename == filename
+    ).first()
+    if row and row[0]:
+        return row[0]
+    return user_object_name(user_id, filename)
+
+
+def attach_blob(db: Session, sha256: str, size: int) -> None:
+    """Take one reference on a blob, creating its row on first use."""
+    updated = db.query(Blob).filter(Blob.sha256 == sha256).update(
+        {Blob.ref_count: Blob.ref_count + 1}, synchronize_session=False
+    )
+    if updated:
+        return
+    try:
+        with db.begin_nested():
+            db.add(Blob(sha256=sha256, size=size, storage_path=blob_object_name(sha256), ref_count=1))
+    except IntegrityError:
+        # Another request created the row first
+        db.query(Blob).filter(Blob.sha256 == sha256).update(
+            {Blob.ref_count: Blob.ref_count + 1}, synchronize_session=False
+        )
+
+
+def release_blob(db: Session, sha256: str) -> Optional[str]:
+    """Drop one reference; returns the blob's object name when it became unreferenced.
+
+    The caller deletes the returned object via `purge_blobs` after committing.
+    """
+    orphaned = release_blobs(db, [sha256])
+    return orphaned[0] if orphaned else None
+
+
+def release_blobs(db: Session, sha256s: Iterable[str]) -> List[str]:
+    """Drop one reference per listed hash (repeats count) with a few set-based statements.
+
+    Returns the object names of blobs that became unreferenced; their rows
+    stay at ref_count 0 until `purge_blobs` removes them.
+    """
+    counts = Counter(sha for sha in sha256s if sha)
+    if not counts:
+        return []
+    by_count = {}
+    for sha, count in counts.items():
+        by_count.setdefault(count, []).append(sha)
+    for count, shas in by_count.items():
+        for chunk in _chunks(shas):
+            db.query(Blob).filter(Blob.sha256.in_(chunk)).update(
+                {Blob.ref_count: Blob.ref_count - count}, synchronize_session=False
+            )
+    orphaned: List[str] = []
+    for chunk in _chunks(list(counts)):
+        rows = db.query(Blob.sha256).filter(Blob.sha256.in_(chunk), Blob.ref_count <= 0).all()
+        orphaned.extend(blob_object_name(row[0]) for row in rows)
+    return orphaned
+
+
+def abandon_blobs(db: Session, storage, blobs: Dict[str, int]) -> List[str]:
+    """Delete objects written for blob references that were rolled back (sha256 -> size).
+
+    Call after the rollback. A ref_count 0 row is recorded for each blob
+    that has none, so `purge_blobs` can lock it; a blob that another upload
+    referenced in the meantime is kept.
+    """
+    if not blobs:
+        return []
+    try:
+        for sha, size in blobs.items():
+            try:
+                with db.begin_nested():
+                    db.add(Blob(sha256=sha, size=size, storage_path=blob_object_name(sha), ref_count=0))
+            except IntegrityError:
+                pass  # already known: referenced, or released and waiting for a purge
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.log_error(f"Не удалось освободить blob-объекты после отката: {e}")
+        return []
+    return purge_blobs(db, storage, [blob_object_name(sha) for sha in blobs])
+
+
+def _chunks(items: List[str], size: int = 500):
+    # Keeps IN (...) lists under SQLite's bound-parameter limit
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def purge_blobs(db: Session, storage, object_names: Iterable[Optional[str]]) -> List[str]:
+    """Delete released blobs that are still unreferenced, rows and objects together.
+
+    Call after the releasing transaction has committed; commits per chunk.
+    The rows are locked and deleted before their objects, and the objects are
+    removed before the commit. A blob re-attached in the meantime keeps its
+    row and is skipped, and a blob with no row at all is left alone.
+    """
+    candidates = list(dict.fromkeys(name.rsplit("/", 1)[-1] for name in object_names if name))
+    purged: List[str] = []
+    for chunk in _chunks(candidates):
+        shas = [row[0] for row in db.query(Blob.sha256).filter(
+            Blob.sha256.in_(chunk), Blob.ref_count <= 0
+        ).with_for_update().all()]
+        if not shas:
+            db.rollback()
+            continue
+        db.query(Blob).filter(Blob.sha256.in_(shas), Blob.ref_count <= 0).delete(synchronize_session=False)
+        # SQLite ignores FOR UPDATE: a row re-attached before the DELETE took the write lock survives it
+        kept = {row[0] for row in db.query(Blob.sha256).filter(Blob.sha256.in_(shas)).all()}
+        names = [blob_object_name(sha) for sha in shas if sha not in kept]
+        try:
+            failed = set(storage.delete_objects(names)) if names else set()
+        except Exception as e:
+            db.rollback()
+            logger.log_error(f"Не удалось удалить blob-объекты: {e}")
+            continue
+        for name in failed:
+            logger.log_error(f"Не удалось удалить blob {name}")
+        if failed:
+            # Keep the rows at ref_count 0: a later attach re-copies a missing object anyway
+            db.rollback()
+        else:
+            db.commit()
+        purged.extend(name for name in names if name not in failed)
+    return purged
@@ -1,9 +1,10 @@
 import asyncio
+import anyio
 import httpx
 from sqlalchemy import text
 from app.database import engine
-from app.cache import redis_client
-from app.storage import MinIOClient
+from app.cache.redis_client import redis_client
+from app.storage import get_minio_client
 from config import settings
 import logging
 
@@ -31,15 +32,20 @@ class HealthCheckService:
 
     @staticmethod
     async def check_redis() -> dict:
-        """Check Redis connection"""
+        """Check Redis connection (the only place that PINGs it)"""
+        def _probe():
+            if not redis_client.is_connected():
+                return None
+            # Test set/get
+            test_key = "health_check_test"
+            redis_client.set(test_key, "test_value", expire=10)
+            value = redis_client.get(test_key)
+            redis_client.delete(test_key)
+            return value
+
         try:
-            if redis_client.is_connected():
-                # Test set/get
-                test_key = "health_check_test"
-                redis_client.set(test_key, "test_value", expire=10)
-                value = redis_client.get(test_key)
-                redis_client.delete(test_key)
-                
+            value = await anyio.to_thread.run_sync(_probe)
+            if value is not None:
                 if value == "test_value":
                     return {
                         "status": "healthy",
@@ -67,9 +73,8 @@ class HealthCheckService:
     async def check_minio() -> dict:
         """Check MinIO connection"""
         try:
-            minio_client = MinIOClient()
-            # Try to list buckets
-            buckets = minio_client.client.list_buckets()
+            # Try to list buckets (blocking SDK call, keep it off the event loop)
+            buckets = await anyio.to_thread.run_sync(lambda: get_minio_client().client.list_buckets())
             return {
                 "status": "healthy",
                 "endpoint": settings.MINIO_ENDPOINT,
@@ -0,0 +1,157 @@
+"""
+Element index: IFC elements of a file with class, storey and flattened
+property sets, searchable without downloading or parsing the model.
+
+The conversion worker builds it from the IFC it has already downloaded;
+rows are tied to the file and to the SHA-256 of the content they were read
+from, so a replaced file reports its index as stale until it is rebuilt.
+Elements also carry their world bounding box for spatial queries
+(app.services.spatial_index).
+"""
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from app.ifc.elements import extract_elements
+from app.models.file import File as FileModel
+from app.models.ifc_element import IfcElement, IfcElementIndex, IfcElementProperty
+from config import settings
+
+INSERT_BATCH = 1000
+INDEX_VERSION = 2  # 2: bounding boxes
+
+
+def wants_element_index(filename: str) -> bool:
+    return settings.IFC_ELEMENT_INDEX_ENABLED and filename.lower().endswith(".ifc")
+
+
+def element_index_current(db: Session, user_id: int, filename: str, content_sha256: str) -> bool:
+    return db.query(IfcElementIndex.file_id).join(FileModel, FileModel.id == IfcElementIndex.file_id).filter(
+        FileModel.user_id == user_id,
+        FileModel.filename == filename,
+        IfcElementIndex.content_sha256 == content_sha256,
+        IfcElementIndex.index_version >= INDEX_VERSION
+    ).first() is not None
+
+
+def delete_element_index(db: Session, file_ids: Iterable[int]) -> None:
+    """Drop the index rows of these files in the caller's transaction."""
+    ids: List[int] = list(file_ids)
+    if not ids:
+        return
+    db.query(IfcElementProperty).filter(IfcElementProperty.file_id.in_(ids)).delete(synchronize_session=False)
+    db.query(IfcElement).filter(IfcElement.file_id.in_(ids)).delete(synchronize_session=False)
+    db.query(IfcElementIndex).filter(IfcElementIndex.file_id.in_(ids)).delete(synchronize_session=False)
+
+
+def _element(file_id: int, record) -> IfcElement:
+    element = IfcElement(
+        file_id=file_id, global_id=record.global_id, ifc_class=record.ifc_class[:64],
+        name=record.name[:255] if record.name else None, storey_id=record.storey_id,
+        storey=record.storey[:255] if record.storey else None,
+    )
+    if record.bounds:
+        element.min_x, element.min_y, element.min_z, element.max_x, element.max_y, element.max_z = record.bounds
+    return element
+
+
+def _flush_batch(db: Session, file_id: int, batch: List) -> int:
+    elements = [_element(file_id, r) for r in batch]
+    db.add_all(elements)
+    db.flush()
+    rows = [
+        {"element_id": element.id, "file_id": file_id, "pset": pset[:255], "name": name[:255], "value": value[:500]}
+        for element, record in zip(elements, batch)
+        for pset, name, value in record.properties
+    ]
+    if rows:
+        db.execute(insert(IfcElementProperty), rows)
+    for element in elements:
+        db.expunge(element)
+    return len(rows)
+
+
+def build_element_index(db: Session, user_id: int, filename: str, path: str, content_sha256: str) -> Optional[int]:
+    """(Re)build the index of a user's file from a local copy; returns the element count, None if up to date."""
+    record = db.query(FileModel).filter(FileModel.user_id == user_id, FileModel.filename == filename).first()
+    if record is None or element_index_current(db, user_id, filename, content_sha256):
+        return None
+    delete_element_index(db, [record.id])
+    elements = properties = 0
+    seen = set()
+    batch = []
+    with open(path, "rb") as f:
+        for element in extract_elements(f, bounds=settings.IFC_ELEMENT_BOUNDS_ENABLED):
+            if element.global_id in seen:
+                continue  # duplicate GlobalIds exist in the wild; the first one wins
+            seen.add(element.global_id)
+            batch.append(element)
+            if len(batch) >= INSERT_BATCH:
+                properties += _flush_batch(db, record.id, batch)
+                elements += len(batch)
+                batch = []
+    if batch:
+        properties += _flush_batch(db, record.id, batch)
+        elements += len(batch)
+    db.add(IfcElementIndex(
+        file_id=record.id, content_sha256=content_sha256, element_count=elements,
+        property_count=properties, index_version=INDEX_VERSION
+    ))
+    db.commit()
+    return elements
+
+
+def parse_property_filters(params: Iterable[Tuple[str, str]]) -> List[Tuple[Optional[str], str, str]]:
+    """`Pset_DoorCommon.FireRating=EI60` -> (pset, property, value); `*.FireRating` matches any set."""
+    filters = []
+    for key, value in params:
+        pset, _, name = key.partition(".")
+        if name:
+            filters.append((None if pset == "*" else pset, name, value))
+    return filters
+
+
+def search_elements(
+    db: Session,
+    file_id: int,
+    ifc_classes: Optional[List[str]] = None,
+    storey: Optional[str] = None,
+    properties: Optional[List[Tuple[Optional[str], str, str]]] = None,
+    limit: int = 100,
+    offset: int = 0,
+) -> Tuple[int, List[Dict]]:
+    """Total match count and one page of elements with their properties."""
+    query = db.query(IfcElement).filter(IfcElement.file_id == file_id)
+    if ifc_classes:
+        query = query.filter(IfcElement.ifc_class.in_([c.upper() for c in ifc_classes]))
+    if storey:
+        query = query.filter((IfcElement.storey == storey) | (IfcElement.storey_id == storey))
+    for pset, name, value in properties or []:
+        matches = select(IfcElementProperty.element_id).where(
+            IfcElementProperty.file_id == file_id,
+            IfcElementProperty.name == name,
+            IfcElementProperty.value == value
+        )
+        if pset is not None:
+            matches = matches.where(IfcElementProperty.pset == pset)
+        query = query.filter(IfcElement.id.in_(matches))
+    total = query.with_entities(func.count(IfcElement.id)).scalar() or 0
+    page = query.order_by(IfcElement.id).limit(limit).offset(offset).all()
+    props: Dict[int, Dict[str, str]] = {element.id: {} for element in page}
+    if page:
+        for element_id, pset, name, value in db.query(
+            IfcElementProperty.element_id, IfcElementProperty.pset, IfcElementProperty.name, IfcElementProperty.value
+        ).filter(IfcElementProperty.element_id.in_(list(props))):
+            props[element_id][f"{pset}.{name}"] = value
+    return total, [
+        {
+            "global_id": element.global_id,
+            "ifc_class": element.ifc_class,
+            "name": element.name,
+            "storey": element.storey,
+            "storey_id": element.storey_id,
+            "properties": props[element.id],
+        }
+        for element in page
+    ]
@@ -0,0 +1,95 @@
+"""
+`ifc_metadata` rows: header and entity summary of uploaded IFC files.
+
+Uploads of .ifc files are scanned while they stream to storage, so listings
+never have to read object bytes again. Files stored without a scan
+(resumable uploads) take the metadata of another file with the same blob,
+or get it from the conversion worker, which has the IFC on disk anyway.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.ifc.metadata import IfcMetadataScanner, scan_ifc_metadata
+from app.models.file import File as FileModel
+from app.models.ifc_metadata import IfcMetadata
+from config import settings
+
+METADATA_FIELDS = (
+    "ifc_schema", "view_definition", "file_name", "file_timestamp", "author", "organization",
+    "preprocessor", "authoring_tool", "project_name", "entity_count", "entity_histogram", "storeys",
+)
+
+
+def wants_scan(filename: str) -> bool:
+    # .ifcxml and .ifczip are not STEP text
+    return settings.IFC_METADATA_ENABLED and filename.lower().endswith(".ifc")
+
+
+def metadata_scanner(filename: str) -> Optional[IfcMetadataScanner]:
+    return IfcMetadataScanner() if wants_scan(filename) else None
+
+
+def apply_ifc_metadata(record: FileModel, values: Optional[Dict]) -> None:
+    """Set (or clear, for None) the file's metadata in the caller's transaction."""
+    if values is None:
+        record.ifc_metadata = None
+    elif record.ifc_metadata is None:
+        record.ifc_metadata = IfcMetadata(**{field: values.get(field) for field in METADATA_FIELDS})
+    else:
+        for field in METADATA_FIELDS:
+            setattr(record.ifc_metadata, field, values.get(field))
+
+
+def blob_metadata(db: Session, blob_sha256: str) -> Optional[Dict]:
+    """Metadata already scanned for another file with the same content."""
+    row = db.query(IfcMetadata).join(FileModel, FileModel.id == IfcMetadata.file_id).filter(
+        FileModel.blob_sha256 == blob_sha256
+    ).first()
+    return {field: getattr(row, field) for field in METADATA_FIELDS} if row else None
+
+
+def backfill_ifc_metadata(db: Session, user_id: int, filename: str, path: str) -> bool:
+    """Scan a local copy of a file that has no metadata yet; returns True when a row was added."""
+    if not wants_scan(filename):
+        return False
+    record = db.query(FileModel).filter(FileModel.user_id == user_id, FileModel.filename == filename).first()
+    if record is None or record.ifc_metadata is not None:
+        return False
+    with open(path, "rb") as f:
+        values = scan_ifc_metadata(f)
+    if values is None:
+        return False
+    apply_ifc_metadata(record, values)
+    db.commit()
+    return True
+
+
+def delete_ifc_metadata(db: Session, file_ids: Iterable[int]) -> None:
+    """Explicit delete for bulk file deletes (SQLite does not enforce ON DELETE CASCADE)."""
+    ids: List[int] = list(file_ids)
+    if ids:
+        db.query(IfcMetadata).filter(IfcMetadata.file_id.in_(ids)).delete(synchronize_session=False)
+
+
+def metadata_summary(row: Optional[IfcMetadata]) -> Optional[Dict]:
+    """Listing fields; the full histogram stays in the per-file endpoint."""
+    if row is None:
+        return None
+    return {
+        "schema": row.ifc_schema,
+        "view_definition": row.view_definition,
+        "project_name": row.project_name,
+        "authoring_tool": row.authoring_tool,
+        "author": row.author,
+        "organization": row.organization,
+        "file_timestamp": row.file_timestamp,
+        "entity_count": row.entity_count,
+        "storeys": [storey.get("name") for storey in row.storeys or []],
+    }
+
+
+def metadata_payload(row: IfcMetadata) -> Dict:
+    payload = {field: getattr(row, field) for field in METADATA_FIELDS}
+    payload["schema"] = payload.pop("ifc_schema")
+    return payload
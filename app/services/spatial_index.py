@@ -0,0 +1,156 @@
+"""
+Spatial queries over element bounding boxes.
+
+Boxes live on `ifc_elements` (min/max x, y, z in metres). For queries they
+are bulk-loaded into a packed R-tree (Sort-Tile-Recursive, fixed fan-out),
+built once per file and content and kept in a small per-process LRU, so a
+box or radius query walks a few hundred node boxes instead of scanning
+every element. The tree is immutable: a rebuilt element index has a new
+content hash and gets a new tree.
+"""
+import math
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.ifc_element import IfcElement, IfcElementIndex
+from config import settings
+
+Box = Tuple[float, float, float, float, float, float]
+NODE_CAPACITY = 16
+
+
+def _center(boxes: array, i: int, axis: int) -> float:
+    return boxes[i * 6 + axis] + boxes[i * 6 + axis + 3]
+
+
+class PackedRTree:
+    """Static 3D R-tree over `count` boxes; queries yield the positions of matching boxes."""
+
+    def __init__(self, boxes: Sequence[Box], capacity: int = NODE_CAPACITY) -> None:
+        self.capacity = max(2, capacity)
+        flat = array("d")
+        for box in boxes:
+            flat.extend(box)
+        order = self._str_order(flat, list(range(len(boxes))), 0)
+        self.ids = array("l", order)  # leaf slot -> original position
+        self.levels: List[array] = []  # levels[0] = leaf boxes in slot order, last = root level
+        level = array("d")
+        for i in order:
+            level.extend(flat[i * 6:i * 6 + 6])
+        self.levels.append(level)
+        while len(level) > 6:
+            level = self._parent_level(level)
+            self.levels.append(level)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _str_order(self, boxes: array, items: List[int], axis: int) -> List[int]:
+        items.sort(key=lambda i: _center(boxes, i, axis))
+        if axis == 2 or len(items) <= self.capacity:
+            return items
+        pages = math.ceil(len(items) / self.capacity)
+        slabs = math.ceil(pages ** (1 / (3 - axis)))
+        slab_size = self.capacity * math.ceil(pages / slabs)
+        ordered: List[int] = []
+        for start in range(0, len(items), slab_size):
+            ordered.extend(self._str_order(boxes, items[start:start + slab_size], axis + 1))
+        return ordered
+
+    def _parent_level(self, level: array) -> array:
+        count = len(level) // 6
+        parent = array("d")
+        for start in range(0, count, self.capacity):
+            end = min(start + self.capacity, count)
+            parent.extend(min(level[i * 6 + a] for i in range(start, end)) for a in range(3))
+            parent.extend(max(level[i * 6 + a] for i in range(start, end)) for a in range(3, 6))
+        return parent
+
+    def _search(self, accept) -> Iterator[int]:
+        if not self.ids:
+            return
+        top = len(self.levels) - 1
+        stack = [(top, i) for i in range(len(self.levels[top]) // 6)]
+        while stack:
+            depth, node = stack.pop()
+            level = self.levels[depth]
+            if not accept(level, node * 6):
+                continue
+            if depth == 0:
+                yield self.ids[node]
+                continue
+            first = node * self.capacity
+            last = min(first + self.capacity, len(self.levels[depth - 1]) // 6)
+            stack.extend((depth - 1, child) for child in range(first, last))
+
+    def intersecting(self, box: Box) -> Iterator[int]:
+        """Positions of boxes that overlap `box` (touching counts)."""
+        def accept(level: array, o: int) -> bool:
+            return (level[o] <= box[3] and level[o + 3] >= box[0] and level[o + 1] <= box[4]
+                    and level[o + 4] >= box[1] and level[o + 2] <= box[5] and level[o + 5] >= box[2])
+        return self._search(accept)
+
+    def within(self, point: Sequence[float], radius: float) -> Iterator[int]:
+        """Positions of boxes whose closest point is at most `radius` from `point`."""
+        limit = radius * radius
+
+        def accept(level: array, o: int) -> bool:
+            d = 0.0
+            for a in range(3):
+                if point[a] < level[o + a]:
+                    d += (level[o + a] - point[a]) ** 2
+                elif point[a] > level[o + a + 3]:
+                    d += (point[a] - level[o + a + 3]) ** 2
+            return d <= limit
+        return self._search(accept)
+
+
+class SpatialIndex:
+    """R-tree of one file's element boxes with their GlobalIds and classes."""
+
+    def __init__(self, global_ids: List[str], classes: List[str], boxes: List[Box]) -> None:
+        self.global_ids = global_ids
+        self.classes = classes
+        self.tree = PackedRTree(boxes)
+
+    def _select(self, positions: Iterator[int], ifc_classes: Optional[List[str]]) -> List[str]:
+        wanted = {c.upper() for c in ifc_classes} if ifc_classes else None
+        return sorted(self.global_ids[i] for i in positions if wanted is None or self.classes[i] in wanted)
+
+    def intersecting(self, box: Box, ifc_classes: Optional[List[str]] = None) -> List[str]:
+        return self._select(self.tree.intersecting(box), ifc_classes)
+
+    def within(self, point: Sequence[float], radius: float, ifc_classes: Optional[List[str]] = None) -> List[str]:
+        return self._select(self.tree.within(point, radius), ifc_classes)
+
+
+_trees: "OrderedDict[Tuple[int, str, int], SpatialIndex]" = OrderedDict()
+_trees_lock = threading.Lock()
+
+
+def load_spatial_index(db: Session, element_index: IfcElementIndex) -> SpatialIndex:
+    """The file's tree for this index build, from the LRU or loaded from ifc_elements."""
+    file_id = element_index.file_id
+    key = (file_id, element_index.content_sha256, element_index.index_version)
+    with _trees_lock:
+        index = _trees.get(key)
+        if index is not None:
+            _trees.move_to_end(key)
+            return index
+    rows = db.query(
+        IfcElement.global_id, IfcElement.ifc_class,
+        IfcElement.min_x, IfcElement.min_y, IfcElement.min_z, IfcElement.max_x, IfcElement.max_y, IfcElement.max_z
+    ).filter(IfcElement.file_id == file_id, IfcElement.min_x.isnot(None)).all()
+    index = SpatialIndex([r[0] for r in rows], [r[1] for r in rows], [tuple(r[2:]) for r in rows])
+    with _trees_lock:
+        _trees[key] = index
+        _trees.move_to_end(key)
+        for stale in [k for k in _trees if k[0] == file_id and k != key]:
+            del _trees[stale]
+        while len(_trees) > settings.SPATIAL_INDEX_CACHE_SIZE:
+            _trees.popitem(last=False)
+    return index
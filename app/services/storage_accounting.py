@@ -0,0 +1,103 @@
+"""
+Storage usage accounting.
+
+`users.used_storage` is the quota counter. Routes keep it in step with the
+files table through atomic `used_storage = used_storage + :delta` updates,
+so quota checks cost one primary-key read regardless of how many files a
+user has. Growth is reserved with a conditional update that only applies
+while the result stays within the quota, so concurrent uploads cannot
+overshoot it together. A periodic reconciliation compares the counter with
+MinIO and applies the drift as a delta.
+
+Deduplicated files are charged at their logical size to every owner, so
+their share comes from the files table rather than the user's prefix.
+"""
+from typing import Dict, List
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.file import File as FileModel
+from app.logging.logger import logger
+
+DEFAULT_STORAGE_QUOTA = 1073741824  # 1GB
+
+
+def adjust_used_storage(db: Session, user_id: int, delta: int) -> None:
+    """Atomically add `delta` bytes (may be negative) to the user's counter.
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    if not delta:
+        return
+    new_value = func.coalesce(User.used_storage, 0) + delta
+    db.query(User).filter(User.id == user_id).update(
+        {User.used_storage: case((new_value < 0, 0), else_=new_value)},
+        synchronize_session=False,
+    )
+
+
+def reserve_used_storage(db: Session, user_id: int, delta: int) -> bool:
+    """Add `delta` bytes only if the counter stays within the quota; False when it would not.
+
+    One conditional UPDATE, so the check and the charge cannot interleave with
+    another upload. Runs in the caller's transaction: rolling it back releases
+    the reservation.
+    """
+    if delta <= 0:
+        adjust_used_storage(db, user_id, delta)
+        return True
+    new_value = func.coalesce(User.used_storage, 0) + delta
+    updated = db.query(User).filter(
+        User.id == user_id,
+        new_value <= func.coalesce(User.storage_quota, DEFAULT_STORAGE_QUOTA),
+    ).update({User.used_storage: new_value}, synchronize_session=False)
+    return updated == 1
+
+
+def get_quota_state(db: Session, user_id: int) -> tuple:
+    """Return (used_storage, storage_quota) straight from the users row."""
+    row = db.query(User.used_storage, User.storage_quota).filter(User.id == user_id).first()
+    if not row:
+        return 0, 0
+    return int(row[0] or 0), int(row[1] or DEFAULT_STORAGE_QUOTA)
+
+
+def _blob_usage(db: Session, user_id: int) -> int:
+    """Logical size of the user's deduplicated files."""
+    total = db.query(func.coalesce(func.sum(FileModel.file_size), 0)).filter(
+        FileModel.user_id == user_id,
+        FileModel.blob_sha256.isnot(None),
+    ).scalar()
+    return int(total or 0)
+
+
+def reconcile_storage_usage(db: Session, storage) -> List[Dict]:
+    """Compare every user's counter with the bytes actually stored for them.
+
+    Drift is applied as a delta against the counter read right before the
+    listing, so uploads and deletes committed meanwhile are not overwritten.
+    Cost is one prefix listing per user, so this belongs in a periodic job,
+    not a request.
+    """
+    drift: List[Dict] = []
+    user_ids = [user_id for (user_id,) in db.query(User.id).all()]
+    for user_id in user_ids:
+        # Counter and deduplicated share are read together, so dedup uploads
+        # and deletes committed between users do not show up as drift
+        used, _ = get_quota_state(db, user_id)
+        shared = _blob_usage(db, user_id)
+        db.commit()  # end the read transaction so the listing sees later commits
+        try:
+            actual = storage.get_user_usage(user_id) + shared
+        except Exception as e:
+            logger.log_error(f"Reconciliation skipped for user {user_id}: {e}")
+            continue
+        if used != actual:
+            drift.append({"user_id": user_id, "counter": used, "actual": actual})
+            adjust_used_storage(db, user_id, actual - used)
+            db.commit()
+    if drift:
+        logger.log_admin_action(f"Storage usage reconciled for {len(drift)} users: {drift[:20]}", None, "STORAGE_RECONCILE")
+    return drift
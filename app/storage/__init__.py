@@ -1,5 +1,5 @@
-from .minio_client import MinIOClient
+from .minio_client import MinIOClient, get_minio_client
 
-__all__ = ["MinIOClient"]
+__all__ = ["MinIOClient", "get_minio_client"]
 
 
@@ -2,20 +2,48 @@
 MinIO Client for file storage
 """
 import os
+import socket
+import threading
+import certifi
+import urllib3
+from urllib3.connection import HTTPConnection
 from minio import Minio
+from minio.commonconfig import CopySource
+from minio.datatypes import Part
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
-from typing import List, Dict, Optional
+from typing import BinaryIO, Iterable, List, Dict, Optional
 import io
 from config import settings
 
+UPLOAD_PART_SIZE = settings.UPLOAD_PART_SIZE_MB * 1024 * 1024
+
+
+def build_http_client() -> urllib3.PoolManager:
+    """Keep-alive connection pool tuned from settings (size, timeouts, retries)."""
+    return urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=settings.MINIO_CONNECT_TIMEOUT_SEC, read=settings.MINIO_READ_TIMEOUT_SEC),
+        maxsize=settings.MINIO_POOL_MAXSIZE,
+        cert_reqs="CERT_REQUIRED" if settings.MINIO_SECURE else "CERT_NONE",
+        ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+        retries=urllib3.Retry(
+            total=settings.MINIO_MAX_RETRIES,
+            backoff_factor=0.2,
+            status_forcelist=[500, 502, 503, 504]
+        ),
+        socket_options=HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)],
+    )
+
+
 class MinIOClient:
-    def __init__(self):
+    def __init__(self, http_client: Optional[urllib3.PoolManager] = None):
         """Initialize MinIO client"""
         self.client = Minio(
             settings.MINIO_ENDPOINT,
             access_key=settings.MINIO_ACCESS_KEY,
             secret_key=settings.MINIO_SECRET_KEY,
-            secure=False  # Set to True for HTTPS
+            secure=settings.MINIO_SECURE,
+            http_client=http_client
         )
         self.bucket_name = settings.MINIO_BUCKET_NAME
         self._ensure_bucket_exists()
@@ -29,18 +57,25 @@ class MinIOClient:
         except S3Error as e:
             print(f"❌ Error creating bucket: {e}")
     
-    def upload_user_file(self, user_id: int, filename: str, file_data: io.BytesIO, content_type: str = "application/octet-stream") -> bool:
-        """Upload a file for a user"""
+    def upload_file(self, object_name: str, file_data: BinaryIO, content_type: str = "application/octet-stream", length: int = -1) -> bool:
+        """Upload a stream to `object_name`.
+
+        With unknown length (-1) the SDK streams `file_data` as a multipart
+        upload, holding at most one part of UPLOAD_PART_SIZE in memory.
+        """
         try:
-            object_name = f"user_{user_id}/{filename}"
-            file_data.seek(0)
+            if isinstance(file_data, io.BytesIO):
+                file_data.seek(0)
+                length = file_data.getbuffer().nbytes
             
             self.client.put_object(
                 self.bucket_name,
                 object_name,
                 file_data,
-                file_data.getbuffer().nbytes,
-                content_type=content_type
+                length,
+                content_type=content_type,
+                part_size=UPLOAD_PART_SIZE if length < 0 else 0,
+                num_parallel_uploads=1
             )
             print(f"✅ File uploaded: {object_name}")
             return True
@@ -48,6 +83,88 @@ class MinIOClient:
             print(f"❌ Error uploading file: {e}")
             return False
     
+    def upload_user_file(self, user_id: int, filename: str, file_data: BinaryIO, content_type: str = "application/octet-stream", length: int = -1) -> bool:
+        """Upload a file for a user"""
+        return self.upload_file(f"user_{user_id}/{filename}", file_data, content_type, length)
+    
+    # Multipart primitives for resumable uploads; parts live in MinIO until completed or aborted
+    
+    def create_multipart_upload(self, object_name: str, content_type: str = "application/octet-stream") -> Optional[str]:
+        """Start a multipart upload and return its upload id"""
+        try:
+            return self.client._create_multipart_upload(self.bucket_name, object_name, {"Content-Type": content_type})
+        except S3Error as e:
+            print(f"❌ Error starting multipart upload: {e}")
+            return None
+    
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes, content_md5: Optional[str] = None) -> Optional[str]:
+        """Upload one part; MinIO verifies `content_md5` (base64) when given. Returns the part etag."""
+        headers = {"Content-MD5": content_md5} if content_md5 else None
+        try:
+            return self.client._upload_part(self.bucket_name, object_name, data, headers, upload_id, part_number)
+        except S3Error as e:
+            print(f"❌ Error uploading part {part_number}: {e}")
+            return None
+    
+    def complete_multipart_upload(self, object_name: str, upload_id: str, parts: List[tuple]) -> bool:
+        """Assemble the object from (part_number, etag) pairs in ascending order"""
+        try:
+            self.client._complete_multipart_upload(
+                self.bucket_name, object_name, upload_id,
+                [Part(number, etag.strip('"')) for number, etag in parts]
+            )
+            return True
+        except S3Error as e:
+            print(f"❌ Error completing multipart upload: {e}")
+            return False
+    
+    def abort_multipart_upload(self, object_name: str, upload_id: str) -> bool:
+        """Discard a multipart upload and its stored parts"""
+        try:
+            self.client._abort_multipart_upload(self.bucket_name, object_name, upload_id)
+            return True
+        except S3Error as e:
+            if e.code != "NoSuchUpload":
+                print(f"❌ Error aborting multipart upload: {e}")
+            return False
+    
+    def copy_file(self, source_name: str, object_name: str) -> bool:
+        """Server-side copy within the bucket (no data passes through the app)"""
+        try:
+            self.client.copy_object(self.bucket_name, object_name, CopySource(self.bucket_name, source_name))
+            return True
+        except S3Error as e:
+            print(f"❌ Error copying file: {e}")
+            return False
+    
+    def delete_file(self, object_name: str) -> bool:
+        """Delete an object by name"""
+        try:
+            self.client.remove_object(self.bucket_name, object_name)
+            print(f"✅ File deleted: {object_name}")
+            return True
+        except S3Error as e:
+            print(f"❌ Error deleting file: {e}")
+            return False
+    
+    def delete_files(self, object_names: Iterable[str]) -> List[str]:
+        """Bulk delete via multi-object DeleteObjects (up to 1000 keys per request).
+        Returns the names that could not be deleted.
+        """
+        names = list(object_names)
+        if not names:
+            return []
+        try:
+            errors = self.client.remove_objects(self.bucket_name, [DeleteObject(name) for name in names])
+            # Deletion is lazy: the requests run while the errors are iterated
+            failed = [error.name for error in errors]
+            for name in failed:
+                print(f"❌ Error deleting file: {name}")
+            return failed
+        except S3Error as e:
+            print(f"❌ Error deleting files: {e}")
+            return names
+    
     def download_file(self, object_name: str) -> Optional[bytes]:
         """Download a file"""
         try:
@@ -60,6 +177,25 @@ class MinIOClient:
             print(f"❌ Error downloading file: {e}")
             return None
     
+    def stat_file(self, object_name: str):
+        """Get object metadata (size, etag, last_modified) without reading its data"""
+        try:
+            return self.client.stat_object(self.bucket_name, object_name)
+        except S3Error as e:
+            if e.code not in ("NoSuchKey", "NoSuchObject"):
+                print(f"❌ Error reading file metadata: {e}")
+            return None
+    
+    def open_file(self, object_name: str, offset: int = 0, length: int = 0):
+        """Open a streaming response for an object or a byte range of it.
+        Caller must close() and release_conn() the returned response.
+        """
+        try:
+            return self.client.get_object(self.bucket_name, object_name, offset=offset, length=length)
+        except S3Error as e:
+            print(f"❌ Error opening file: {e}")
+            return None
+    
     def delete_user_file(self, user_id: int, filename: str) -> bool:
         """Delete a user's file"""
         try:
@@ -125,8 +261,10 @@ class MinIOClient:
                 recursive=True
             )
             
-            for obj in objects:
-                self.client.remove_object(self.bucket_name, obj.object_name)
+            failed = self.delete_files(obj.object_name for obj in objects)
+            if failed:
+                print(f"❌ Error deleting user folder: {len(failed)} objects left")
+                return False
             
             print(f"✅ Deleted all files for user {user_id}")
             return True
@@ -134,3 +272,19 @@ class MinIOClient:
             print(f"❌ Error deleting user folder: {e}")
             return False
 
+
+_shared_client: Optional[MinIOClient] = None
+_shared_lock = threading.Lock()
+
+
+def get_minio_client() -> MinIOClient:
+    """Process-wide MinIO client sharing one connection pool.
+
+    The bucket is checked once, when the client is first created.
+    """
+    global _shared_client
+    if _shared_client is None:
+        with _shared_lock:
+            if _shared_client is None:
+                _shared_client = MinIOClient(http_client=build_http_client())
+    return _shared_client
@@ -1,14 +1,218 @@
-from io import BytesIO
-from typing import List, Optional
+import hashlib
+import uuid
+from datetime import datetime
+from functools import partial
+from typing import Any, BinaryIO, Callable, List, NamedTuple, Optional, Tuple
 
-from app.storage import MinIOClient
+import anyio
+from fastapi import Depends
+
+from app.cache.local_cache import TTLCache
+from app.storage import MinIOClient, get_minio_client
+from config import settings
+
+
+class FileStat(NamedTuple):
+    """Object metadata needed to answer HEAD and conditional requests."""
+    size: int
+    etag: Optional[str]
+    last_modified: Optional[datetime]
+    content_type: Optional[str]
+
+
+# Short-lived per-process metadata cache keyed by object name
+file_meta_cache = TTLCache(maxsize=settings.FILE_META_CACHE_SIZE, ttl=settings.FILE_META_CACHE_TTL_SEC)
+# Object name behind (user_id, filename), so a HEAD hit needs no files lookup
+object_name_cache = TTLCache(maxsize=settings.FILE_META_CACHE_SIZE, ttl=settings.FILE_META_CACHE_TTL_SEC)
+
+# Bounds on worker threads running blocking SDK calls. Uploads are long-lived,
+# so they get a separate cap and cannot starve metadata/download calls.
+storage_limiter = anyio.CapacityLimiter(settings.STORAGE_MAX_CONCURRENCY)
+upload_limiter = anyio.CapacityLimiter(settings.STORAGE_MAX_CONCURRENT_UPLOADS)
+
+UPLOAD_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def user_object_name(user_id: int, filename: str) -> str:
+    """Legacy per-user object path."""
+    return f"user_{user_id}/{filename}"
+
+
+def blob_object_name(sha256: str) -> str:
+    """Content-addressed object path for a blob."""
+    return f"blobs/{sha256}"
 
 
 class StorageService:
     """Thin service layer over MinIOClient to decouple routes from SDK calls."""
 
-    def __init__(self) -> None:
-        self._client = MinIOClient()
+    def __init__(self, client: Optional[MinIOClient] = None) -> None:
+        self._minio = client
+        self._staged_blobs: List[Tuple[str, str]] = []  # (sha256, staging name) awaiting settle_blobs
+
+    @property
+    def _client(self) -> MinIOClient:
+        # Resolved on first SDK call so cache hits never touch the client
+        if self._minio is None:
+            self._minio = get_minio_client()
+        return self._minio
+
+    # Object-level operations (object_name is a full path in the bucket)
+
+    def stat_object(self, object_name: str, use_cache: bool = False) -> Optional[FileStat]:
+        """Object metadata via stat_object; `use_cache` serves it from the metadata cache when fresh."""
+        if use_cache:
+            cached = file_meta_cache.get(object_name)
+            if cached is not None:
+                return cached
+        obj = self._client.stat_file(object_name)
+        if obj is None:
+            return None
+        stat = FileStat(obj.size or 0, obj.etag, obj.last_modified, obj.content_type)
+        file_meta_cache.set(object_name, stat)
+        return stat
+
+    def open_object(self, object_name: str, offset: int = 0, length: int = 0):
+        return self._client.open_file(object_name, offset, length)
+
+    def download_object(self, object_name: str) -> Optional[bytes]:
+        return self._client.download_file(object_name)
+
+    def upload_object(self, object_name: str, data: BinaryIO, content_type: Optional[str], length: int = -1) -> bool:
+        file_meta_cache.delete(object_name)
+        return self._client.upload_file(object_name, data, content_type or "application/octet-stream", length)
+
+    def download_object_to(self, object_name: str, fileobj: BinaryIO) -> Optional[int]:
+        """Stream an object into `fileobj` chunk by chunk; returns bytes written or None if it is missing."""
+        response = self._client.open_file(object_name)
+        if response is None:
+            return None
+        written = 0
+        try:
+            for chunk in response.stream(UPLOAD_HASH_CHUNK_SIZE):
+                fileobj.write(chunk)
+                written += len(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+        return written
+
+    def delete_object(self, object_name: str) -> bool:
+        file_meta_cache.delete(object_name)
+        return self._client.delete_file(object_name)
+
+    def delete_objects(self, object_names: List[str]) -> List[str]:
+        """Bulk delete; returns the names that could not be deleted."""
+        for name in object_names:
+            file_meta_cache.delete(name)
+        return self._client.delete_files(object_names)
+
+    def store_blob(self, data, content_type: Optional[str]) -> Optional[str]:
+        """Stream `data` (a HashingReader) into a staging object and return its SHA-256.
+
+        blobs/<sha256> is not written here: the caller takes its reference with
+        attach_blob first and then calls `settle_blobs`, so a concurrent
+        purge_blobs cannot delete the object between the two.
+        """
+        staging_name = f"staging/{uuid.uuid4().hex}"
+        if not self._client.upload_file(staging_name, data, content_type or "application/octet-stream"):
+            return None
+        sha256 = data.hexdigest()
+        self._staged_blobs.append((sha256, staging_name))
+        return sha256
+
+    def stage_object(self, data: BinaryIO, content_type: Optional[str]) -> Optional[str]:
+        """Upload `data` under a unique staging name; returns that name, or None on failure."""
+        staging_name = f"staging/{uuid.uuid4().hex}"
+        if not self._client.upload_file(staging_name, data, content_type or "application/octet-stream"):
+            return None
+        return staging_name
+
+    def promote_staged(self, staging_name: str, object_name: str) -> bool:
+        """Server-side copy a staged object to its final name, then drop the staged copy."""
+        file_meta_cache.delete(object_name)
+        if not self._client.copy_file(staging_name, object_name):
+            return False
+        self._client.delete_file(staging_name)
+        return True
+
+    def backup_object(self, object_name: str) -> Tuple[bool, Optional[str]]:
+        """Server-side copy an object about to be replaced to a unique staging name.
+
+        Returns (ok, backup name), the name being None when nothing exists yet.
+        """
+        if self._client.stat_file(object_name) is None:
+            return True, None
+        backup_name = f"staging/{uuid.uuid4().hex}"
+        if not self._client.copy_file(object_name, backup_name):
+            return False, None
+        return True, backup_name
+
+    def restore_object(self, object_name: str, backup_name: Optional[str]) -> bool:
+        """Undo a replacement: copy the backup back and drop it, or delete the object when there was none."""
+        file_meta_cache.delete(object_name)
+        if backup_name is None:
+            return self._client.delete_file(object_name)
+        if not self._client.copy_file(backup_name, object_name):
+            return False
+        self._client.delete_file(backup_name)
+        return True
+
+    def promote_blob(self, staging_name: str) -> Optional[str]:
+        """Hash an already stored staging object by streaming it back; it is settled like `store_blob`."""
+        response = self._client.open_file(staging_name)
+        if response is None:
+            return None
+        digest = hashlib.sha256()
+        try:
+            for chunk in response.stream(UPLOAD_HASH_CHUNK_SIZE):
+                digest.update(chunk)
+        finally:
+            response.close()
+            response.release_conn()
+        sha256 = digest.hexdigest()
+        self._staged_blobs.append((sha256, staging_name))
+        return sha256
+
+    def settle_blobs(self) -> bool:
+        """Copy blobs stored by this service to blobs/<sha256> where missing and drop the staged copies.
+
+        Call once the references are written (attach_blob), before committing:
+        the referencing row is then locked or already visible to purge_blobs.
+        Returns False when a copy failed; the caller should roll back.
+        """
+        staged, self._staged_blobs = self._staged_blobs, []
+        ok = True
+        for sha256, staging_name in staged:
+            target = blob_object_name(sha256)
+            file_meta_cache.delete(target)
+            if ok and self._client.stat_file(target) is None:
+                ok = self._client.copy_file(staging_name, target)
+            self._client.delete_file(staging_name)
+        return ok
+
+    def drop_staged_blobs(self) -> None:
+        """Delete staged copies of blobs whose references were rolled back."""
+        staged, self._staged_blobs = self._staged_blobs, []
+        for _, staging_name in staged:
+            self._client.delete_file(staging_name)
+
+    # Multipart sessions (resumable uploads)
+
+    def create_multipart(self, object_name: str, content_type: Optional[str]) -> Optional[str]:
+        return self._client.create_multipart_upload(object_name, content_type or "application/octet-stream")
+
+    def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes, content_md5: Optional[str] = None) -> Optional[str]:
+        return self._client.upload_part(object_name, upload_id, part_number, data, content_md5)
+
+    def complete_multipart(self, object_name: str, upload_id: str, parts: List[tuple]) -> bool:
+        file_meta_cache.delete(object_name)
+        return self._client.complete_multipart_upload(object_name, upload_id, parts)
+
+    def abort_multipart(self, object_name: str, upload_id: str) -> bool:
+        return self._client.abort_multipart_upload(object_name, upload_id)
+
+    # Per-user convenience wrappers over the legacy user_{id}/ layout
 
     def list_user_files(self, user_id: int) -> List[dict]:
         return self._client.get_user_files(user_id)
@@ -16,14 +220,118 @@ class StorageService:
     def get_user_usage(self, user_id: int) -> int:
         return self._client.get_user_storage_usage(user_id)
 
-    def upload_user_file(self, user_id: int, filename: str, data: BytesIO, content_type: Optional[str]) -> bool:
-        return self._client.upload_user_file(user_id, filename, data, content_type)
+    def upload_user_file(self, user_id: int, filename: str, data: BinaryIO, content_type: Optional[str], length: int = -1) -> bool:
+        file_meta_cache.delete(user_object_name(user_id, filename))
+        return self._client.upload_user_file(user_id, filename, data, content_type, length)
 
     def download_user_file(self, user_id: int, filename: str) -> Optional[bytes]:
-        return self._client.download_file(f"user_{user_id}/{filename}")
+        return self.download_object(user_object_name(user_id, filename))
+
+    def stat_user_file(self, user_id: int, filename: str, use_cache: bool = False) -> Optional[FileStat]:
+        return self.stat_object(user_object_name(user_id, filename), use_cache)
+
+    def open_user_file(self, user_id: int, filename: str, offset: int = 0, length: int = 0):
+        return self.open_object(user_object_name(user_id, filename), offset, length)
 
     def delete_user_file(self, user_id: int, filename: str) -> bool:
+        file_meta_cache.delete(user_object_name(user_id, filename))
         return self._client.delete_user_file(user_id, filename)
 
 
+def get_storage_service() -> StorageService:
+    """FastAPI dependency: storage service bound to the shared MinIO client."""
+    return StorageService()
+
+
+class AsyncStorageService:
+    """Async facade over StorageService for `async def` routes.
+
+    The minio SDK is blocking, so every call is offloaded to a worker thread
+    bounded by `storage_limiter` / `upload_limiter`; the event loop keeps
+    serving other requests while a transfer is in progress.
+    """
+
+    def __init__(self, storage: Optional[StorageService] = None) -> None:
+        self.sync = storage if storage is not None else StorageService()
+
+    async def _run(self, func: Callable[..., Any], *args: Any, limiter: Optional[anyio.CapacityLimiter] = None, **kwargs: Any) -> Any:
+        return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=limiter or storage_limiter)
+
+    async def stat_object(self, object_name: str, use_cache: bool = False) -> Optional[FileStat]:
+        if use_cache:
+            # Cache hits stay on the event loop: no thread hop for a dict lookup
+            cached = file_meta_cache.get(object_name)
+            if cached is not None:
+                return cached
+        return await self._run(self.sync.stat_object, object_name, use_cache)
+
+    async def open_object(self, object_name: str, offset: int = 0, length: int = 0):
+        return await self._run(self.sync.open_object, object_name, offset, length)
+
+    async def upload_object(self, object_name: str, data: BinaryIO, content_type: Optional[str], length: int = -1) -> bool:
+        return await self._run(self.sync.upload_object, object_name, data, content_type, length, limiter=upload_limiter)
+
+    async def download_object_to(self, object_name: str, fileobj: BinaryIO) -> Optional[int]:
+        return await self._run(self.sync.download_object_to, object_name, fileobj)
+
+    async def delete_object(self, object_name: str) -> bool:
+        return await self._run(self.sync.delete_object, object_name)
+
+    async def delete_objects(self, object_names: List[str]) -> List[str]:
+        return await self._run(self.sync.delete_objects, object_names)
+
+    async def store_blob(self, data, content_type: Optional[str]) -> Optional[str]:
+        return await self._run(self.sync.store_blob, data, content_type, limiter=upload_limiter)
+
+    async def promote_blob(self, staging_name: str) -> Optional[str]:
+        return await self._run(self.sync.promote_blob, staging_name, limiter=upload_limiter)
+
+    async def settle_blobs(self) -> bool:
+        return await self._run(self.sync.settle_blobs)
+
+    async def drop_staged_blobs(self) -> None:
+        await self._run(self.sync.drop_staged_blobs)
+
+    async def stage_object(self, data: BinaryIO, content_type: Optional[str]) -> Optional[str]:
+        return await self._run(self.sync.stage_object, data, content_type, limiter=upload_limiter)
+
+    async def promote_staged(self, staging_name: str, object_name: str) -> bool:
+        return await self._run(self.sync.promote_staged, staging_name, object_name)
+
+    async def backup_object(self, object_name: str) -> Tuple[bool, Optional[str]]:
+        return await self._run(self.sync.backup_object, object_name)
+
+    async def restore_object(self, object_name: str, backup_name: Optional[str]) -> bool:
+        return await self._run(self.sync.restore_object, object_name, backup_name)
+
+    async def create_multipart(self, object_name: str, content_type: Optional[str]) -> Optional[str]:
+        return await self._run(self.sync.create_multipart, object_name, content_type)
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, data: bytes, content_md5: Optional[str] = None) -> Optional[str]:
+        return await self._run(self.sync.upload_part, object_name, upload_id, part_number, data, content_md5, limiter=upload_limiter)
+
+    async def complete_multipart(self, object_name: str, upload_id: str, parts: List[tuple]) -> bool:
+        return await self._run(self.sync.complete_multipart, object_name, upload_id, parts)
+
+    async def abort_multipart(self, object_name: str, upload_id: str) -> bool:
+        return await self._run(self.sync.abort_multipart, object_name, upload_id)
+
+    async def list_user_files(self, user_id: int) -> List[dict]:
+        return await self._run(self.sync.list_user_files, user_id)
+
+    async def get_user_usage(self, user_id: int) -> int:
+        return await self._run(self.sync.get_user_usage, user_id)
+
+    async def upload_user_file(self, user_id: int, filename: str, data: BinaryIO, content_type: Optional[str], length: int = -1) -> bool:
+        return await self._run(self.sync.upload_user_file, user_id, filename, data, content_type, length, limiter=upload_limiter)
+
+    async def download_user_file(self, user_id: int, filename: str) -> Optional[bytes]:
+        return await self._run(self.sync.download_user_file, user_id, filename)
+
+    async def delete_user_file(self, user_id: int, filename: str) -> bool:
+        return await self._run(self.sync.delete_user_file, user_id, filename)
+
 
+def get_async_storage(storage: StorageService = Depends(get_storage_service)) -> AsyncStorageService:
+    """FastAPI dependency: non-blocking storage for async routes."""
+    return AsyncStorageService(storage)
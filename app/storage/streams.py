@@ -0,0 +1,104 @@
+"""
+Stream helpers for uploading files without buffering them in memory
+"""
+import hashlib
+import threading
+from typing import BinaryIO, Callable, Optional
+
+
+class UploadLimitExceeded(Exception):
+    """Raised when a streamed upload grows past its allowed size."""
+
+    def __init__(self, limit: int, reason: str = "size") -> None:
+        super().__init__(f"Upload exceeds {reason} limit of {limit} bytes")
+        self.limit = limit
+        self.reason = reason
+
+
+class SharedLimit:
+    """Byte budget shared by several concurrently read streams (one batch against one quota)."""
+
+    def __init__(self, limit: int, reason: str = "quota") -> None:
+        self.limit = limit
+        self.reason = reason
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def take(self, size: int) -> None:
+        with self._lock:
+            self.used += size
+            if self.used > self.limit:
+                raise UploadLimitExceeded(self.limit, self.reason)
+
+
+class LimitedReader:
+    """File-like wrapper that counts bytes as they are read and fails once `limit` is passed.
+
+    Lets size and quota checks run incrementally while the SDK pulls parts
+    from the underlying stream, instead of after the whole file is in memory.
+    """
+
+    def __init__(self, raw: BinaryIO, limit: int, reason: str = "size", shared: Optional[SharedLimit] = None) -> None:
+        self._raw = raw
+        self.limit = limit
+        self.reason = reason
+        self.shared = shared
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        self.bytes_read += len(chunk)
+        if self.bytes_read > self.limit:
+            raise UploadLimitExceeded(self.limit, self.reason)
+        if self.shared is not None:
+            self.shared.take(len(chunk))
+        return chunk
+
+
+class HashingReader:
+    """File-like wrapper that computes a SHA-256 of everything read through it."""
+
+    def __init__(self, raw: BinaryIO) -> None:
+        self._raw = raw
+        self._hash = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        self._hash.update(chunk)
+        self.bytes_read += len(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class HashingWriter:
+    """File-like wrapper that computes a SHA-256 of everything written through it."""
+
+    def __init__(self, raw: BinaryIO) -> None:
+        self._raw = raw
+        self._hash = hashlib.sha256()
+        self.bytes_written = 0
+
+    def write(self, chunk: bytes) -> int:
+        self._hash.update(chunk)
+        self.bytes_written += len(chunk)
+        return self._raw.write(chunk)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class TeeReader:
+    """File-like wrapper that hands every chunk read through it to `sink` (an empty chunk marks EOF)."""
+
+    def __init__(self, raw: BinaryIO, sink: Callable[[bytes], None]) -> None:
+        self._raw = raw
+        self._sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._raw.read(size)
+        if chunk or size != 0:
+            self._sink(chunk)
+        return chunk
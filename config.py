@@ -29,6 +29,15 @@ class Settings:
     MINIO_ACCESS_KEY: str = os.getenv("MINIO_ACCESS_KEY", "minioadmin")
     MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin123")
     MINIO_BUCKET_NAME: str = os.getenv("MINIO_BUCKET_NAME", "user-files")
+    MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "False").lower() == "true"
+    # Shared HTTP connection pool for the process-wide MinIO client
+    MINIO_POOL_MAXSIZE: int = int(os.getenv("MINIO_POOL_MAXSIZE", "32"))
+    MINIO_CONNECT_TIMEOUT_SEC: float = float(os.getenv("MINIO_CONNECT_TIMEOUT_SEC", "5"))
+    MINIO_READ_TIMEOUT_SEC: float = float(os.getenv("MINIO_READ_TIMEOUT_SEC", "120"))
+    MINIO_MAX_RETRIES: int = int(os.getenv("MINIO_MAX_RETRIES", "3"))
+    # Worker threads that may run blocking storage calls at once (uploads get their own cap)
+    STORAGE_MAX_CONCURRENCY: int = int(os.getenv("STORAGE_MAX_CONCURRENCY", "16"))
+    STORAGE_MAX_CONCURRENT_UPLOADS: int = int(os.getenv("STORAGE_MAX_CONCURRENT_UPLOADS", "4"))
     
     # Email
     MAIL_USERNAME: str = os.getenv("MAIL_USERNAME", "your-email@gmail.com")
@@ -47,6 +56,13 @@ class Settings:
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", "6379"))
     REDIS_PASSWORD: str = os.getenv("REDIS_PASSWORD", "")
     REDIS_DB: int = int(os.getenv("REDIS_DB", "0"))
+    REDIS_POOL_MAX_CONNECTIONS: int = int(os.getenv("REDIS_POOL_MAX_CONNECTIONS", "50"))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", "2"))
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "2"))
+    # Circuit breaker: after N consecutive failures skip Redis, retry after a doubling backoff
+    REDIS_BREAKER_FAILURES: int = int(os.getenv("REDIS_BREAKER_FAILURES", "3"))
+    REDIS_BREAKER_RESET_SEC: float = float(os.getenv("REDIS_BREAKER_RESET_SEC", "2"))
+    REDIS_BREAKER_MAX_RESET_SEC: float = float(os.getenv("REDIS_BREAKER_MAX_RESET_SEC", "60"))
     
     # PostgreSQL (alternative to SQLite)
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "localhost")
@@ -67,7 +83,80 @@ class Settings:
     RATE_LIMIT_LOGIN_ATTEMPTS: int = int(os.getenv("RATE_LIMIT_LOGIN_ATTEMPTS", "10"))
     RATE_LIMIT_LOGIN_WINDOW_SEC: int = int(os.getenv("RATE_LIMIT_LOGIN_WINDOW_SEC", "300"))
 
+    # Periodic check of users.used_storage against MinIO (0 disables)
+    STORAGE_RECONCILE_INTERVAL_SEC: int = int(os.getenv("STORAGE_RECONCILE_INTERVAL_SEC", "21600"))
+
     # Uploads
     MAX_UPLOAD_MB: int = int(os.getenv("MAX_UPLOAD_MB", "100"))
+    # Part size for streamed multipart uploads to MinIO (S3 minimum is 5MB)
+    UPLOAD_PART_SIZE_MB: int = max(5, int(os.getenv("UPLOAD_PART_SIZE_MB", "8")))
+    # Store uploads once under blobs/<sha256> and share them between identical files
+    STORAGE_DEDUP_ENABLED: bool = os.getenv("STORAGE_DEDUP_ENABLED", "True").lower() == "true"
+    # Resumable upload sessions are aborted after this long without completing
+    UPLOAD_SESSION_TTL_HOURS: int = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+    # Batch endpoints: files per DELETE /api/files and POST /api/files/upload request
+    BATCH_DELETE_MAX_FILES: int = int(os.getenv("BATCH_DELETE_MAX_FILES", "1000"))
+    BATCH_UPLOAD_MAX_FILES: int = int(os.getenv("BATCH_UPLOAD_MAX_FILES", "20"))
+
+    # IFC -> FRAG conversion workers (python -m app.conversion.worker)
+    CONVERSION_WORKER_PROCESSES: int = int(os.getenv("CONVERSION_WORKER_PROCESSES", "2"))
+    CONVERSION_MAX_ATTEMPTS: int = int(os.getenv("CONVERSION_MAX_ATTEMPTS", "3"))
+    CONVERSION_RETRY_BACKOFF_SEC: float = float(os.getenv("CONVERSION_RETRY_BACKOFF_SEC", "30"))
+    CONVERSION_TIMEOUT_SEC: int = int(os.getenv("CONVERSION_TIMEOUT_SEC", "600"))
+    CONVERSION_POLL_INTERVAL_SEC: float = float(os.getenv("CONVERSION_POLL_INTERVAL_SEC", "2"))
+    # A running job whose worker has not heartbeated for this long is re-queued
+    CONVERSION_LEASE_SEC: int = int(os.getenv("CONVERSION_LEASE_SEC", "120"))
+    # Scheduling: running jobs per user, and stride weights of the priority classes
+    CONVERSION_MAX_RUNNING_PER_USER: int = int(os.getenv("CONVERSION_MAX_RUNNING_PER_USER", "2"))
+    CONVERSION_INTERACTIVE_WEIGHT: int = int(os.getenv("CONVERSION_INTERACTIVE_WEIGHT", "4"))
+    CONVERSION_BATCH_WEIGHT: int = int(os.getenv("CONVERSION_BATCH_WEIGHT", "1"))
+    # Job status API: DB poll step for long-poll/SSE waits, their upper bound, and the metrics window
+    CONVERSION_STATUS_POLL_SEC: float = float(os.getenv("CONVERSION_STATUS_POLL_SEC", "1"))
+    CONVERSION_WAIT_MAX_SEC: int = int(os.getenv("CONVERSION_WAIT_MAX_SEC", "60"))
+    CONVERSION_METRICS_WINDOW_SEC: int = int(os.getenv("CONVERSION_METRICS_WINDOW_SEC", "3600"))
+    # FRAGs cached by (IFC sha256, converter version, options); entries without hits expire after the TTL
+    CONVERSION_CACHE_ENABLED: bool = os.getenv("CONVERSION_CACHE_ENABLED", "True").lower() == "true"
+    CONVERSION_CACHE_TTL_DAYS: int = int(os.getenv("CONVERSION_CACHE_TTL_DAYS", "30"))
+    # A failed converter self-test is not retried for this long (jobs run uncached meanwhile)
+    CONVERTER_VERSION_RETRY_SEC: float = float(os.getenv("CONVERTER_VERSION_RETRY_SEC", "60"))
+    # IFC header/entity scan during upload (ifc_metadata); gives up on a statement longer than the limit
+    IFC_METADATA_ENABLED: bool = os.getenv("IFC_METADATA_ENABLED", "True").lower() == "true"
+    IFC_METADATA_MAX_STATEMENT_MB: int = int(os.getenv("IFC_METADATA_MAX_STATEMENT_MB", "16"))
+    # Element index (GlobalId, class, storey, property sets) built by the conversion worker
+    IFC_ELEMENT_INDEX_ENABLED: bool = os.getenv("IFC_ELEMENT_INDEX_ENABLED", "True").lower() == "true"
+    # Per-element bounding boxes for spatial queries (keeps the whole DATA section in memory while indexing),
+    # and how many files' R-trees each process keeps
+    IFC_ELEMENT_BOUNDS_ENABLED: bool = os.getenv("IFC_ELEMENT_BOUNDS_ENABLED", "True").lower() == "true"
+    SPATIAL_INDEX_CACHE_SIZE: int = int(os.getenv("SPATIAL_INDEX_CACHE_SIZE", "16"))
+    # Warm `ifc2frag.cjs --serve` daemons per worker process; recycled after N jobs or past an RSS limit
+    CONVERTER_DAEMON_ENABLED: bool = os.getenv("CONVERTER_DAEMON_ENABLED", "True").lower() == "true"
+    CONVERTER_DAEMON_POOL_SIZE: int = int(os.getenv("CONVERTER_DAEMON_POOL_SIZE", "1"))
+    CONVERTER_DAEMON_MAX_JOBS: int = int(os.getenv("CONVERTER_DAEMON_MAX_JOBS", "50"))
+    CONVERTER_DAEMON_MAX_RSS_MB: int = int(os.getenv("CONVERTER_DAEMON_MAX_RSS_MB", "1536"))
+    CONVERTER_DAEMON_HEALTHCHECK_SEC: float = float(os.getenv("CONVERTER_DAEMON_HEALTHCHECK_SEC", "30"))
+    CONVERTER_DAEMON_START_TIMEOUT_SEC: float = float(os.getenv("CONVERTER_DAEMON_START_TIMEOUT_SEC", "60"))
+
+    # In-process cache of user snapshots in front of Redis (auth hot path).
+    # The long TTL relies on the invalidation bus; without it entries live
+    # for CACHE_INVALIDATION_FALLBACK_TTL_SEC.
+    USER_CACHE_TTL_SEC: int = int(os.getenv("USER_CACHE_TTL_SEC", "600"))
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "4096"))
+
+    # Redis pub/sub channel that evicts in-process cache entries in all workers
+    CACHE_INVALIDATION_ENABLED: bool = os.getenv("CACHE_INVALIDATION_ENABLED", "True").lower() == "true"
+    CACHE_INVALIDATION_CHANNEL: str = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+    CACHE_INVALIDATION_FALLBACK_TTL_SEC: int = int(os.getenv("CACHE_INVALIDATION_FALLBACK_TTL_SEC", "5"))
+
+    # In-process cache of object metadata used by HEAD requests
+    FILE_META_CACHE_TTL_SEC: int = int(os.getenv("FILE_META_CACHE_TTL_SEC", "10"))
+    FILE_META_CACHE_SIZE: int = int(os.getenv("FILE_META_CACHE_SIZE", "4096"))
+
+    # Cache-Control for served files, by extension ("default" for everything else).
+    # Downloads carry strong ETags, so "no-cache" still lets browsers revalidate with 304.
+    FILE_CACHE_CONTROL: dict = {
+        "ifc": os.getenv("CACHE_CONTROL_IFC", "private, no-cache"),
+        "frag": os.getenv("CACHE_CONTROL_FRAG", "private, max-age=300, must-revalidate"),
+        "default": os.getenv("CACHE_CONTROL_DEFAULT", "private, no-cache"),
+    }
 
 settings = Settings()
@@ -5,28 +5,44 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse, Response, FileResponse, JSONResponse
 from sqlalchemy.orm import Session
 from datetime import timedelta
+from typing import List, Optional
 import uvicorn
-import io
+import asyncio
+import math
+import threading
+import anyio
 
 from app.database import engine, get_db, Base
 from app.models.user import User
 from app.auth.auth import AuthService
 from app.auth.dependencies import get_current_active_user, get_current_admin_user, get_current_admin_user_from_cookie, get_current_active_user_from_cookie
-from app.auth.context import require_current_user, require_admin_user, get_user_from_request
-from app.storage.service import StorageService
-from app.cache.cache_service import CacheService
+from app.auth.context import require_current_user, require_admin_user, resolved_auth, resolve_request_auth, request_user_id
+from app.storage.service import StorageService, AsyncStorageService, get_async_storage, storage_limiter
+from app.storage.streams import HashingReader, LimitedReader, SharedLimit, TeeReader, UploadLimitExceeded
+from app.cache.invalidation import invalidation_bus
+from app.cache.async_cache import AsyncCacheService, get_async_cache
 from app.schemas import (
     UserCreate, UserResponse, LoginRequest, Token, UserUpdate, UserListResponse, UserStats,
     PasswordResetRequest, PasswordResetConfirm, EmailVerificationRequest, EmailVerificationResponse,
     SystemSettings, SystemSettingsUpdate, BackupCreateRequest, BackupCreateResponse,
-    HealthResponse, ServiceHealth, LogStats, LoginHistoryResponse
+    HealthResponse, ServiceHealth, LogStats, LoginHistoryResponse, UploadSessionCreate, FileBatchDelete
 )
-from app.storage import MinIOClient
+from app.storage import get_minio_client
 from app.email.email_service import email_service
 from app.models.password_reset import PasswordResetToken
 from app.models.file import File as FileModel
+from app.models.upload_session import UploadSession
+from app.models.conversion_job import ConversionJob
+from app.models.ifc_metadata import IfcMetadata
+from app.models.ifc_element import IfcElementIndex
 from app.auth.oauth_service import OAuthService
 from app.services.health_check import HealthCheckService
+from app.services.storage_accounting import adjust_used_storage, reconcile_storage_usage
+from app.services.blob_store import abandon_blobs, release_blob, release_blobs, resolve_object_name
+from app.conversion import enqueue_conversion
+from app.conversion.cache import evict_conversion_cache
+from app.conversion.revisions import delete_revisions
+from app.conversion.status import get_user_job, job_events, job_payload, list_user_jobs, queue_metrics, wait_for_job
 from app.logging.logger import logger
 from config import settings
 from fastapi import BackgroundTasks
@@ -38,6 +54,15 @@ import httpx
 from app.security.rate_limit import LoginRateLimiter
 from app.security.csrf import ensure_csrf_cookie, verify_csrf, CSRF_COOKIE_NAME
 from app.api.responses import api_ok, api_error
+from app.api.downloads import head_user_file, stream_file
+from app.api.uploads import (
+    UploadAllowance, StagedReplacements, StorageCleanup, sanitize_upload_name, save_uploaded_file, stage_file_record, invalidate_file_list,
+    create_upload_session, get_upload_session, store_upload_part, complete_upload_session,
+    abort_upload_session, expire_upload_sessions, upload_session_payload, acknowledged_offset
+)
+from app.services.ifc_metadata import delete_ifc_metadata, metadata_payload, metadata_scanner, metadata_summary
+from app.services.ifc_elements import delete_element_index, parse_property_filters, search_elements
+from app.services.spatial_index import load_spatial_index
 from pydantic import BaseModel, EmailStr
 # Optional mock routes (may be absent in production)
 try:
@@ -45,7 +70,6 @@ try:
 except Exception:
     mock_files_router = None
 import subprocess
-import tempfile
 import os
 
 # Create database tables (best-effort; don't fail import if DB unavailable)
@@ -66,6 +90,86 @@ app = FastAPI(
 
 APP_START_TIME = time.monotonic()
 
+
+@app.on_event("startup")
+async def warm_storage_client():
+    """Create the shared MinIO client (and check the bucket) once per process, off the request path."""
+    def _warm():
+        try:
+            get_minio_client()
+        except Exception as e:
+            logger.log_error(f"MinIO client warm-up failed: {e}")
+
+    threading.Thread(target=_warm, name="minio-warmup", daemon=True).start()
+
+
+def _run_storage_reconciliation() -> list:
+    """Blocking: compare users.used_storage with MinIO and fix drift."""
+    db = next(get_db())
+    try:
+        return reconcile_storage_usage(db, StorageService())
+    finally:
+        db.close()
+
+
+def _run_upload_session_cleanup() -> int:
+    """Blocking: abort resumable uploads that expired without completing."""
+    db = next(get_db())
+    try:
+        return expire_upload_sessions(db, StorageService())
+    finally:
+        db.close()
+
+
+def _run_conversion_cache_eviction() -> int:
+    """Blocking: drop cached FRAGs that have not been reused within the TTL."""
+    db = next(get_db())
+    try:
+        return evict_conversion_cache(db, StorageService())
+    finally:
+        db.close()
+
+
+async def _storage_reconcile_loop():
+    while True:
+        await asyncio.sleep(settings.STORAGE_RECONCILE_INTERVAL_SEC)
+        try:
+            await anyio.to_thread.run_sync(_run_upload_session_cleanup)
+        except Exception as e:
+            logger.log_error(f"Upload session cleanup failed: {e}")
+        try:
+            await anyio.to_thread.run_sync(_run_conversion_cache_eviction)
+        except Exception as e:
+            logger.log_error(f"Conversion cache eviction failed: {e}")
+        try:
+            await anyio.to_thread.run_sync(_run_storage_reconciliation)
+        except Exception as e:
+            logger.log_error(f"Storage reconciliation failed: {e}")
+
+
+@app.on_event("startup")
+async def schedule_storage_reconciliation():
+    if settings.STORAGE_RECONCILE_INTERVAL_SEC > 0:
+        app.state.storage_reconcile_task = asyncio.create_task(_storage_reconcile_loop())
+
+
+@app.on_event("shutdown")
+async def stop_storage_reconciliation():
+    task = getattr(app.state, "storage_reconcile_task", None)
+    if task is not None:
+        task.cancel()
+
+
+@app.on_event("startup")
+async def start_cache_invalidation():
+    if settings.CACHE_INVALIDATION_ENABLED:
+        invalidation_bus.start()
+
+
+@app.on_event("shutdown")
+async def stop_cache_invalidation():
+    await anyio.to_thread.run_sync(invalidation_bus.stop)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -94,11 +198,11 @@ async def add_mime_types(request: Request, call_next):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     if request.url.path.startswith("/api/") or request.url.path.startswith("/auth/"):
-        return JSONResponse(status_code=exc.status_code, content=api_error(exc.detail, status=exc.status_code))
+        return JSONResponse(status_code=exc.status_code, content=api_error(exc.detail, status=exc.status_code), headers=exc.headers)
     # For non-API routes, return HTML error page or redirect
     if exc.status_code == 401:
         return RedirectResponse(url="/login", status_code=302)
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers)
 
 
 @app.exception_handler(RequestValidationError)
@@ -130,9 +234,8 @@ async def request_logging_middleware(request: Request, call_next):
     response = await call_next(request)
     duration_ms = int((time.perf_counter() - start) * 1000)
     try:
-        db = next(get_db())
-        user = get_user_from_request(request, db)
-        user_id = user.id if user else None
+        # Reuses the user resolved by the endpoint; otherwise only the token subject (no lookup)
+        user_id = request_user_id(request)
     except Exception:
         user_id = None
     path = request.url.path
@@ -163,25 +266,12 @@ async def ensure_csrf_cookie_middleware(request: Request, call_next):
 # Helper: extract current user from Authorization header or access_token cookie
 def _get_user_from_request(request: Request) -> User | None:
     try:
-        # Try header first
-        token = None
-        auth_header = request.headers.get("Authorization")
-        if auth_header and auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-        # Fallback to cookie
-        if not token:
-            token = request.cookies.get("access_token")
-        if not token:
-            return None
-        payload = AuthService.verify_token(token)
-        if not payload:
-            return None
-        user_id = payload.get("sub")
-        if not user_id:
-            return None
+        auth = resolved_auth(request)
+        if auth is not None:
+            return auth.user
         db = next(get_db())
         try:
-            return AuthService.get_user_by_id(db, int(user_id))
+            return resolve_request_auth(request, db).user
         finally:
             try:
                 db.close()
@@ -249,14 +339,13 @@ async def check_auth(request: Request):
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
-        payload = AuthService.verify_token(token)
-        if payload:
-            user_id = payload.get("sub")
-            if user_id:
-                db = next(get_db())
-                user = AuthService.get_user_by_id(db, user_id=int(user_id))
-                if user:
-                    return {"authenticated": True, "user": user}
+        db = next(get_db())
+        try:
+            user = resolve_request_auth(request, db, token).user
+        finally:
+            db.close()
+        if user:
+            return {"authenticated": True, "user": user}
     return {"authenticated": False}
 
 # Password reset endpoints
@@ -323,6 +412,7 @@ async def reset_password(request: PasswordResetConfirm, db: Session = Depends(ge
     reset_token_obj.used = True
     
     db.commit()
+    AuthService.invalidate_user(user.id, user.email)
     
     return {"message": "Password successfully reset!"}
 
@@ -445,6 +535,7 @@ async def verify_email(request: EmailVerificationRequest, db: Session = Depends(
     user.is_email_verified = True
     user.email_verification_token = None
     db.commit()
+    AuthService.invalidate_user(user.id, user.email)
     
     return EmailVerificationResponse(
         message="Email successfully verified!",
@@ -459,7 +550,7 @@ class ResendVerificationRequest(BaseModel):
 @app.post("/auth/resend-verification")
 async def resend_verification_email(req: ResendVerificationRequest, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """Resend email verification link to a user by email."""
-    user = AuthService.get_user_by_email(db, req.email)
+    user = db.query(User).filter(User.email == req.email).first()
     # Do not leak user existence
     if not user:
         return api_ok(message="If the email exists, a verification link has been sent.")
@@ -509,25 +600,42 @@ async def verify_email_page(request: Request, token: str = None):
     user.is_email_verified = True
     user.email_verification_token = None
     db.commit()
+    AuthService.invalidate_user(user.id, user.email)
     
     return templates.TemplateResponse("verify-email-success.html", {
         "request": request,
         "message": "Email successfully verified!"
     })
 
+def _current_user_row(db: Session, current_user) -> User:
+    """Fresh users row for fields the cached snapshot leaves out (used_storage, last_login)."""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
 @app.get("/auth/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
     """Get current user information"""
-    return current_user
+    return _current_user_row(db, current_user)
 
 # User dashboard endpoints
 @app.get("/dashboard")
-async def dashboard(current_user: User = Depends(get_current_active_user)):
+async def dashboard(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
     """User dashboard page"""
+    user = _current_user_row(db, current_user)
+    used_storage = user.used_storage or 0
     return {
         "user": current_user,
-        "storage_used_percent": (current_user.used_storage / current_user.storage_quota) * 100,
-        "storage_remaining": current_user.storage_quota - current_user.used_storage
+        "used_storage": used_storage,
+        "storage_used_percent": (used_storage / user.storage_quota) * 100,
+        "storage_remaining": user.storage_quota - used_storage
     }
 
 # User management endpoints
@@ -538,10 +646,7 @@ async def get_current_user_info(
 ):
     """Get current user information"""
     # Получаем актуальные данные из БД
-    user = db.query(User).filter(User.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return _current_user_row(db, current_user)
 
 @app.get("/users/login-history", response_model=LoginHistoryResponse)
 async def get_user_login_history(
@@ -551,9 +656,10 @@ async def get_user_login_history(
     """Get user login history"""
     # For now, we'll simulate login history since we don't have a separate login_history table
     # In a real implementation, you would have a login_history table
+    last_login = _current_user_row(db, current_user).last_login
     login_history = [
         {
-            "timestamp": (current_user.last_login or datetime.now()).isoformat(),
+            "timestamp": (last_login or datetime.now()).isoformat(),
             "ip_address": "127.0.0.1",
             "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
             "success": True
@@ -561,10 +667,10 @@ async def get_user_login_history(
     ]
     
     # Add some mock historical data for demonstration
-    if current_user.last_login:
+    if last_login:
         from datetime import timedelta
         for i in range(1, 6):  # Add 5 more entries
-            login_time = current_user.last_login - timedelta(days=i*2, hours=i)
+            login_time = last_login - timedelta(days=i*2, hours=i)
             login_history.append({
                 "timestamp": login_time.isoformat(),
                 "ip_address": f"192.168.1.{100 + i}",
@@ -577,15 +683,10 @@ async def get_user_login_history(
 @app.get("/profile", response_class=HTMLResponse)
 async def profile_page(request: Request):
     """User profile page"""
-    # Try to get user from cookie first, then from Authorization header
-    try:
-        current_user = await get_current_active_user_from_cookie(request)
-    except:
-        try:
-            current_user = await get_current_active_user(request)
-        except:
-            # If no authentication, redirect to login
-            return RedirectResponse(url="/login", status_code=302)
+    current_user = _get_user_from_request(request)
+    if not current_user or not current_user.is_active:
+        # If no authentication, redirect to login
+        return RedirectResponse(url="/login", status_code=302)
     
     return templates.TemplateResponse("profile.html", {
         "request": request,
@@ -655,22 +756,8 @@ async def get_admin_stats(
     total_storage_used = db.query(User).with_entities(User.used_storage).all()
     total_storage_used = sum([(row[0] or 0) for row in total_storage_used])
     
-    # total files: count files per user from MinIO if available
-    total_files = 0
-    try:
-        from app.storage import MinIOClient
-        minio_client = MinIOClient()
-        # If MinIO not connected, keep 0
-        # Simple heuristic: count objects in each user_*/ prefix
-        users = db.query(User).with_entities(User.id).all()
-        for (uid,) in users:
-            try:
-                files = minio_client.get_user_files(uid)
-                total_files += len(files)
-            except Exception:
-                continue
-    except Exception:
-        total_files = 0
+    # total files: counted from the files table (no per-user bucket listing)
+    total_files = db.query(FileModel).count()
     
     return api_ok({
         "total_users": total_users,
@@ -680,6 +767,13 @@ async def get_admin_stats(
         "total_storage_used": total_storage_used
     })
 
+@app.post("/api/admin/storage/reconcile")
+async def reconcile_storage(current_user: User = Depends(require_admin_user)):
+    """Recompute users.used_storage from MinIO and report drifted counters (admin only)"""
+    drift = await anyio.to_thread.run_sync(_run_storage_reconciliation)
+    logger.log_admin_action(f"Сверка использования хранилища: {len(drift)} расхождений", current_user.id, "STORAGE_RECONCILE")
+    return api_ok({"drift": drift, "users_fixed": len(drift)})
+
 # Logs endpoints for admin
 @app.get("/admin/logs")
 async def get_logs(
@@ -741,6 +835,7 @@ async def update_user(
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    previous_email = user.email
     
     # Update user fields
     if user_data.email:
@@ -757,6 +852,7 @@ async def update_user(
         user.storage_quota = user_data.storage_quota
     
     db.commit()
+    AuthService.invalidate_user(user.id, previous_email, user.email)
     logger.log_admin_action(f"Обновлен пользователь {user_id}: {user.email}", current_user.id, "USER_UPDATE")
     return api_ok(message="User updated successfully")
 
@@ -774,6 +870,7 @@ async def toggle_user_status(
     
     user.is_active = request.get("active", not user.is_active)
     db.commit()
+    AuthService.invalidate_user(user.id, user.email)
     
     status = "активирован" if user.is_active else "деактивирован"
     logger.log_admin_action(f"Пользователь {user.email} {status}", current_user.id, "USER_TOGGLE")
@@ -783,7 +880,8 @@ async def toggle_user_status(
 async def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_admin_user)
+    current_user: User = Depends(require_admin_user),
+    storage: AsyncStorageService = Depends(get_async_storage)
 ):
     """Delete user (admin only)"""
     user = db.query(User).filter(User.id == user_id).first()
@@ -794,16 +892,43 @@ async def delete_user(
     if user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot delete yourself")
     
-    # Delete user files from MinIO
+    # Delete user files from MinIO (bulk DeleteObjects, 1000 keys per request)
     try:
-        from app.storage import MinIOClient
-        minio_client = MinIOClient()
-        minio_client.delete_user_folder(user_id)
+        minio_client = get_minio_client()
+        await anyio.to_thread.run_sync(minio_client.delete_user_folder, user_id, limiter=storage_limiter)
     except Exception as e:
         logger.log_error(f"Ошибка удаления файлов пользователя {user_id}: {str(e)}")
     
+    # Drop unfinished resumable uploads
+    upload_sessions = db.query(UploadSession).filter(UploadSession.user_id == user_id).all()
+    for upload_session in upload_sessions:
+        if upload_session.status == "active":
+            try:
+                await storage.abort_multipart(upload_session.object_name, upload_session.multipart_id)
+            except Exception as e:
+                logger.log_error(f"Ошибка отмены загрузки {upload_session.id}: {str(e)}")
+        db.delete(upload_session)
+    
+    # Release the user's references on shared blobs together with their file records
+    blob_refs = [sha for (sha,) in db.query(FileModel.blob_sha256).filter(
+        FileModel.user_id == user_id,
+        FileModel.blob_sha256.isnot(None)
+    ).all()]
+    cleanup = StorageCleanup()
+    cleanup.blobs.extend(release_blobs(db, blob_refs))
+    user_file_ids = [file_id for (file_id,) in db.query(FileModel.id).filter(FileModel.user_id == user_id)]
+    delete_ifc_metadata(db, user_file_ids)
+    delete_element_index(db, user_file_ids)
+    db.query(ConversionJob).filter(ConversionJob.user_id == user_id).delete(synchronize_session=False)
+    cleanup.objects.extend(delete_revisions(db, user_id))
+    db.query(FileModel).filter(FileModel.user_id == user_id).delete(synchronize_session=False)
     db.delete(user)
     db.commit()
+    AuthService.invalidate_user(user_id, user.email)
+    try:
+        await cleanup.run(db, storage)
+    except Exception as e:
+        logger.log_error(f"Ошибка удаления blob-объектов пользователя {user_id}: {str(e)}")
     
     logger.log_admin_action(f"Удален пользователь: {user.email}", current_user.id, "USER_DELETE")
     return api_ok(message="User deleted successfully")
@@ -1028,33 +1153,14 @@ async def upload_file(
     request: Request,
     file: UploadFile = File(...),
     current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
     db: Session = Depends(get_db),
-    background_tasks: BackgroundTasks = None,
 ):
-    """Upload a file to user's storage"""
+    """Upload a file to user's storage (streamed to MinIO in fixed-size parts)"""
     try:
-        # Read file content (for validation and upload)
-        raw_bytes = await file.read()
-        
-        # Validate filename
-        import os, re
+        # Validate filename and extension
         original_name = file.filename or ""
-        safe_name = os.path.basename(original_name)
-        # allow letters, numbers, dash, underscore, dot
-        safe_name = re.sub(r"[^A-Za-z0-9._-]", "_", safe_name)
-        if not safe_name:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid filename")
-        
-        # Validate extension and size
-        allowed_ext = {"ifc", "ifcxml", "ifczip"}
-        ext = safe_name.lower().split(".")[-1] if "." in safe_name else ""
-        if ext not in allowed_ext:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported file type")
-        
-        size_bytes = len(raw_bytes)
-        max_bytes = settings.MAX_UPLOAD_MB * 1024 * 1024
-        if size_bytes > max_bytes:
-            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"File exceeds {settings.MAX_UPLOAD_MB}MB limit")
+        safe_name = sanitize_upload_name(original_name)
         
         # Optionally validate MIME (best-effort)
         allowed_mime = {"application/ifc", "application/xml", "application/zip", "application/octet-stream"}
@@ -1063,57 +1169,54 @@ async def upload_file(
             # allow xml for ifcxml, zip for ifczip, octet-stream fallback
             pass
         
-        # Check storage quota
-        storage = StorageService()
-        current_usage = storage.get_user_usage(current_user.id)
+        # Check storage quota from the users counter (O(1), no bucket listing)
+        allowance = UploadAllowance(db, current_user.id, safe_name)
         
-        # Ensure storage_quota is not None, use default if it is
-        storage_quota = current_user.storage_quota or 1073741824  # 1GB default
+        # Reject early when the spooled size is already known
+        if file.size is not None:
+            allowance.check(file.size)
         
-        if current_usage + size_bytes > storage_quota:
+        # Upload file: limits are enforced incrementally while parts are read
+        # and .ifc headers/entities are scanned on the way (ifc_metadata)
+        scanner = metadata_scanner(safe_name)
+        source = TeeReader(file.file, scanner.feed) if scanner else file.file
+        if allowance.max_bytes <= allowance.remaining_quota:
+            reader = LimitedReader(source, allowance.max_bytes, reason="size")
+        else:
+            reader = LimitedReader(source, allowance.remaining_quota, reason="quota")
+        blob_sha256 = None
+        staged_object = None
+        try:
+            if settings.STORAGE_DEDUP_ENABLED:
+                # Hash while streaming; identical content is stored once under blobs/<sha256>
+                blob_sha256 = await storage.store_blob(HashingReader(reader), content_type)
+                success = blob_sha256 is not None
+            else:
+                # Staged; user_{id}/{name} is only replaced once the quota is reserved
+                staged_object = await storage.stage_object(reader, content_type)
+                success = staged_object is not None
+        except UploadLimitExceeded as limit_err:
             raise HTTPException(
                 status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail="File exceeds storage quota"
+                detail=allowance.quota_detail if limit_err.reason == "quota" else allowance.size_limit_detail
             )
-        
-        # Upload file
-        file_data = io.BytesIO(raw_bytes)
-        success = storage.upload_user_file(current_user.id, safe_name, file_data, content_type)
+        size_bytes = reader.bytes_read
         
         if success:
-            # Add file record to database
-            file_record = FileModel(
-                user_id=current_user.id,
-                filename=safe_name,
-                original_filename=original_name,
-                file_size=size_bytes,
-                content_type=content_type,
-                storage_path=f"user_{current_user.id}/{safe_name}",
-                is_public=False
+            # Add or refresh the file record and update used_storage in one transaction
+            ifc_metadata = None
+            if scanner:
+                scanner.close()
+                ifc_metadata = scanner.result()
+            await save_uploaded_file(
+                db, storage, current_user.id, safe_name, original_name, content_type, size_bytes, blob_sha256, allowance,
+                ifc_metadata, staged_object=staged_object
             )
-            db.add(file_record)
-            
-            # Update user storage usage
-            new_usage = storage.get_user_usage(current_user.id)
-            logger.log_file_operation(f"Обновление used_storage: {current_user.used_storage} -> {new_usage}", current_user.id, file.filename, "UPDATE")
-            
-            # Получаем пользователя из текущей сессии
-            user = db.query(User).filter(User.id == current_user.id).first()
-            if user:
-                user.used_storage = new_usage
-            db.commit()
-            
-            # Invalidate cached list
-            try:
-                CacheService().delete(f"files:list:{current_user.id}")
-            except Exception:
-                pass
             logger.log_file_operation(f"Файл успешно загружен", current_user.id, safe_name, "UPLOAD")
 
-            # Schedule background FRAG conversion
+            # Queue FRAG conversion for the conversion workers
             try:
-                if background_tasks is not None:
-                    background_tasks.add_task(convert_ifc_to_frag_task, current_user.id, safe_name)
+                enqueue_conversion(db, current_user.id, safe_name)
             except Exception as conv_err:
                 logger.log_error(f"Не удалось поставить задачу конвертации FRAG: {conv_err}")
 
@@ -1123,6 +1226,8 @@ async def upload_file(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Failed to upload file"
             )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.log_error(f"Ошибка загрузки файла: {str(e)}")
         raise HTTPException(
@@ -1130,81 +1235,154 @@ async def upload_file(
             detail=str(e)
         )
 
-# --- IFC -> FRAG conversion utilities ---
+# Resumable uploads: create session -> PUT parts -> complete (or abort)
+@app.post("/api/uploads")
+async def create_resumable_upload(
+    payload: UploadSessionCreate,
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
+):
+    """Open a resumable upload session backed by a MinIO multipart upload"""
+    session = await create_upload_session(db, storage, current_user.id, payload.filename, payload.content_type, payload.size)
+    return api_ok(upload_session_payload(session), message="Upload session created")
 
-def convert_ifc_to_frag_task(user_id: int, ifc_filename: str) -> None:
-    """Background task: download IFC, convert to FRAG using Node script, upload FRAG back."""
-    try:
-        storage = StorageService()
-        # Download IFC to temp
-        with tempfile.TemporaryDirectory() as tmpdir:
-            in_path = os.path.join(tmpdir, ifc_filename)
-            out_path = os.path.join(tmpdir, os.path.splitext(ifc_filename)[0] + ".frag")
-            
-            # Read bytes from storage
-            ifc_bytes = storage.download_user_file(user_id, ifc_filename)
-            with open(in_path, "wb") as f:
-                f.write(ifc_bytes)
-            
-            # Run Node converter script
-            node_cmd = os.environ.get("NODE_BIN", "node")
-            script_path = os.path.abspath(os.path.join("TSP", "scripts", "ifc2frag.cjs"))
-            try:
-                result = subprocess.run([node_cmd, script_path, in_path, out_path], capture_output=True, text=True, cwd=os.path.abspath("TSP"), timeout=600)
-                if result.returncode != 0:
-                    logger.log_error(f"FRAG conversion failed: {result.stderr}")
-                    return
-            except Exception as run_err:
-                logger.log_error(f"FRAG conversion exception: {run_err}")
-                return
-            
-            # Upload FRAG back to storage
-            if os.path.exists(out_path):
-                with open(out_path, "rb") as f:
-                    frag_bytes = f.read()
-                storage.upload_user_file(user_id, os.path.splitext(ifc_filename)[0] + ".frag", io.BytesIO(frag_bytes), "application/octet-stream")
-                # Optionally store DB record
-                db = next(get_db())
-                try:
-                    frag_record = FileModel(
-                        user_id=user_id,
-                        filename=os.path.splitext(ifc_filename)[0] + ".frag",
-                        original_filename=os.path.splitext(ifc_filename)[0] + ".frag",
-                        file_size=len(frag_bytes),
-                        content_type="application/octet-stream",
-                        storage_path=f"user_{user_id}/{os.path.splitext(ifc_filename)[0] + '.frag'}",
-                        is_public=False
-                    )
-                    db.add(frag_record)
-                    db.commit()
-                    CacheService().delete(f"files:list:{user_id}")
-                    logger.log_file_operation("FRAG создан и загружен", user_id, frag_record.filename, "CONVERT")
-                except Exception as db_err:
-                    logger.log_error(f"DB error while adding FRAG record: {db_err}")
-    except Exception as e:
-        logger.log_error(f"convert_ifc_to_frag_task error: {e}")
+@app.get("/api/uploads/{upload_id}")
+async def get_resumable_upload(
+    upload_id: str,
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """Session state: acknowledged parts and the offset to resume from"""
+    session = get_upload_session(db, current_user.id, upload_id, active=False)
+    return api_ok(upload_session_payload(session))
+
+@app.put("/api/uploads/{upload_id}/parts/{part_number}")
+async def upload_resumable_part(
+    upload_id: str,
+    part_number: int,
+    request: Request,
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
+):
+    """Upload one part as the raw request body; X-Checksum-SHA256 (hex) is verified when sent"""
+    session = get_upload_session(db, current_user.id, upload_id)
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and int(declared_length) > session.part_size:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Part exceeds {session.part_size} bytes")
+    # Read at most one part into memory
+    chunks, received = [], 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > session.part_size:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"Part exceeds {session.part_size} bytes")
+        chunks.append(chunk)
+    part = await store_upload_part(db, storage, session, part_number, b"".join(chunks), request.headers.get("x-checksum-sha256"))
+    return api_ok({
+        "part_number": part.part_number,
+        "size": part.size,
+        "sha256": part.sha256,
+        "offset": acknowledged_offset(session),
+    })
+
+@app.post("/api/uploads/{upload_id}/complete")
+async def complete_resumable_upload(
+    upload_id: str,
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
+):
+    """Assemble the uploaded parts into the user's file (quota and type checks apply here)"""
+    session = get_upload_session(db, current_user.id, upload_id)
+    filename, size_bytes = await complete_upload_session(db, storage, session)
+    enqueue_conversion(db, current_user.id, filename)
+    return api_ok({"filename": filename, "size": size_bytes}, message="File uploaded successfully")
+
+@app.delete("/api/uploads/{upload_id}")
+async def abort_resumable_upload(
+    upload_id: str,
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
+):
+    """Abort a session and discard its uploaded parts"""
+    session = get_upload_session(db, current_user.id, upload_id)
+    await abort_upload_session(db, storage, session)
+    logger.log_file_operation("Сессия загрузки отменена", current_user.id, session.filename, "UPLOAD_ABORT")
+    return api_ok(message="Upload aborted")
 
 @app.post("/api/files/convert/{filename}")
-async def convert_ifc_to_frag(filename: str, current_user: User = Depends(require_current_user)):
-    """Manually trigger IFC->FRAG conversion for a user's file."""
-    background_tasks = BackgroundTasks()
-    background_tasks.add_task(convert_ifc_to_frag_task, current_user.id, filename)
-    return api_ok({"scheduled": True, "filename": filename}, message="Conversion scheduled")
+async def convert_ifc_to_frag(
+    filename: str,
+    priority: str = Query("interactive", pattern="^(interactive|batch)$"),
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """Manually trigger IFC->FRAG conversion for a user's file (queued for the conversion workers).
+
+    Defaults to the interactive class: the viewer is waiting for the result.
+    """
+    job = enqueue_conversion(db, current_user.id, filename, priority)
+    return api_ok({"scheduled": True, "filename": filename, "job_id": job.id}, message="Conversion scheduled")
+
+@app.get("/api/conversions")
+async def list_conversions(
+    filename: Optional[str] = Query(None),
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """Recent conversion jobs of the user, newest first (optionally for one source file)"""
+    jobs = list_user_jobs(db, current_user.id, filename)
+    return api_ok([job_payload(job) for job in jobs])
+
+@app.get("/api/conversions/{job_id}")
+async def get_conversion(
+    job_id: int,
+    wait: float = Query(0, ge=0, description="Long-poll: seconds to wait for the job to change state"),
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """Conversion job status: queued/running/done/failed with sizes and duration"""
+    if wait:
+        return api_ok(await wait_for_job(db, current_user.id, job_id, wait))
+    return api_ok(job_payload(get_user_job(db, current_user.id, job_id)))
+
+@app.get("/api/conversions/{job_id}/events")
+async def conversion_events(
+    job_id: int,
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events with the job status until it is done or failed"""
+    get_user_job(db, current_user.id, job_id)
+    db.close()  # the stream opens its own short-lived sessions
+    return StreamingResponse(
+        job_events(lambda: next(get_db()), current_user.id, job_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/files")
-async def list_files(current_user: User = Depends(require_current_user)):
-    """List user's files"""
+async def list_files(
+    current_user: User = Depends(require_current_user),
+    schema: Optional[str] = Query(None, description="IFC schema, e.g. IFC4 (case-insensitive)"),
+    project: Optional[str] = Query(None, description="Substring of the IfcProject name (case-insensitive)"),
+    cache: AsyncCacheService = Depends(get_async_cache)
+):
+    """List user's files with the IFC metadata scanned at upload"""
     try:
-        cache = CacheService()
         cache_key = f"files:list:{current_user.id}"
-        files = cache.get(cache_key)
+        files = await cache.get(cache_key)
         if files is None:
             # Get files from database
             db = next(get_db())
             try:
-                db_files = db.query(FileModel).filter(FileModel.user_id == current_user.id).all()
+                db_files = db.query(FileModel, IfcMetadata).outerjoin(
+                    IfcMetadata, IfcMetadata.file_id == FileModel.id
+                ).filter(FileModel.user_id == current_user.id).all()
                 files = []
-                for file in db_files:
+                for file, ifc_metadata in db_files:
                     files.append({
                         "id": file.id,
                         "name": file.filename,
@@ -1212,11 +1390,17 @@ async def list_files(current_user: User = Depends(require_current_user)):
                         "size": file.file_size,
                         "content_type": file.content_type,
                         "created_at": file.created_at.isoformat() if file.created_at else None,
-                        "is_public": file.is_public
+                        "is_public": file.is_public,
+                        "ifc": metadata_summary(ifc_metadata)
                     })
             finally:
                 db.close()
-            cache.set(cache_key, files, expire=60)
+            await cache.set(cache_key, files, expire=60)
+        # Filters run on the cached listing; a user's file count is small
+        if schema:
+            files = [f for f in files if f.get("ifc") and (f["ifc"]["schema"] or "").lower() == schema.lower()]
+        if project:
+            files = [f for f in files if f.get("ifc") and project.lower() in (f["ifc"]["project_name"] or "").lower()]
         logger.log_file_operation(f"Запрос списка файлов", current_user.id, "", "LIST")
         return api_ok(files)
     except Exception as e:
@@ -1226,28 +1410,103 @@ async def list_files(current_user: User = Depends(require_current_user)):
             detail=str(e)
         )
 
+@app.get("/api/files/{file_id}/metadata")
+async def get_file_metadata(
+    file_id: int,
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """IFC header, entity histogram and storeys of one file (from the upload scan)"""
+    row = db.query(IfcMetadata).join(FileModel, FileModel.id == IfcMetadata.file_id).filter(
+        FileModel.id == file_id,
+        FileModel.user_id == current_user.id
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No IFC metadata for this file")
+    return api_ok(metadata_payload(row))
+
+def _ready_element_index(db: Session, user_id: int, file_id: int) -> IfcElementIndex:
+    """The file's element index; 404 for unknown files, 409 while it is missing or stale."""
+    record = db.query(FileModel).filter(FileModel.id == file_id, FileModel.user_id == user_id).first()
+    if record is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    index = db.get(IfcElementIndex, file_id)
+    if index is None or (record.blob_sha256 and index.content_sha256 != record.blob_sha256):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Element index is not built yet")
+    return index
+
+def _parse_floats(value: str, count: int, name: str) -> List[float]:
+    try:
+        numbers = [float(v) for v in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(n) for n in numbers):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{name} needs {count} comma-separated numbers")
+    return numbers
+
+@app.get("/api/files/{file_id}/elements")
+async def search_file_elements(
+    file_id: int,
+    request: Request,
+    type: Optional[str] = Query(None, description="IFC class, e.g. IfcDoor; several separated by commas"),
+    storey: Optional[str] = Query(None, description="Storey name or GlobalId"),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """Search the element index; other `Pset.Property=value` parameters filter by properties (`*.Property` for any set)"""
+    _ready_element_index(db, current_user.id, file_id)
+    property_filters = parse_property_filters(
+        (key, value) for key, value in request.query_params.multi_items() if key not in ("type", "storey", "limit", "offset")
+    )
+    classes = [c.strip() for c in type.split(",") if c.strip()] if type else None
+    total, elements = search_elements(db, file_id, classes, storey, property_filters, limit, offset)
+    return api_ok({"total": total, "limit": limit, "offset": offset, "elements": elements})
+
+@app.get("/api/files/{file_id}/spatial")
+async def spatial_query(
+    file_id: int,
+    bbox: Optional[str] = Query(None, description="min_x,min_y,min_z,max_x,max_y,max_z in metres"),
+    point: Optional[str] = Query(None, description="x,y,z in metres (with radius)"),
+    radius: float = Query(0, ge=0),
+    type: Optional[str] = Query(None, description="IFC classes to keep, separated by commas"),
+    current_user: User = Depends(require_current_user),
+    db: Session = Depends(get_db)
+):
+    """GlobalIds of elements whose bounding box intersects `bbox` or lies within `radius` of `point`"""
+    if (bbox is None) == (point is None):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give either bbox or point")
+    index = _ready_element_index(db, current_user.id, file_id)
+    classes = [c.strip() for c in type.split(",") if c.strip()] if type else None
+    if bbox is not None:
+        box = _parse_floats(bbox, 6, "bbox")
+        if any(box[i] > box[i + 3] for i in range(3)):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="bbox minimum exceeds maximum")
+        run = lambda tree: tree.intersecting(tuple(box), classes)
+    else:
+        center = _parse_floats(point, 3, "point")
+        run = lambda tree: tree.within(center, radius, classes)
+    # Loading the tree reads every box of the file once per process; keep it off the event loop
+    global_ids = await anyio.to_thread.run_sync(
+        lambda: run(load_spatial_index(db, index))
+    )
+    return api_ok({"count": len(global_ids), "global_ids": global_ids})
+
 @app.get("/files/download/{filename}")
 async def download_file(
     filename: str,
     request: Request,
-    current_user: User = Depends(require_current_user)
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
 ):
-    """Download a file"""
+    """Download a file (streamed, supports Range requests)"""
     try:
-        storage = StorageService()
-        file_data = storage.download_user_file(current_user.id, filename)
-        
-        if file_data is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found"
-            )
-        
-        return StreamingResponse(
-            io.BytesIO(file_data),
-            media_type="application/octet-stream",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        object_name = resolve_object_name(db, current_user.id, filename)
+        return await stream_file(storage, object_name, filename, request)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1258,29 +1517,20 @@ async def download_file(
 async def head_download_file(
     filename: str,
     request: Request,
-    current_user: User = Depends(require_current_user)
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
 ):
     try:
-        storage = StorageService()
-        file_data = storage.download_user_file(current_user.id, filename)
-        if file_data is None:
-            return Response(status_code=404)
-        return Response(
-            status_code=200,
-            headers={
-                "Content-Type": "application/octet-stream",
-                "Content-Disposition": f"attachment; filename={filename}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(len(file_data))
-            }
-        )
+        return await head_user_file(storage, db, current_user.id, filename, request)
     except Exception:
         return Response(status_code=500)
 
 @app.get("/api/files/download/{filename}")
 async def download_file_with_token(
     filename: str,
-    request: Request
+    request: Request,
+    storage: AsyncStorageService = Depends(get_async_storage)
 ):
     """Download a file with token authentication for TSP viewer"""
     # Get token from query parameters
@@ -1308,105 +1558,79 @@ async def download_file_with_token(
             detail="Invalid token"
         )
     
-    # Get user from database
+    # Get user from database; the session is closed before the response streams
     db = next(get_db())
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found"
-        )
-    
-    storage = StorageService()
-    file_data = storage.download_user_file(user.id, filename)
-    
-    if file_data is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="File not found"
-        )
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found"
+            )
+        object_name = resolve_object_name(db, user.id, filename)
+    finally:
+        db.close()
     
     # Normalize filename for Windows compatibility
-    import os
-    import tempfile
-    import shutil
-    
-    # Create a temporary file with normalized name
-    temp_dir = tempfile.mkdtemp()
     normalized_filename = filename.replace(' ', '_').replace(':', '_')
-    temp_file_path = os.path.join(temp_dir, normalized_filename)
     
-    try:
-        # Write file data to temp location with normalized name
-        with open(temp_file_path, 'wb') as f:
-            f.write(file_data)
-        
-        response = FileResponse(
-            path=temp_file_path,
-            filename=normalized_filename,
-            media_type="application/octet-stream"
-        )
-        
-        # Add CORS headers to prevent browser blocking
-        response.headers["Access-Control-Allow-Origin"] = "*"
-        response.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, X-CSRF-Token"
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
-        
-        return response
-    except Exception as e:
-        # Clean up temp directory on error
-        shutil.rmtree(temp_dir, ignore_errors=True)
-        raise e
+    return await stream_file(
+        storage,
+        object_name,
+        filename,
+        request,
+        headers={
+            "Content-Disposition": f'attachment; filename="{normalized_filename}"',
+            # Add CORS headers to prevent browser blocking
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+            "Access-Control-Allow-Headers": "Content-Type, Authorization, X-CSRF-Token, Range, If-Range, If-None-Match, If-Modified-Since",
+            "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges, ETag",
+        },
+    )
 
 @app.head("/api/files/download/{filename}")
 async def head_download_file_with_token(
     filename: str,
-    request: Request
+    request: Request,
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
 ):
     token = request.query_params.get("token")
     if not token:
         return Response(status_code=401)
+    # Verified payloads are cached, so a repeated HEAD does not decode the token again
+    payload = AuthService.verify_token(token)
     try:
-        from jose import jwt
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: int = payload.get("sub")
-        if not user_id:
-            return Response(status_code=401)
-    except Exception:
+        user_id = int(payload.get("sub")) if payload else None
+    except (TypeError, ValueError):
+        user_id = None
+    if not user_id:
         return Response(status_code=401)
-    storage = StorageService()
-    file_data = storage.download_user_file(user_id, filename)
-    if file_data is None:
-        return Response(status_code=404)
-    return Response(
-        status_code=200,
+    normalized_filename = filename.replace(' ', '_').replace(':', '_')
+    return await head_user_file(
+        storage,
+        db,
+        user_id,
+        filename,
+        request,
         headers={
-            "Content-Type": "application/octet-stream",
-            "Content-Disposition": f"attachment; filename={filename}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(len(file_data))
-        }
+            "Content-Disposition": f'attachment; filename="{normalized_filename}"',
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "Content-Length, Content-Range, Accept-Ranges, ETag",
+        },
     )
 
 @app.get("/files/view/{filename}")
 async def view_file(
     filename: str,
-    current_user: User = Depends(require_current_user)
+    request: Request,
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
 ):
-    """View a file in browser"""
+    """View a file in browser (streamed, supports Range requests)"""
     try:
-        storage = StorageService()
-        file_data = storage.download_user_file(current_user.id, filename)
-        
-        if file_data is None:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="File not found"
-            )
-        
         # Determine content type based on file extension
         content_type = "application/octet-stream"
         if filename.lower().endswith('.ifc'):
@@ -1416,11 +1640,10 @@ async def view_file(
         elif filename.lower().endswith('.ifczip'):
             content_type = "application/zip"
         
-        return StreamingResponse(
-            io.BytesIO(file_data),
-            media_type=content_type,
-            headers={"Content-Disposition": f"inline; filename={filename}"}
-        )
+        object_name = resolve_object_name(db, current_user.id, filename)
+        return await stream_file(storage, object_name, filename, request, media_type=content_type, disposition="inline")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1431,36 +1654,37 @@ async def view_file(
 async def delete_file(
     filename: str,
     current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
     db: Session = Depends(get_db)
 ):
     """Delete a file"""
     try:
-        storage = StorageService()
-        success = storage.delete_user_file(current_user.id, filename)
+        file_record = db.query(FileModel).filter(
+            FileModel.user_id == current_user.id,
+            FileModel.filename == filename
+        ).first()
+        cleanup = StorageCleanup()
+        if file_record and file_record.blob_sha256:
+            # Shared blob: drop this file's reference, the object goes with the last one
+            cleanup.blobs.append(release_blob(db, file_record.blob_sha256))
+            success = True
+        else:
+            success = await storage.delete_user_file(current_user.id, filename)
         
         if success:
             # Delete file record from database
-            file_record = db.query(FileModel).filter(
-                FileModel.user_id == current_user.id,
-                FileModel.filename == filename
-            ).first()
             if file_record:
+                # Update user storage usage in the same transaction
+                adjust_used_storage(db, current_user.id, -(file_record.file_size or 0))
+                delete_ifc_metadata(db, [file_record.id])
+                delete_element_index(db, [file_record.id])
+                cleanup.objects.extend(delete_revisions(db, current_user.id, [filename]))
                 db.delete(file_record)
-            
-            # Update user storage usage
-            new_usage = storage.get_user_usage(current_user.id)
-            
-            # Получаем пользователя из текущей сессии
-            user = db.query(User).filter(User.id == current_user.id).first()
-            if user:
-                user.used_storage = new_usage
             db.commit()
+            await cleanup.run(db, storage)
             
             # Invalidate cached list
-            try:
-                CacheService().delete(f"files:list:{current_user.id}")
-            except Exception:
-                pass
+            invalidate_file_list(current_user.id, [filename])
             logger.log_file_operation(f"Файл успешно удален", current_user.id, filename, "DELETE")
             return api_ok(message="File deleted successfully")
         else:
@@ -1468,12 +1692,168 @@ async def delete_file(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="File not found"
             )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
+@app.delete("/api/files")
+async def delete_files(
+    payload: FileBatchDelete,
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
+):
+    """Delete several files at once (one bulk storage request, one DB transaction)"""
+    filenames = list(dict.fromkeys(payload.filenames))
+    if not filenames:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No files given")
+    if len(filenames) > settings.BATCH_DELETE_MAX_FILES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {settings.BATCH_DELETE_MAX_FILES} files per request")
+    
+    records = db.query(FileModel).filter(
+        FileModel.user_id == current_user.id,
+        FileModel.filename.in_(filenames)
+    ).all()
+    found = {record.filename for record in records}
+    missing = [name for name in filenames if name not in found]
+    
+    # Per-user objects go in one DeleteObjects call; blob-backed files only drop references
+    legacy_paths = [record.storage_path for record in records if not record.blob_sha256]
+    failed_paths = set(await storage.delete_objects(legacy_paths)) if legacy_paths else set()
+    deleted = [record for record in records if record.blob_sha256 or record.storage_path not in failed_paths]
+    failed = [record.filename for record in records if not record.blob_sha256 and record.storage_path in failed_paths]
+    
+    deleted_names = [record.filename for record in deleted]
+    cleanup = StorageCleanup()
+    if deleted:
+        cleanup.blobs.extend(release_blobs(db, [record.blob_sha256 for record in deleted if record.blob_sha256]))
+        adjust_used_storage(db, current_user.id, -sum(record.file_size or 0 for record in deleted))
+        delete_ifc_metadata(db, [record.id for record in deleted])
+        delete_element_index(db, [record.id for record in deleted])
+        cleanup.objects.extend(delete_revisions(db, current_user.id, deleted_names))
+        db.query(FileModel).filter(FileModel.id.in_([record.id for record in deleted])).delete(synchronize_session=False)
+        db.commit()
+        await cleanup.run(db, storage)
+        invalidate_file_list(current_user.id, deleted_names)
+    
+    logger.log_file_operation(f"Пакетное удаление: {len(deleted_names)} файлов", current_user.id, ", ".join(deleted_names[:20]), "DELETE")
+    return api_ok(
+        {"deleted": deleted_names, "missing": missing, "failed": failed},
+        message=f"Deleted {len(deleted_names)} files"
+    )
+
+@app.post("/api/files/upload")
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(require_current_user),
+    storage: AsyncStorageService = Depends(get_async_storage),
+    db: Session = Depends(get_db)
+):
+    """Upload several files at once; transfers run in parallel, records are written in one transaction"""
+    if len(files) > settings.BATCH_UPLOAD_MAX_FILES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {settings.BATCH_UPLOAD_MAX_FILES} files per request")
+    names = [sanitize_upload_name(upload.filename or "") for upload in files]
+    if len(set(names)) != len(names):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Duplicate filenames in batch")
+    
+    # The whole batch shares one quota: replaced files free their bytes
+    allowances = [UploadAllowance(db, current_user.id, name) for name in names]
+    first = allowances[0]
+    max_bytes = first.max_bytes
+    remaining_quota = max(first.storage_quota - first.current_usage + sum(a.replaced_size for a in allowances), 0)
+    known_sizes = [upload.size for upload in files if upload.size is not None]
+    if any(size > max_bytes for size in known_sizes):
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=first.size_limit_detail)
+    if sum(known_sizes) > remaining_quota:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=first.quota_detail)
+    
+    # Every file is cut off at the per-file limit, and all of them together at the remaining quota
+    quota_budget = SharedLimit(remaining_quota, reason="quota")
+    
+    async def _store(upload: UploadFile, name: str):
+        content_type = upload.content_type or "application/octet-stream"
+        scanner = metadata_scanner(name)
+        reader = LimitedReader(TeeReader(upload.file, scanner.feed) if scanner else upload.file, max_bytes, reason="size", shared=quota_budget)
+        if settings.STORAGE_DEDUP_ENABLED:
+            sha256 = await storage.store_blob(HashingReader(reader), content_type)
+            staged = None
+            ok = sha256 is not None
+        else:
+            # Staged under a unique name; user_{id}/{name} is only written once the batch succeeded
+            sha256 = None
+            staged = await storage.stage_object(reader, content_type)
+            ok = staged is not None
+        if scanner:
+            scanner.close()
+        return sha256, reader.bytes_read, ok, scanner.result() if scanner else None, staged
+    
+    # Concurrency is capped by the storage upload limiter
+    results = await asyncio.gather(*[_store(upload, name) for upload, name in zip(files, names)], return_exceptions=True)
+    stored = [r for r in results if not isinstance(r, BaseException)]
+    staged_objects = [r[4] for r in stored if r[4]]
+    
+    async def _discard() -> None:
+        # Nothing outside staging/ has been written for this batch yet
+        await storage.drop_staged_blobs()
+        if staged_objects:
+            await storage.delete_objects(staged_objects)
+    
+    error = None
+    limit_errors = [r for r in results if isinstance(r, UploadLimitExceeded)]
+    if limit_errors:
+        detail = first.quota_detail if any(r.reason == "quota" for r in limit_errors) else first.size_limit_detail
+        error = HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+    elif any(isinstance(r, BaseException) or not r[2] for r in results):
+        for r in results:
+            if isinstance(r, BaseException):
+                logger.log_error(f"Ошибка пакетной загрузки: {r}")
+        error = HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to upload files")
+    if error is not None:
+        await _discard()
+        raise error
+    
+    cleanup = StorageCleanup()
+    replacements = StagedReplacements(storage, failure_detail="Failed to upload files")
+    uploaded = []
+    settled = False
+    try:
+        for upload, name, allowance, (sha256, size_bytes, _, ifc_metadata, _) in zip(files, names, allowances, results):
+            content_type = upload.content_type or "application/octet-stream"
+            stage_file_record(db, current_user.id, name, upload.filename or name, content_type, size_bytes, sha256, allowance, cleanup, ifc_metadata)
+            uploaded.append({"filename": name, "size": size_bytes})
+        # Records are staged (and the quota reserved) before any existing object is overwritten
+        for name, result in zip(names, results):
+            if result[4]:
+                await replacements.promote(result[4], f"user_{current_user.id}/{name}")
+                staged_objects.remove(result[4])
+        if any(r[0] for r in results):
+            settled = await storage.settle_blobs()
+            if not settled:
+                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to upload files")
+        db.commit()
+    except Exception:
+        # A concurrent upload took the quota or a file could not be stored: release every
+        # reservation, put back the objects promoted so far and drop the new content
+        db.rollback()
+        await replacements.undo()
+        await _discard()
+        if settled:
+            blobs = {r[0]: r[1] for r in results if r[0]}
+            await anyio.to_thread.run_sync(abandon_blobs, db, storage.sync, blobs)
+        raise
+    replacements.committed(cleanup)
+    await cleanup.run(db, storage)
+    invalidate_file_list(current_user.id, names)
+    
+    for item in uploaded:
+        enqueue_conversion(db, current_user.id, item["filename"])
+    logger.log_file_operation(f"Пакетная загрузка: {len(uploaded)} файлов", current_user.id, ", ".join(names[:20]), "UPLOAD")
+    return api_ok(uploaded, message=f"Uploaded {len(uploaded)} files")
+
 # OAuth endpoints
 @app.get("/auth/google")
 async def google_login():
@@ -1549,6 +1929,7 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
                 existing_email_user.avatar_url = user_info.get("picture")
                 existing_email_user.last_login = datetime.utcnow()
                 db.commit()
+                AuthService.invalidate_user(existing_email_user.id, existing_email_user.email)
                 user = existing_email_user
             else:
                 # Create new user
@@ -1674,6 +2055,17 @@ async def frag_converter_health():
     except Exception as e:
         return api_error(str(e), status=500)
 
+@app.get("/api/frag-converter/queue")
+async def frag_converter_queue(
+    current_user: User = Depends(require_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Conversion queue depth and recent throughput (admin only)"""
+    try:
+        return api_ok(await anyio.to_thread.run_sync(queue_metrics, db))
+    except Exception as e:
+        return api_error(str(e), status=500)
+
 # New page routes
 @app.get("/files", response_class=HTMLResponse)
 async def files_page(request: Request):
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Event-loop responsiveness benchmark: p50/p99 latency of /health and /auth/me
+while several large uploads run concurrently against a live server.
+
+Usage:
+  venv\\Scripts\\python scripts\\bench_event_loop.py --token <JWT> [--base-url http://localhost:8000]
+      [--uploads 4] [--size-mb 100] [--probes 200]
+
+Run once with --uploads 0 for the idle baseline; with storage offloaded to worker
+threads the p99 under load should stay close to it.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def _upload(client: httpx.AsyncClient, token: str, size_mb: int, idx: int) -> float:
+    payload = os.urandom(1024 * 1024) * size_mb
+    started = time.perf_counter()
+    resp = await client.post(
+        "/files/upload",
+        headers={"Authorization": f"Bearer {token}"},
+        files={"file": (f"bench_{idx}.ifc", payload, "application/octet-stream")},
+    )
+    if resp.status_code != 200:
+        print(f"upload {idx}: HTTP {resp.status_code} {resp.text[:200]}", file=sys.stderr)
+    return time.perf_counter() - started
+
+
+async def _probe(client: httpx.AsyncClient, path: str, token: str, count: int, out: list) -> None:
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(count):
+        started = time.perf_counter()
+        await client.get(path, headers=headers)
+        out.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--size-mb", type=int, default=100)
+    parser.add_argument("--probes", type=int, default=200)
+    args = parser.parse_args()
+
+    timeout = httpx.Timeout(600.0)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=timeout) as client:
+        health, me = [], []
+        uploads = [_upload(client, args.token, args.size_mb, i) for i in range(args.uploads)]
+        probes = [
+            _probe(client, "/health", args.token, args.probes, health),
+            _probe(client, "/auth/me", args.token, args.probes, me),
+        ]
+        results = await asyncio.gather(*uploads, *probes)
+
+    for name, samples in (("/health", health), ("/auth/me", me)):
+        print(
+            f"{name:10s} n={len(samples):4d} p50={statistics.median(samples):8.1f}ms "
+            f"p99={_percentile(samples, 99):8.1f}ms max={max(samples):8.1f}ms"
+        )
+    upload_times = [r for r in results[: args.uploads]]
+    if upload_times:
+        print(f"uploads    n={len(upload_times):4d} x {args.size_mb}MB, slowest {max(upload_times):.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -142,6 +142,22 @@ class ServiceManager:
             print(f"❌ Ошибка запуска Auth Service: {e}")
             return False
     
+    def start_conversion_worker(self):
+        """Запуск воркера конвертации IFC -> FRAG"""
+        print("⚙️ Запуск воркера конвертации...")
+        try:
+            proj_root = Path(__file__).resolve().parent
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'app.conversion.worker'],
+                cwd=str(proj_root)
+            )
+            self.processes.append(('Conversion Worker', process))
+            print("✅ Воркер конвертации запущен")
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка запуска воркера конвертации: {e}")
+            return False
+
     def start_viewer_service(self):
         """Запуск TSP Viewer (Vite)"""
         print("🎨 Запуск TSP Viewer...")
@@ -351,6 +367,11 @@ class ServiceManager:
             print("❌ Не удалось запустить Auth Service")
             return False
         
+        # Запускаем воркер конвертации IFC -> FRAG
+        if not self.start_conversion_worker():
+            print("❌ Не удалось запустить воркер конвертации")
+            return False
+        
         # Запускаем TSP Viewer
         if not self.start_viewer_service():
             print("❌ Не удалось запустить TSP Viewer")
@@ -0,0 +1,588 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+
+def _user_id(create_user, email):
+    return create_user(email, "secret123").id
+
+
+def test_failed_job_retries_with_backoff_then_fails(db_session, create_user, monkeypatch):
+    from app.conversion import queue
+    from app.models.conversion_job import ConversionJob
+
+    monkeypatch.setattr(queue.settings, "CONVERSION_RETRY_BACKOFF_SEC", 10)
+    user_id = _user_id(create_user, "convretry@test.com")
+    job = queue.enqueue_conversion(db_session, user_id, "Retry.ifc")
+    job_id, max_attempts = job.id, job.max_attempts
+    assert job.status == "queued" and job.attempts == 0
+
+    for attempt in range(1, max_attempts + 1):
+        claimed = queue.claim_next_job(db_session, "w1")
+        assert claimed is not None and claimed.id == job_id and claimed.attempts == attempt
+        # Only one claimant wins a queued job
+        assert queue.claim_next_job(db_session, "w2") is None
+        status = queue.fail_job(db_session, job_id, "w1", f"boom {attempt}")
+        if attempt < max_attempts:
+            assert status == "queued"
+            job = db_session.get(ConversionJob, job_id)
+            delay = queue._as_aware(job.available_at) - queue._utcnow()
+            assert timedelta(seconds=queue.retry_delay(attempt) - 5) < delay <= timedelta(seconds=queue.retry_delay(attempt))
+            # Not runnable until the backoff elapses
+            assert queue.claim_next_job(db_session, "w1") is None
+            job.available_at = queue._utcnow() - timedelta(seconds=1)
+            db_session.commit()
+
+    job = db_session.get(ConversionJob, job_id)
+    assert status == "failed" and job.status == "failed" and job.error == f"boom {max_attempts}"
+    assert queue.retry_delay(1) == 10 and queue.retry_delay(3) == 40
+
+
+def test_worker_pool_runs_jobs_and_recovers_stale_leases(test_engine, db_session, create_user):
+    from app.conversion import queue
+    from app.conversion.worker import ConversionWorker
+    from app.models.conversion_job import ConversionJob
+
+    user_id = _user_id(create_user, "convworker@test.com")
+    ok = queue.enqueue_conversion(db_session, user_id, "Good.ifc").id
+    bad = queue.enqueue_conversion(db_session, user_id, "Bad.ifc").id
+
+    def runner(job_id):
+        if job_id == bad:
+            raise RuntimeError("converter crashed")
+        return {"input_size": 100, "output_size": 40, "output_filename": "Good.frag"}
+
+    worker = ConversionWorker(
+        processes=2,
+        worker_id="test-worker",
+        session_factory=sessionmaker(bind=test_engine),
+        executor_factory=lambda n: ThreadPoolExecutor(n),
+        job_runner=runner,
+    )
+    assert worker.dispatch() == 2
+    worker._executor.shutdown(wait=True)
+    assert worker.reap() == 2
+
+    db_session.expire_all()
+    done = db_session.get(ConversionJob, ok)
+    assert (done.status, done.input_size, done.output_size, done.output_filename) == ("done", 100, 40, "Good.frag")
+    assert db_session.get(ConversionJob, bad).status == "queued"
+    assert db_session.get(ConversionJob, bad).error == "converter crashed"
+
+    # A worker that stops heartbeating loses its job back to the queue
+    stale = queue.enqueue_conversion(db_session, user_id, "Stale.ifc").id
+    queue.claim_next_job(db_session, "dead-worker")
+    job = db_session.get(ConversionJob, stale)
+    job.heartbeat_at = queue._utcnow() - timedelta(seconds=600)
+    db_session.commit()
+    assert queue.requeue_stale_jobs(db_session, lease_sec=60) == 1
+    assert db_session.get(ConversionJob, stale).status == "queued"
+
+    # Once re-claimed, the late worker can no longer report on the job
+    job = db_session.get(ConversionJob, stale)
+    job.available_at = queue._utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    while queue.claim_next_job(db_session, "new-worker").id != stale:
+        pass
+    assert queue.complete_job(db_session, stale, "dead-worker", 1, 1, "Late.frag") is False
+    assert queue.fail_job(db_session, stale, "dead-worker", "late failure") is None
+    job = db_session.get(ConversionJob, stale)
+    assert (job.status, job.worker_id, job.output_filename) == ("running", "new-worker", None)
+    assert queue.complete_job(db_session, stale, "new-worker", 100, 40, "Stale.frag") is True
+    assert db_session.get(ConversionJob, stale).status == "done"
+
+
+def test_enqueue_keeps_one_queued_job_per_file(db_session, create_user, monkeypatch):
+    from app.conversion import queue
+    from app.models.conversion_job import ConversionJob
+
+    user_id = _user_id(create_user, "convdedupe@test.com")
+    first = queue.enqueue_conversion(db_session, user_id, "Twice.ifc").id
+
+    # A concurrent request passed the lookup before the first job was committed
+    lookup = queue._queued_job
+    calls = []
+
+    def missed_once(*args):
+        calls.append(args)
+        return None if len(calls) == 1 else lookup(*args)
+
+    monkeypatch.setattr(queue, "_queued_job", missed_once)
+    assert queue.enqueue_conversion(db_session, user_id, "Twice.ifc", priority="interactive").id == first
+    monkeypatch.undo()
+    queued = db_session.query(ConversionJob).filter(ConversionJob.user_id == user_id, ConversionJob.status == "queued").all()
+    assert [(job.id, job.priority) for job in queued] == [(first, "interactive")]
+
+    # A failed attempt is not re-queued next to a newer queued job for the file
+    claimed = queue.claim_next_job(db_session, "w1")
+    while claimed.id != first:
+        queue.complete_job(db_session, claimed.id, "w1", 0, 0, "other.frag")
+        claimed = queue.claim_next_job(db_session, "w1")
+    newer = queue.enqueue_conversion(db_session, user_id, "Twice.ifc").id
+    assert queue.fail_job(db_session, first, "w1", "boom") == "failed"
+    assert db_session.get(ConversionJob, newer).status == "queued"
+
+
+def test_convert_endpoint_enqueues_job(client, db_session, create_user):
+    from app.models.conversion_job import ConversionJob
+
+    create_user("convapi@test.com", "secret123")
+    csrf = client.get("/login").cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": "convapi@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    auth = {"Authorization": f"Bearer {r.json().get('access_token')}"}
+
+    r = client.post("/api/files/convert/Plan.ifc", headers=auth)
+    assert r.status_code == 200
+    data = r.json()["data"]
+    job = db_session.get(ConversionJob, data["job_id"])
+    assert data["scheduled"] is True and job.filename == "Plan.ifc" and job.status == "queued"
+
+
+def test_conversion_status_long_poll_events_and_metrics(client, db_session, create_user, monkeypatch):
+    from app.conversion import queue
+    from app.conversion import status as job_status
+
+    monkeypatch.setattr(job_status.settings, "CONVERSION_STATUS_POLL_SEC", 0.05)
+    create_user("convstatus@test.com", "secret123", admin=True)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": "convstatus@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    auth = {"Authorization": f"Bearer {r.json().get('access_token')}"}
+
+    job_id = client.post("/api/files/convert/Status.ifc", headers=auth).json()["data"]["job_id"]
+    r = client.get(f"/api/conversions/{job_id}", headers=auth)
+    assert r.status_code == 200 and r.json()["data"]["status"] == "queued"
+    assert client.get("/api/conversions?filename=Status.ifc", headers=auth).json()["data"][0]["id"] == job_id
+    assert client.get(f"/api/conversions/{job_id + 10000}", headers=auth).status_code == 404
+
+    # Long-poll on an unchanged job returns its current state after the wait
+    r = client.get(f"/api/conversions/{job_id}?wait=0.2", headers=auth)
+    assert r.json()["data"]["status"] == "queued"
+    from fastapi.testclient import TestClient
+    assert TestClient(client.app).get("/api/frag-converter/queue").status_code == 401
+    metrics = client.get("/api/frag-converter/queue", headers=auth).json()["data"]
+    assert metrics["queued"] >= 1 and metrics["oldest_queued_age_sec"] is not None
+
+    claimed = queue.claim_next_job(db_session, "status-worker")
+    while claimed.id != job_id:
+        # Older jobs left queued by other tests are finished out of the way
+        queue.complete_job(db_session, claimed.id, "status-worker", 0, 0, "other.frag")
+        claimed = queue.claim_next_job(db_session, "status-worker")
+    queue.complete_job(db_session, job_id, "status-worker", 1000, 250, "Status.frag")
+
+    data = client.get(f"/api/conversions/{job_id}?wait=5", headers=auth).json()["data"]
+    assert (data["status"], data["input_size"], data["output_size"], data["output_filename"]) == ("done", 1000, 250, "Status.frag")
+    assert data["duration_ms"] is not None
+
+    # The event stream ends with the terminal state
+    r = client.get(f"/api/conversions/{job_id}/events", headers=auth)
+    assert r.headers["content-type"].startswith("text/event-stream")
+    assert '"status": "done"' in r.text and r.text.startswith("event: status")
+    assert client.get("/api/frag-converter/queue", headers=auth).json()["data"]["done"] >= 1
+
+
+def test_job_status_polls_release_their_connections(db_session, create_user, monkeypatch):
+    import anyio
+    from app.conversion import queue
+    from app.conversion import status as job_status
+
+    monkeypatch.setattr(job_status.settings, "CONVERSION_STATUS_POLL_SEC", 0.01)
+    user_id = _user_id(create_user, "convpool@test.com")
+    job = queue.enqueue_conversion(db_session, user_id, "Pool.ifc")
+    sessions = {"opened": 0, "closed": 0}
+
+    class CountingSession:
+        def __init__(self):
+            sessions["opened"] += 1
+
+        def query(self, *entities):
+            if sessions["opened"] == 2:
+                db_session.query(type(job)).filter_by(id=job.id).update({"status": "done"})
+                db_session.commit()
+            return db_session.query(*entities)
+
+        def close(self):
+            sessions["closed"] += 1
+
+    async def collect():
+        return [event async for event in job_status.job_events(CountingSession, user_id, job.id)]
+
+    events = anyio.run(collect)
+    assert len(events) == 2 and '"status": "done"' in events[-1]
+    # One short-lived session per poll, none left open
+    assert sessions == {"opened": 2, "closed": 2}
+
+    assert anyio.run(job_status.wait_for_job, db_session, user_id, job.id, 0)["status"] == "done"
+    assert not db_session.in_transaction()
+
+
+def test_convert_job_streams_through_temp_files(db_session, create_user, monkeypatch):
+    import shutil
+
+    from app.conversion import converter, queue
+    from app.models.file import File as FileModel
+    from app.storage.service import StorageService
+
+    user_id = _user_id(create_user, "convstream@test.com")
+    chunks = [b"ISO-10303-21;", b"x" * 1000, b"END-ISO-10303-21;"]
+    uploaded = {}
+
+    class Response:
+        def stream(self, amt):
+            yield from chunks
+
+        def close(self):
+            pass
+
+        def release_conn(self):
+            pass
+
+    class FakeMinIO:
+        def open_file(self, object_name, offset=0, length=0):
+            return Response() if object_name == f"user_{user_id}/Tower.ifc" else None
+
+        def upload_user_file(self, uid, filename, data, content_type, length=-1):
+            # The FRAG arrives as an open file with a known length, not an in-memory buffer
+            assert hasattr(data, "fileno") and length > 0
+            uploaded[filename] = (data.read(), length)
+            return True
+
+    monkeypatch.setattr(converter, "run_node_converter", shutil.copyfile)
+    monkeypatch.setattr(converter.settings, "CONVERSION_CACHE_ENABLED", False)
+    job = queue.enqueue_conversion(db_session, user_id, "Tower.ifc")
+    result = converter.convert_job(db_session, StorageService(FakeMinIO()), job)
+
+    size = sum(len(c) for c in chunks)
+    assert result == {"input_size": size, "output_size": size, "output_filename": "Tower.frag", "cache_hit": False}
+    assert uploaded["Tower.frag"] == (b"".join(chunks), size)
+    record = db_session.query(FileModel).filter(FileModel.user_id == user_id, FileModel.filename == "Tower.frag").one()
+    assert record.file_size == size
+
+    missing = queue.enqueue_conversion(db_session, user_id, "Missing.ifc")
+    with pytest.raises(converter.ConversionError, match="not found"):
+        converter.convert_job(db_session, StorageService(FakeMinIO()), missing)
+
+
+def test_conversion_cache_links_existing_frag(db_session, create_user, monkeypatch):
+    import hashlib
+    import shutil
+
+    from app.conversion import cache, converter, queue
+    from app.models.blob import Blob
+    from app.models.file import File as FileModel
+
+    objects = {}
+    runs = []
+
+    class BlobStorage:
+        def download_object_to(self, object_name, fileobj):
+            data = objects.get(object_name)
+            if data is None:
+                return None
+            fileobj.write(data)
+            return len(data)
+
+        def store_blob(self, reader, content_type):
+            data = reader.read()
+            objects[f"blobs/{hashlib.sha256(data).hexdigest()}"] = data
+            return reader.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def delete_objects(self, names):
+            return [name for name in names if objects.pop(name, None) is None]
+
+    def convert(in_path, out_path):
+        runs.append(in_path)
+        shutil.copyfile(in_path, out_path)
+
+    monkeypatch.setattr(converter, "run_node_converter", convert)
+    monkeypatch.setattr(converter, "converter_version", lambda: "ifc2frag-test/fragments-1.0")
+    storage = BlobStorage()
+    first = _user_id(create_user, "cachea@test.com")
+    second = _user_id(create_user, "cacheb@test.com")
+    ifc = b"ISO-10303-21; cached model"
+    objects[f"user_{first}/A.ifc"] = ifc
+    objects[f"user_{second}/B.ifc"] = ifc
+
+    result = converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, first, "A.ifc"))
+    assert result["cache_hit"] is False and len(runs) == 1
+
+    # Same content from another user: Node is skipped and the FRAG blob is shared
+    result = converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, second, "B.ifc"))
+    assert result == {"input_size": len(ifc), "output_size": len(ifc), "output_filename": "B.frag", "cache_hit": True}
+    assert len(runs) == 1
+    frags = db_session.query(FileModel).filter(FileModel.filename.in_(["A.frag", "B.frag"])).all()
+    frag_sha = hashlib.sha256(ifc).hexdigest()
+    assert {f.blob_sha256 for f in frags} == {frag_sha} and len(frags) == 2
+    # Two FRAG records plus the cache entry
+    assert db_session.get(Blob, frag_sha).ref_count == 3
+
+    # A converter upgrade changes the key and converts again
+    monkeypatch.setattr(converter, "converter_version", lambda: "ifc2frag-test/fragments-2.0")
+    assert converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, first, "A.ifc"))["cache_hit"] is False
+    assert len(runs) == 2
+
+    # Expired entries give their blob reference back
+    evicted = cache.evict_conversion_cache(db_session, storage, ttl_days=-1)
+    assert evicted >= 2 and db_session.get(Blob, frag_sha).ref_count == 2
+
+
+    # A placeholder copy (fragments import failed) is delivered but not cached
+    def placeholder(in_path, out_path):
+        runs.append(in_path)
+        shutil.copyfile(in_path, out_path)
+        return {"ok": True, "fallback": True}
+
+    monkeypatch.setattr(converter, "run_node_converter", placeholder)
+    monkeypatch.setattr(converter, "converter_version", lambda: "ifc2frag-test/fragments-3.0")
+    objects[f"user_{first}/C.ifc"] = b"ISO-10303-21; placeholder model"
+    for _ in range(2):
+        converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, first, "C.ifc"))
+    assert len(runs) == 4
+
+
+
+def test_failed_converter_self_test_is_not_rerun_per_job(monkeypatch):
+    import subprocess
+    import types
+    from app.conversion import converter
+
+    runs = []
+
+    def broken_self_test(*args, **kwargs):
+        runs.append(args)
+        return types.SimpleNamespace(stdout="", returncode=1)
+
+    clock = [1000.0]
+    monkeypatch.setattr(converter, "_converter_version", None)
+    monkeypatch.setattr(converter, "_converter_version_retry_at", 0.0)
+    monkeypatch.setattr(converter.settings, "CONVERTER_VERSION_RETRY_SEC", 60)
+    monkeypatch.setattr(converter.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(subprocess, "run", broken_self_test)
+
+    assert converter.converter_version() is None
+    assert converter.converter_version() is None
+    assert len(runs) == 1
+
+    # Retried once the failure has expired
+    clock[0] += 61
+    monkeypatch.setattr(subprocess, "run", lambda *a, **k: types.SimpleNamespace(
+        stdout='{"converterVersion": "2", "hasFragments": true, "fragmentsVersion": "3.1"}', returncode=0
+    ))
+    assert converter.converter_version() == "ifc2frag-2/fragments-3.1"
+
+def test_scheduler_prioritises_interactive_and_shares_between_users(db_session, create_user, monkeypatch):
+    from app.conversion import queue
+    from app.conversion.status import queue_metrics
+    from app.models.conversion_job import ConversionJob
+
+    # Start from an empty queue
+    db_session.query(ConversionJob).filter(ConversionJob.status.in_(["queued", "running"])).update(
+        {ConversionJob.status: "failed"}, synchronize_session=False
+    )
+    db_session.commit()
+    monkeypatch.setattr(queue.settings, "CONVERSION_MAX_RUNNING_PER_USER", 2)
+    bulk = _user_id(create_user, "schedbulk@test.com")
+    other = _user_id(create_user, "schedother@test.com")
+    viewer = _user_id(create_user, "schedviewer@test.com")
+
+    bulk_ids = [queue.enqueue_conversion(db_session, bulk, f"Bulk{n}.ifc").id for n in range(5)]
+    other_id = queue.enqueue_conversion(db_session, other, "Other.ifc").id
+    # Pending duplicates collapse into one job; asking for it interactively promotes it
+    assert queue.enqueue_conversion(db_session, bulk, "Bulk0.ifc").id == bulk_ids[0]
+    view_id = queue.enqueue_conversion(db_session, viewer, "Open.ifc").id
+    assert queue.enqueue_conversion(db_session, viewer, "Open.ifc", "interactive").id == view_id
+    assert db_session.get(ConversionJob, view_id).priority == "interactive"
+
+    scheduler = queue.StrideScheduler({"interactive": 2, "batch": 1})
+    order = []
+    while True:
+        job = queue.claim_next_job(db_session, "sched-worker", scheduler)
+        if job is None:
+            break
+        order.append(job.id)
+
+    # Interactive first, then users alternate, and the bulk user stops at the cap
+    assert order == [view_id, bulk_ids[0], other_id, bulk_ids[1]]
+    assert db_session.query(ConversionJob).filter(ConversionJob.user_id == bulk, ConversionJob.status == "queued").count() == 3
+
+    metrics = queue_metrics(db_session)
+    assert metrics["classes"]["interactive"]["started"] >= 1 and metrics["classes"]["interactive"]["wait_max_ms"] is not None
+    assert metrics["classes"]["batch"]["queued"] == 3
+
+
+def test_revision_with_unchanged_elements_reuses_frag(db_session, create_user, monkeypatch):
+    import hashlib
+    import shutil
+
+    from app.conversion import converter, queue
+    from app.conversion.revisions import delete_revisions
+    from app.models.ifc_revision import IfcRevision
+    from tests.test_ifc import MODEL
+
+    objects = {}
+    runs = []
+
+    class RevisionStorage:
+        def download_object_to(self, object_name, fileobj):
+            fileobj.write(objects[object_name])
+            return len(objects[object_name])
+
+        def download_object(self, object_name):
+            return objects.get(object_name)
+
+        def upload_object(self, object_name, data, content_type, length=-1):
+            objects[object_name] = data.read()
+            return True
+
+        def store_blob(self, reader, content_type):
+            data = reader.read()
+            objects[f"blobs/{hashlib.sha256(data).hexdigest()}"] = data
+            return reader.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def delete_objects(self, names):
+            return [name for name in names if objects.pop(name, None) is None]
+
+    def convert(in_path, out_path):
+        runs.append(in_path)
+        shutil.copyfile(in_path, out_path)
+
+    monkeypatch.setattr(converter, "run_node_converter", convert)
+    monkeypatch.setattr(converter, "converter_version", lambda: "ifc2frag-test/fragments-rev")
+    storage = RevisionStorage()
+    user_id = _user_id(create_user, "revisions@test.com")
+    path = f"user_{user_id}/Tower.ifc"
+
+    objects[path] = MODEL
+    assert converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, user_id, "Tower.ifc"))["cache_hit"] is False
+
+    # Re-export: new timestamps and renumbered instances, same elements -> Node is skipped
+    objects[path] = MODEL.replace(b"1700000000", b"1800000000").replace(b"#10=", b"#110=").replace(b"(#10,", b"(#110,")
+    assert converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, user_id, "Tower.ifc"))["cache_hit"] is True
+    assert len(runs) == 1
+
+    # One wall edited -> converted again, and the diff is recorded
+    objects[path] = MODEL.replace(b"'W2'", b"'W2 moved'")
+    assert converter.convert_job(db_session, storage, queue.enqueue_conversion(db_session, user_id, "Tower.ifc"))["cache_hit"] is False
+    assert len(runs) == 2
+    revisions = db_session.query(IfcRevision).filter(IfcRevision.user_id == user_id).order_by(IfcRevision.id).all()
+    assert [(r.changed_count, r.added_count, r.removed_count) for r in revisions] == [(None, None, None), (0, 0, 0), (1, 0, 0)]
+    assert revisions[0].content_sha256 == revisions[1].content_sha256 != revisions[2].content_sha256
+    assert revisions[2].entity_count == 4
+
+    # Only the latest revision's manifest is kept; deleting the file's history drops it too
+    latest_manifest = revisions[2].manifest_path
+    assert [name for name in objects if name.startswith("manifests/")] == [latest_manifest]
+    assert delete_revisions(db_session, user_id, ["Tower.ifc"]) == sorted(r.manifest_path for r in revisions)
+    db_session.commit()
+    assert db_session.query(IfcRevision).filter(IfcRevision.user_id == user_id).count() == 0
+
+
+def test_worker_builds_element_index_for_search(client, db_session, create_user, monkeypatch):
+    import shutil
+
+    from app.conversion import converter, queue
+    from app.models.file import File as FileModel
+    from tests.test_ifc import BUILDING
+
+    class IndexStorage:
+        def download_object_to(self, object_name, fileobj):
+            fileobj.write(BUILDING)
+            return len(BUILDING)
+
+        def upload_user_file(self, user_id, filename, f, content_type, length=-1):
+            return True
+
+        def delete_objects(self, names):
+            return []
+
+    monkeypatch.setattr(converter, "cache_enabled", lambda: False)
+    monkeypatch.setattr(converter, "run_node_converter", lambda i, o: shutil.copyfile(i, o))
+    user_id = _user_id(create_user, "elements@test.com")
+    record = FileModel(user_id=user_id, filename="Block.ifc", original_filename="Block.ifc", file_size=len(BUILDING),
+                       storage_path=f"user_{user_id}/Block.ifc")
+    db_session.add(record)
+    db_session.commit()
+
+    csrf = client.get("/login").cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": "elements@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    auth = {"Authorization": f"Bearer {r.json().get('access_token')}"}
+    assert client.get(f"/api/files/{record.id}/elements", headers=auth).status_code == 409
+
+    converter.convert_job(db_session, IndexStorage(), queue.enqueue_conversion(db_session, user_id, "Block.ifc"))
+
+    r = client.get(f"/api/files/{record.id}/elements?type=IfcDoor&storey=Level 3&Pset_DoorCommon.FireRating=EI60", headers=auth)
+    assert r.status_code == 200
+    data = r.json()["data"]
+    assert data["total"] == 1 and data["elements"][0]["global_id"] == "0eeeeeeeeeeeeeeeeeeeee"
+    assert data["elements"][0]["properties"]["Qto_DoorBaseQuantities.Area"] == "1.89"
+    r = client.get(f"/api/files/{record.id}/elements?type=IfcDoor,IfcFurniture&*.IsExternal=false&limit=1", headers=auth)
+    assert r.json()["data"]["total"] == 2 and len(r.json()["data"]["elements"]) == 1
+    assert client.get("/api/files/999999/elements", headers=auth).status_code == 404
+
+
+def test_spatial_query_returns_global_ids_from_packed_rtree(client, db_session, create_user, monkeypatch):
+    import random
+    import shutil
+
+    from app.conversion import converter, queue
+    from app.models.file import File as FileModel
+    from app.services.spatial_index import PackedRTree
+    from tests.test_ifc import GEOMETRY
+
+    # The packed tree agrees with a linear scan
+    rng = random.Random(7)
+    boxes = []
+    for _ in range(500):
+        x, y, z = (rng.uniform(0, 50) for _ in range(3))
+        boxes.append((x, y, z, x + rng.uniform(0, 4), y + rng.uniform(0, 4), z + rng.uniform(0, 4)))
+    tree = PackedRTree(boxes)
+    query = (10, 10, 10, 20, 25, 30)
+    assert sorted(tree.intersecting(query)) == [
+        i for i, b in enumerate(boxes) if all(b[a] <= query[a + 3] and b[a + 3] >= query[a] for a in range(3))
+    ]
+
+    class GeometryStorage:
+        def download_object_to(self, object_name, fileobj):
+            fileobj.write(GEOMETRY)
+            return len(GEOMETRY)
+
+        def upload_user_file(self, user_id, filename, f, content_type, length=-1):
+            return True
+
+        def delete_objects(self, names):
+            return []
+
+    monkeypatch.setattr(converter, "cache_enabled", lambda: False)
+    monkeypatch.setattr(converter, "run_node_converter", lambda i, o: shutil.copyfile(i, o))
+    user_id = _user_id(create_user, "spatial@test.com")
+    record = FileModel(user_id=user_id, filename="Site.ifc", original_filename="Site.ifc", file_size=len(GEOMETRY),
+                       storage_path=f"user_{user_id}/Site.ifc")
+    db_session.add(record)
+    db_session.commit()
+    converter.convert_job(db_session, GeometryStorage(), queue.enqueue_conversion(db_session, user_id, "Site.ifc"))
+
+    csrf = client.get("/login").cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": "spatial@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    auth = {"Authorization": f"Bearer {r.json().get('access_token')}"}
+    url = f"/api/files/{record.id}/spatial"
+    r = client.get(f"{url}?bbox=0,0,2.5,2,2,3.5", headers=auth)
+    assert r.status_code == 200 and r.json()["data"]["global_ids"] == ["0eeeeeeeeeeeeeeeeeeeee", "0hhhhhhhhhhhhhhhhhhhhh"]
+    assert client.get(f"{url}?bbox=0,0,2.5,2,2,3.5&type=IfcWall", headers=auth).json()["data"]["global_ids"] == ["0eeeeeeeeeeeeeeeeeeeee"]
+    r = client.get(f"{url}?point=12,0.5,0.5&radius=2", headers=auth)
+    assert r.json()["data"] == {"count": 1, "global_ids": ["0ggggggggggggggggggggg"]}
+    assert client.get(f"{url}?point=12,0.5", headers=auth).status_code == 400
+    assert client.get(f"{url}?bbox=1,1,1,0,0,0", headers=auth).status_code == 400
+    assert client.get(url, headers=auth).status_code == 400
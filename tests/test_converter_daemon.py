@@ -0,0 +1,66 @@
+import shutil
+
+import pytest
+
+from app.conversion.daemon import DaemonPool
+from app.conversion.errors import ConversionError
+
+pytestmark = pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+
+
+def test_daemon_pool_reuses_and_recycles_processes(tmp_path):
+    pool = DaemonPool(size=1, max_jobs=2, max_rss_mb=0, idle_check_sec=0)
+    try:
+        pids = []
+        for n in range(3):
+            src = tmp_path / f"m{n}.ifc"
+            src.write_bytes(b"ISO-10303-21;")
+            with pool.acquire() as daemon:
+                result = daemon.convert(str(src), str(tmp_path / f"m{n}.frag"))
+                pids.append(daemon.pid)
+            assert result["ok"] and (tmp_path / f"m{n}.frag").exists()
+
+        # Two jobs per daemon, then a fresh process
+        assert pids[0] == pids[1] != pids[2]
+        assert pool.started == 2 and pool.recycled == 1
+
+        # A failed job is reported but the daemon stays warm
+        with pytest.raises(ConversionError, match="INPUT_NOT_FOUND"):
+            pool.convert(str(tmp_path / "missing.ifc"), str(tmp_path / "missing.frag"))
+        health = pool.health_check()
+        assert health["idle"] == 1 and health["daemons"][0]["pid"] == pids[2]
+
+        # A dead daemon is replaced on the next job
+        with pool.acquire() as daemon:
+            daemon.kill()
+        assert pool.convert(str(tmp_path / "m0.ifc"), str(tmp_path / "again.frag"))["ok"]
+        assert pool.started == 3
+    finally:
+        pool.close()
+
+
+def test_daemon_health_checks_run_on_schedule(monkeypatch):
+    import time
+    from app.conversion import daemon
+
+    checks = []
+
+    class FakePool:
+        def health_check(self):
+            checks.append(time.monotonic())
+            return {"idle": 0, "dropped": 0}
+
+        def close(self):
+            checks.append("closed")
+
+    monkeypatch.setattr(daemon, "_pool", FakePool())
+    stop = daemon.start_daemon_health_checks(interval=0.02)
+    try:
+        deadline = time.monotonic() + 2
+        while len(checks) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        stop.set()
+    assert len(checks) >= 2
+    daemon.close_daemon_pool()
+    assert checks[-1] == "closed" and daemon._pool is None
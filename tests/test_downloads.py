@@ -0,0 +1,212 @@
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from app.storage.service import get_storage_service
+
+
+class _FakeObject:
+    def __init__(self, data: bytes):
+        self._buf = io.BytesIO(data)
+
+    def stream(self, amt):
+        while True:
+            chunk = self._buf.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class _FakeStat:
+    def __init__(self, data: bytes):
+        self.size = len(data)
+        self.etag = "abc123"
+        self.last_modified = datetime(2025, 9, 25, 12, 0, 0, tzinfo=timezone.utc)
+        self.content_type = "application/octet-stream"
+
+
+def _mock_storage(files):
+    class MockStorage:
+        def get_user_usage(self, user_id: int) -> int:
+            return 0
+
+        def stat_object(self, object_name, use_cache=False):
+            data = files.get(object_name.rsplit("/", 1)[-1])
+            return _FakeStat(data) if data is not None else None
+
+        def open_object(self, object_name, offset=0, length=0):
+            data = files[object_name.rsplit("/", 1)[-1]]
+            end = offset + length if length else len(data)
+            return _FakeObject(data[offset:end])
+
+    return MockStorage
+
+
+def _login(client, create_user, email):
+    create_user(email, "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": email, "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    return r.json().get("access_token")
+
+
+def test_parse_range_variants():
+    from fastapi import HTTPException
+    from app.api.downloads import parse_range
+
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=50-500", 100) == (50, 99)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(HTTPException) as exc:
+        parse_range("bytes=100-", 100)
+    assert exc.value.status_code == 416
+
+
+def test_download_full_and_partial(client, monkeypatch, create_user):
+    import main as app_main
+
+    data = b"0123456789" * 10
+    app_main.app.dependency_overrides[get_storage_service] = _mock_storage({"Model.ifc": data})
+    token = _login(client, create_user, "dl@test.com")
+    auth = {"Authorization": f"Bearer {token}"}
+
+    r = client.get("/files/download/Model.ifc", headers=auth)
+    assert r.status_code == 200
+    assert r.content == data
+    assert r.headers["accept-ranges"] == "bytes"
+    assert r.headers["etag"] == '"abc123"'
+
+    r = client.get("/files/download/Model.ifc", headers={**auth, "Range": "bytes=10-19"})
+    assert r.status_code == 206
+    assert r.content == data[10:20]
+    assert r.headers["content-range"] == "bytes 10-19/100"
+
+    # Stale If-Range falls back to the full body
+    r = client.get("/files/view/Model.ifc", headers={**auth, "Range": "bytes=10-19", "If-Range": '"other"'})
+    assert r.status_code == 200
+    assert r.content == data
+
+    r = client.get(f"/api/files/download/Model.ifc?token={token}", headers={"Range": "bytes=-5"})
+    assert r.status_code == 206
+    assert r.content == data[-5:]
+
+    r = client.get("/files/download/Missing.ifc", headers=auth)
+    assert r.status_code == 404
+
+
+
+def test_token_download_closes_session_before_streaming(client, db_session, monkeypatch, create_user):
+    import main as app_main
+
+    data = b"0123456789" * 10
+    events = []
+    base = _mock_storage({"Model.ifc": data})
+
+    class RecordingStorage(base):
+        def open_object(self, object_name, offset=0, length=0):
+            events.append("open")
+            return super().open_object(object_name, offset, length)
+
+    app_main.app.dependency_overrides[get_storage_service] = RecordingStorage
+    token = _login(client, create_user, "dlclose@test.com")
+    close = db_session.close
+
+    def recording_close():
+        events.append("close")
+        close()
+
+    monkeypatch.setattr(db_session, "close", recording_close)
+    r = client.get(f"/api/files/download/Model.ifc?token={token}")
+    assert r.status_code == 200
+    assert r.content == data
+    assert events == ["close", "open"]
+
+def test_head_served_from_metadata_cache(client, monkeypatch, create_user):
+    import main as app_main
+    from app.storage import service as storage_service
+
+    calls = {"stat": 0, "get": 0}
+
+    class FakeMinio:
+        def stat_file(self, object_name):
+            calls["stat"] += 1
+            return _FakeStat(b"x" * 42)
+
+        def open_file(self, *args, **kwargs):
+            calls["get"] += 1
+            raise AssertionError("HEAD must not read object data")
+
+    storage_service.file_meta_cache.clear()
+    app_main.app.dependency_overrides[get_storage_service] = lambda: storage_service.StorageService(FakeMinio())
+    token = _login(client, create_user, "head@test.com")
+    auth = {"Authorization": f"Bearer {token}"}
+
+    # Only the first HEAD looks up the files row and decodes the token
+    from app.api import downloads
+    from app.auth import auth as auth_module
+    resolve, decode = downloads.resolve_object_name, auth_module.jwt.decode
+
+    def counting_resolve(*args):
+        calls["resolve"] += 1
+        return resolve(*args)
+
+    def counting_decode(*args, **kwargs):
+        calls["decode"] += 1
+        return decode(*args, **kwargs)
+
+    calls.update(resolve=0, decode=0)
+    monkeypatch.setattr(downloads, "resolve_object_name", counting_resolve)
+    monkeypatch.setattr(auth_module.jwt, "decode", counting_decode)
+
+    for _ in range(3):
+        r = client.head("/files/download/Model.ifc", headers=auth)
+        assert r.status_code == 200
+        assert r.headers["content-length"] == "42"
+        assert r.headers["etag"] == '"abc123"'
+        assert r.headers["accept-ranges"] == "bytes"
+        assert "last-modified" in r.headers
+    r = client.head(f"/api/files/download/Model.ifc?token={token}")
+    assert r.status_code == 200
+    assert calls == {"stat": 1, "get": 0, "resolve": 1, "decode": 1}
+
+    # Replacing or deleting the file drops its cached object name
+    from app.api.uploads import invalidate_file_list
+    invalidate_file_list(int(auth_module.AuthService.verify_token(token)["sub"]), ["Model.ifc"])
+    assert client.head("/files/download/Model.ifc", headers=auth).status_code == 200
+    assert calls["resolve"] == 2
+
+
+def test_conditional_get_returns_304_without_reading_data(client, monkeypatch, create_user):
+    import main as app_main
+
+    data = b"FRAGDATA"
+    storage_cls = _mock_storage({"Model.frag": data, "Model.ifc": data})
+
+    def _no_open(self, *args, **kwargs):
+        raise AssertionError("304 must not open object data")
+
+    monkeypatch.setattr(storage_cls, "open_object", _no_open)
+    app_main.app.dependency_overrides[get_storage_service] = storage_cls
+    token = _login(client, create_user, "cond@test.com")
+
+    r = client.get(f"/api/files/download/Model.frag?token={token}", headers={"If-None-Match": 'W/"abc123", "zzz"'})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == '"abc123"'
+    assert r.headers["cache-control"] == app_main.settings.FILE_CACHE_CONTROL["frag"]
+
+    r = client.get(
+        "/files/view/Model.ifc",
+        headers={"Authorization": f"Bearer {token}", "If-Modified-Since": "Thu, 25 Sep 2025 12:00:00 GMT"},
+    )
+    assert r.status_code == 304
+    assert r.headers["cache-control"] == app_main.settings.FILE_CACHE_CONTROL["ifc"]
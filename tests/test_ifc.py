@@ -0,0 +1,198 @@
+import io
+
+from app.ifc.elements import extract_elements
+from app.ifc.manifest import build_manifest, diff_manifests, manifest_digest
+from app.ifc.metadata import IfcMetadataScanner, scan_ifc_metadata
+from app.ifc.step import Enum, Ref, Typed, iter_step, parse_args
+
+MODEL = b"""ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');
+FILE_NAME('tower.ifc','2024-01-01T00:00:00',('Arch'),('Org'),'IfcOpenShell','Revit 2024','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+/* exported ; with ' quote */
+DATA;
+#1=IFCOWNERHISTORY($,$,$,.ADDED.,$,$,$,1700000000);
+#5=IFCPROJECT('0YvctVUKr0kugbFTf53O9L',#1,'It''s \\X2\\041F0440\\X0\\',$,$,$,$,$,$);
+#10=IFCCARTESIANPOINT((0.,1.5,-2.E-3));
+#11=IFCAXIS2PLACEMENT3D(#10,$,$);
+#12=IFCLOCALPLACEMENT($,#11);
+#20=IFCWALL('1YvctVUKr0kugbFTf53O9L',#1,'W;1',$,$,#12,$,$,.STANDARD.);
+#21=IFCWALL('2YvctVUKr0kugbFTf53O9L',#1,'W2',$,$,#12,$,$,.STANDARD.);
+#22=IFCPROPERTYSINGLEVALUE('FireRating',$,IFCLABEL('EI60'),$);
+#30=IFCRELAGGREGATES('3YvctVUKr0kugbFTf53O9L',#1,$,$,#5,(#20,#21));
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+BUILDING = b"""ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION((''),'2;1');
+FILE_NAME('b.ifc','',(''),(''),'','','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCOWNERHISTORY($,$,$,.ADDED.,$,$,$,1700000000);
+#2=IFCPROJECT('0aaaaaaaaaaaaaaaaaaaaa',#1,'P',$,$,$,$,$,$);
+#3=IFCBUILDING('0bbbbbbbbbbbbbbbbbbbbb',#1,'B',$,$,$,$,$,.ELEMENT.,$,$,$);
+#4=IFCBUILDINGSTOREY('0ccccccccccccccccccccc',#1,'Level 3',$,$,$,$,$,.ELEMENT.,6.);
+#5=IFCSPACE('0ddddddddddddddddddddd',#1,'Room',$,$,$,$,$,.ELEMENT.,.INTERNAL.,$);
+#6=IFCDOOR('0eeeeeeeeeeeeeeeeeeeee',#1,'D1',$,$,$,$,$,2.1,0.9,$,$,$);
+#7=IFCDOOR('0fffffffffffffffffffff',#1,'D2',$,$,$,$,$,2.1,0.9,$,$,$);
+#8=IFCFURNITURE('0ggggggggggggggggggggg',#1,'Desk',$,$,$,$,$,$);
+#9=IFCDOORTYPE('0hhhhhhhhhhhhhhhhhhhhh',#1,'DT',$,$,(#20),$,$,$,.DOOR.,.SINGLE_SWING_LEFT.,$,$);
+#10=IFCRELAGGREGATES('1aaaaaaaaaaaaaaaaaaaaa',#1,$,$,#2,(#3));
+#11=IFCRELAGGREGATES('1bbbbbbbbbbbbbbbbbbbbb',#1,$,$,#3,(#4));
+#12=IFCRELAGGREGATES('1ccccccccccccccccccccc',#1,$,$,#4,(#5));
+#13=IFCRELCONTAINEDINSPATIALSTRUCTURE('1ddddddddddddddddddddd',#1,$,$,(#6,#7),#4);
+#14=IFCRELCONTAINEDINSPATIALSTRUCTURE('1eeeeeeeeeeeeeeeeeeeee',#1,$,$,(#8),#5);
+#15=IFCRELDEFINESBYTYPE('1fffffffffffffffffffff',#1,$,$,(#6,#7),#9);
+#16=IFCRELDEFINESBYPROPERTIES('1ggggggggggggggggggggg',#1,$,$,(#6),#21);
+#17=IFCRELDEFINESBYPROPERTIES('1hhhhhhhhhhhhhhhhhhhhh',#1,$,$,(#6),#25);
+#20=IFCPROPERTYSET('2aaaaaaaaaaaaaaaaaaaaa',#1,'Pset_DoorCommon',$,(#22,#23));
+#21=IFCPROPERTYSET('2bbbbbbbbbbbbbbbbbbbbb',#1,'Pset_DoorCommon',$,(#24));
+#22=IFCPROPERTYSINGLEVALUE('FireRating',$,IFCLABEL('EI30'),$);
+#23=IFCPROPERTYSINGLEVALUE('IsExternal',$,IFCBOOLEAN(.F.),$);
+#24=IFCPROPERTYSINGLEVALUE('FireRating',$,IFCLABEL('EI60'),$);
+#25=IFCELEMENTQUANTITY('2ccccccccccccccccccccc',#1,'Qto_DoorBaseQuantities',$,$,(#26));
+#26=IFCQUANTITYAREA('Area',$,$,1.89,$);
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+# Millimetre model: a rotated extruded wall on a raised storey, a scaled mapped face set and a brep slab
+GEOMETRY = b"""ISO-10303-21;
+HEADER;
+FILE_DESCRIPTION((''),'2;1');
+FILE_NAME('g.ifc','',(''),(''),'','','');
+FILE_SCHEMA(('IFC4'));
+ENDSEC;
+DATA;
+#1=IFCSIUNIT(*,.LENGTHUNIT.,.MILLI.,.METRE.);
+#2=IFCUNITASSIGNMENT((#1));
+#3=IFCPROJECT('0aaaaaaaaaaaaaaaaaaaaa',$,'P',$,$,$,$,$,#2);
+#10=IFCCARTESIANPOINT((0.,0.,3000.));
+#11=IFCAXIS2PLACEMENT3D(#10,$,$);
+#12=IFCLOCALPLACEMENT($,#11);
+#13=IFCBUILDINGSTOREY('0ccccccccccccccccccccc',$,'L1',$,$,#12,$,$,.ELEMENT.,3000.);
+#20=IFCCARTESIANPOINT((1000.,0.,0.));
+#21=IFCDIRECTION((0.,1.,0.));
+#22=IFCAXIS2PLACEMENT3D(#20,$,#21);
+#23=IFCLOCALPLACEMENT(#12,#22);
+#24=IFCCARTESIANPOINT((2000.,0.));
+#25=IFCAXIS2PLACEMENT2D(#24,$);
+#26=IFCRECTANGLEPROFILEDEF(.AREA.,$,#25,4000.,200.);
+#27=IFCDIRECTION((0.,0.,1.));
+#28=IFCEXTRUDEDAREASOLID(#26,$,#27,3000.);
+#29=IFCSHAPEREPRESENTATION($,'Body','SweptSolid',(#28));
+#30=IFCPRODUCTDEFINITIONSHAPE($,$,(#29));
+#31=IFCWALL('0eeeeeeeeeeeeeeeeeeeee',$,'Wall',$,$,#23,#30,$,$);
+#40=IFCCARTESIANPOINTLIST3D(((0.,0.,0.),(500.,0.,0.),(0.,500.,500.)));
+#41=IFCTRIANGULATEDFACESET(#40,$,$,((1,2,3)),$);
+#42=IFCSHAPEREPRESENTATION($,'Body','Tessellation',(#41));
+#43=IFCCARTESIANPOINT((0.,0.,0.));
+#44=IFCAXIS2PLACEMENT3D(#43,$,$);
+#45=IFCREPRESENTATIONMAP(#44,#42);
+#46=IFCCARTESIANPOINT((10000.,0.,0.));
+#47=IFCCARTESIANTRANSFORMATIONOPERATOR3D($,$,#46,2.,$);
+#48=IFCMAPPEDITEM(#45,#47);
+#49=IFCSHAPEREPRESENTATION($,'Body','MappedRepresentation',(#48));
+#50=IFCPRODUCTDEFINITIONSHAPE($,$,(#49));
+#51=IFCLOCALPLACEMENT($,#44);
+#52=IFCFURNITURE('0ggggggggggggggggggggg',$,'Chair',$,$,#51,#50,$,$);
+#60=IFCCARTESIANPOINT((0.,0.,-200.));
+#61=IFCCARTESIANPOINT((5000.,0.,-200.));
+#62=IFCCARTESIANPOINT((5000.,8000.,0.));
+#63=IFCPOLYLOOP((#60,#61,#62));
+#64=IFCFACEOUTERBOUND(#63,.T.);
+#65=IFCFACE((#64));
+#66=IFCCLOSEDSHELL((#65));
+#67=IFCFACETEDBREP(#66);
+#68=IFCSHAPEREPRESENTATION($,'Axis','Curve2D',(#28));
+#69=IFCSHAPEREPRESENTATION($,'Body','Brep',(#67));
+#70=IFCPRODUCTDEFINITIONSHAPE($,$,(#68,#69));
+#71=IFCSLAB('0hhhhhhhhhhhhhhhhhhhhh',$,'Slab',$,$,#12,#70,$,.FLOOR.);
+ENDSEC;
+END-ISO-10303-21;
+"""
+
+
+def test_step_reader_streams_statements_across_chunk_boundaries():
+    expected = list(iter_step(io.BytesIO(MODEL)))
+    assert [e.type for e in expected[:3]] == ["FILE_DESCRIPTION", "FILE_NAME", "FILE_SCHEMA"]
+    assert [(e.id, e.type) for e in expected if e.section == "DATA"][:2] == [(1, "IFCOWNERHISTORY"), (5, "IFCPROJECT")]
+    # Strings, comments and escapes split at any chunk size give the same result
+    for chunk_size in (1, 2, 3, 7, 64):
+        assert list(iter_step(io.BytesIO(MODEL), chunk_size)) == expected
+
+    by_id = {e.id: e for e in expected if e.section == "DATA"}
+    assert parse_args(by_id[5].args)[:3] == ["0YvctVUKr0kugbFTf53O9L", Ref(1), "It's Пр"]
+    assert parse_args(by_id[20].args)[2] == "W;1" and parse_args(by_id[20].args)[-1] == Enum("STANDARD")
+    assert parse_args(by_id[22].args)[2] == Typed("IFCLABEL", ["EI60"])
+    assert parse_args(by_id[10].args) == [[0.0, 1.5, -0.002]]
+
+
+def test_manifest_ignores_renumbering_and_timestamps_but_sees_element_edits():
+    base = build_manifest(io.BytesIO(MODEL))
+    assert set(base) == {"0YvctVUKr0kugbFTf53O9L", "1YvctVUKr0kugbFTf53O9L", "2YvctVUKr0kugbFTf53O9L", "3YvctVUKr0kugbFTf53O9L"}
+
+    reexport = (MODEL.replace(b"#10=", b"#110=").replace(b"(#10,", b"(#110,")
+                .replace(b"1700000000", b"1800000000").replace(b"2024-01-01T00:00:00", b"2025-02-02T00:00:00"))
+    assert manifest_digest(build_manifest(io.BytesIO(reexport))) == manifest_digest(base)
+
+    # Moving the shared placement changes both walls; renaming one changes only that wall
+    moved = build_manifest(io.BytesIO(MODEL.replace(b"(0.,1.5,", b"(9.,1.5,")))
+    assert sorted(diff_manifests(base, moved).changed) == ["1YvctVUKr0kugbFTf53O9L", "2YvctVUKr0kugbFTf53O9L"]
+    renamed = MODEL.replace(b"'W2'", b"'W2b'").replace(b"#21=", b"#40=").replace(b",#21)", b",#40)")
+    diff = diff_manifests(base, build_manifest(io.BytesIO(renamed)))
+    assert diff.changed == ["2YvctVUKr0kugbFTf53O9L"] and diff.added == [] and diff.removed == [] and diff.unchanged == 3
+
+
+def test_metadata_scanner_collects_header_project_storeys_and_histogram():
+    model = MODEL.replace(b"#30=", b"#31=IFCBUILDINGSTOREY('4YvctVUKr0kugbFTf53O9L',#1,'Level 2',$,$,#12,$,$,.ELEMENT.,3.5);\n"
+                                      b"#32=IFCBUILDINGSTOREY('5YvctVUKr0kugbFTf53O9L',#1,'Level 1',$,$,#12,$,$,.ELEMENT.,0.);\n#30=")
+    meta = scan_ifc_metadata(io.BytesIO(model))
+    assert meta["ifc_schema"] == "IFC4" and meta["view_definition"] == "CoordinationView"
+    assert (meta["file_name"], meta["author"], meta["authoring_tool"]) == ("tower.ifc", "Arch", "Revit 2024")
+    assert meta["project_name"] == "It's Пр"
+    assert [s["name"] for s in meta["storeys"]] == ["Level 1", "Level 2"]
+    assert meta["entity_histogram"]["IFCWALL"] == 2 and meta["entity_count"] == 11
+
+    # Fed in arbitrary pieces, as an upload stream delivers them
+    for size in (1, 5, 64):
+        scanner = IfcMetadataScanner()
+        for i in range(0, len(model), size):
+            scanner.feed(model[i:i + size])
+        scanner.feed(b"")
+        assert scanner.result() == meta
+
+    assert scan_ifc_metadata(io.BytesIO(b"<?xml version='1.0'?><ifcXML/>" * 100)) is None
+    assert scan_ifc_metadata(io.BytesIO(b"PK\x03\x04" + bytes(4096))) is None
+
+
+def test_element_records_resolve_storeys_and_flatten_property_sets():
+    records = {r.name: r for r in extract_elements(io.BytesIO(BUILDING))}
+    assert set(records) == {"P", "B", "Level 3", "Room", "D1", "D2", "Desk", "DT"}
+    # Contained directly, through a space, or not below any storey
+    assert (records["D1"].storey, records["D1"].storey_id) == ("Level 3", "0ccccccccccccccccccccc")
+    assert records["Desk"].storey == "Level 3" and records["Room"].storey == "Level 3"
+    assert records["B"].storey is None and records["D1"].ifc_class == "IFCDOOR"
+    # Type properties apply, the occurrence overrides them, quantities are included
+    assert sorted(records["D1"].properties) == [
+        ("Pset_DoorCommon", "FireRating", "EI60"), ("Pset_DoorCommon", "IsExternal", "false"), ("Qto_DoorBaseQuantities", "Area", "1.89"),
+    ]
+    assert sorted(records["D2"].properties) == [("Pset_DoorCommon", "FireRating", "EI30"), ("Pset_DoorCommon", "IsExternal", "false")]
+    assert list(extract_elements(io.BytesIO(b"<ifcXML/>"))) == []
+
+
+def test_element_bounds_follow_placements_units_and_mapped_items():
+    boxes = {r.name: r.bounds for r in extract_elements(io.BytesIO(GEOMETRY), bounds=True)}
+    # Wall turned 90 degrees about z on a storey at +3 m; 4 m long, 0.2 m thick, 3 m high
+    assert boxes["Wall"] == (0.9, 0.0, 3.0, 1.1, 4.0, 6.0)
+    # Mapped face set scaled 2x and moved 10 m along x
+    assert boxes["Chair"] == (10.0, 0.0, 0.0, 11.0, 1.0, 1.0)
+    # Body representation wins over the axis; brep bounded by its points
+    assert boxes["Slab"] == (0.0, 0.0, 2.8, 5.0, 8.0, 3.0)
+    assert boxes["P"] is None and boxes["L1"] is None
+    assert all(r.bounds is None for r in extract_elements(io.BytesIO(GEOMETRY)))
@@ -53,3 +53,51 @@ def test_admin_access_ok_for_admin(client, create_user):
     # admin endpoint requires admin user
     assert r_admin.status_code == 200
 
+
+
+def test_user_resolved_once_per_request(client, create_user, monkeypatch):
+    from app.auth.auth import AuthService
+    u = create_user("once@test.com", "secret123", admin=True)
+    token = AuthService.create_access_token(data={"sub": str(u.id)}, expires_delta=timedelta(minutes=5))
+
+    calls = []
+    original = AuthService.get_user_by_id
+
+    def counting(db, user_id):
+        calls.append(user_id)
+        return original(db, user_id)
+
+    monkeypatch.setattr(AuthService, "get_user_by_id", staticmethod(counting))
+    r = client.get("/api/admin/users", headers={"Authorization": f"Bearer {token}"})
+    assert r.status_code == 200
+    # admin dependency chain + request logging middleware share one lookup
+    assert calls == [u.id]
+
+
+def test_user_snapshot_invalidated_on_toggle(client, create_user):
+    from app.auth.auth import AuthService, UserSnapshot
+    admin = create_user("toggler@test.com", "secret123", admin=True)
+    user = create_user("toggled@test.com", "secret123")
+    admin_headers = {"Authorization": f"Bearer {AuthService.create_access_token(data={'sub': str(admin.id)})}"}
+    user_headers = {"Authorization": f"Bearer {AuthService.create_access_token(data={'sub': str(user.id)})}"}
+
+    assert client.get("/users/me", headers=user_headers).status_code == 200
+    snapshot = AuthService.get_user_by_id(None, user.id)  # served from the in-process cache
+    assert isinstance(snapshot, UserSnapshot) and snapshot.is_active
+
+    r = client.post(f"/api/admin/users/{user.id}/toggle", json={"active": False}, headers=admin_headers)
+    assert r.status_code == 200
+    assert client.get("/users/me", headers=user_headers).status_code == 400
+
+
+def test_auth_me_reports_current_used_storage(client, create_user, db_session):
+    from app.auth.auth import AuthService
+    from app.models.user import User
+    user = create_user("usage@test.com", "secret123")
+    headers = {"Authorization": f"Bearer {AuthService.create_access_token(data={'sub': str(user.id)})}"}
+    assert client.get("/auth/me", headers=headers).json()["used_storage"] == 0
+
+    # Storage accounting updates the row without invalidating cached snapshots
+    db_session.query(User).filter(User.id == user.id).update({User.used_storage: 1234})
+    db_session.commit()
+    assert client.get("/auth/me", headers=headers).json()["used_storage"] == 1234
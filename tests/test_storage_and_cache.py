@@ -1,6 +1,8 @@
 import io
 import types
 
+from app.storage.service import get_storage_service
+
 
 def test_storage_upload_and_list_with_minio_mock(client, db_session, monkeypatch, create_user):
     # Mock StorageService to avoid real MinIO
@@ -12,10 +14,21 @@ def test_storage_upload_and_list_with_minio_mock(client, db_session, monkeypatch
         def get_user_usage(self, user_id: int) -> int:
             return sum(len(v) for k, v in files_store.get(user_id, {}).items())
 
-        def upload_user_file(self, user_id: int, filename: str, file_stream: io.BytesIO, content_type: str) -> bool:
-            files_store.setdefault(user_id, {})[filename] = file_stream.getvalue()
+        def upload_user_file(self, user_id: int, filename: str, file_stream, content_type: str, length: int = -1) -> bool:
+            files_store.setdefault(user_id, {})[filename] = file_stream.read()
+            return True
+
+        def store_blob(self, file_stream, content_type: str) -> str:
+            data = file_stream.read()
+            files_store.setdefault("blobs", {})[file_stream.hexdigest()] = data
+            return file_stream.hexdigest()
+
+        def settle_blobs(self):
             return True
 
+        def drop_staged_blobs(self):
+            pass
+
         def download_user_file(self, user_id: int, filename: str) -> bytes | None:
             return files_store.get(user_id, {}).get(filename)
 
@@ -25,7 +38,7 @@ def test_storage_upload_and_list_with_minio_mock(client, db_session, monkeypatch
                 return True
             return False
 
-    monkeypatch.setattr(app_main, "StorageService", MockStorage)
+    app_main.app.dependency_overrides[get_storage_service] = MockStorage
 
     u = create_user("stor@test.com", "secret123", admin=False)
     # login
@@ -46,6 +59,58 @@ def test_storage_upload_and_list_with_minio_mock(client, db_session, monkeypatch
     assert any(f.get("name") == "Sample.ifc" for f in r_list.json().get("data", []))
 
 
+def test_upload_rejects_file_over_size_limit(client, monkeypatch, create_user):
+    import main as app_main
+    from app.storage.streams import LimitedReader
+
+    uploaded = {}
+
+    class MockStorage:
+        def get_user_usage(self, user_id: int) -> int:
+            return 0
+
+        def upload_user_file(self, user_id: int, filename: str, file_stream, content_type: str, length: int = -1) -> bool:
+            # Drain in small parts like the SDK does; the reader must stop us mid-stream
+            while file_stream.read(4):
+                pass
+            uploaded[filename] = True
+            return True
+
+        def store_blob(self, file_stream, content_type: str) -> str:
+            while file_stream.read(4):
+                pass
+            uploaded["blob"] = True
+            return file_stream.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+    app_main.app.dependency_overrides[get_storage_service] = MockStorage
+    monkeypatch.setattr(app_main.settings, "MAX_UPLOAD_MB", 0)
+
+    create_user("big@test.com", "secret123", admin=False)
+    r_get = client.get("/login")
+    csrf = r_get.cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": "big@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    token = r.json().get("access_token")
+
+    files = {"file": ("Big.ifc", io.BytesIO(b"IFCDATA" * 10), "application/octet-stream")}
+    r_up = client.post("/files/upload", headers={"Authorization": f"Bearer {token}"}, files=files)
+    assert r_up.status_code == 413
+    assert not uploaded
+
+    reader = LimitedReader(io.BytesIO(b"abcdef"), 4)
+    assert reader.read(4) == b"abcd"
+    try:
+        reader.read(4)
+        assert False, "limit not enforced"
+    except Exception as e:
+        assert getattr(e, "reason", None) == "size"
+
+
 def test_cache_health_with_redis_mock(client, monkeypatch):
     # Mock redis client methods in cache layer if invoked by health check service
     from app.services import health_check as hc
@@ -68,3 +133,694 @@ def test_cache_health_with_redis_mock(client, monkeypatch):
     data = r.json()
     assert data.get("overall_status") == "ok"
 
+
+
+def test_minio_client_is_shared(monkeypatch):
+    from app.storage import minio_client as mc
+
+    created = []
+
+    class FakeClient:
+        def __init__(self, http_client=None):
+            created.append(http_client)
+
+    monkeypatch.setattr(mc, "MinIOClient", FakeClient)
+    monkeypatch.setattr(mc, "_shared_client", None)
+    assert mc.get_minio_client() is mc.get_minio_client()
+    assert len(created) == 1
+    assert created[0].connection_pool_kw["maxsize"] == mc.settings.MINIO_POOL_MAXSIZE
+
+
+def test_async_storage_offloads_blocking_calls():
+    import asyncio
+    import threading
+    from app.storage.service import AsyncStorageService
+
+    class BlockingStorage:
+        def get_user_usage(self, user_id: int) -> int:
+            return threading.get_ident()
+
+    async def run():
+        return await AsyncStorageService(BlockingStorage()).get_user_usage(1)
+
+    assert asyncio.run(run()) != threading.get_ident()
+
+
+def test_used_storage_counter_tracks_uploads_and_deletes(client, db_session, create_user):
+    import main as app_main
+    from app.models.file import File as FileModel
+    from app.models.user import User
+
+    store = {}
+
+    class MockStorage:
+        def get_user_usage(self, user_id: int) -> int:
+            raise AssertionError("quota must not list the bucket")
+
+        def upload_user_file(self, user_id, filename, file_stream, content_type, length=-1):
+            store[filename] = file_stream.read()
+            return True
+
+        def store_blob(self, file_stream, content_type):
+            data = file_stream.read()
+            store[f"blobs/{file_stream.hexdigest()}"] = data
+            return file_stream.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def delete_object(self, object_name):
+            return store.pop(object_name, None) is not None
+
+        def delete_objects(self, object_names):
+            return [name for name in object_names if store.pop(name, None) is None]
+
+        def delete_user_file(self, user_id, filename):
+            return store.pop(filename, None) is not None
+
+    app_main.app.dependency_overrides[get_storage_service] = MockStorage
+    u = create_user("quota@test.com", "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    token = client.post("/auth/login", json={"email": "quota@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    def used():
+        db_session.expire_all()
+        return db_session.query(User).filter(User.id == u.id).first().used_storage
+
+    assert client.post("/files/upload", headers=auth, files={"file": ("A.ifc", io.BytesIO(b"x" * 10), "application/octet-stream")}).status_code == 200
+    assert client.post("/files/upload", headers=auth, files={"file": ("B.ifc", io.BytesIO(b"x" * 5), "application/octet-stream")}).status_code == 200
+    assert used() == 15
+    # Replacing a file adjusts by the size difference and keeps one record
+    assert client.post("/files/upload", headers=auth, files={"file": ("A.ifc", io.BytesIO(b"x" * 4), "application/octet-stream")}).status_code == 200
+    assert used() == 9
+    assert db_session.query(FileModel).filter(FileModel.user_id == u.id, FileModel.filename == "A.ifc").count() == 1
+
+    assert client.delete("/files/delete/B.ifc", headers=auth).status_code == 200
+    assert used() == 4
+    assert client.delete("/files/delete/B.ifc", headers=auth).status_code == 404
+
+    # Quota is enforced against the counter
+    db_session.query(User).filter(User.id == u.id).update({User.storage_quota: 6})
+    db_session.commit()
+    r = client.post("/files/upload", headers=auth, files={"file": ("C.ifc", io.BytesIO(b"x" * 3), "application/octet-stream")})
+    assert r.status_code == 413
+
+
+def test_reconcile_storage_usage_fixes_drift(db_session, create_user):
+    from app.models.file import File as FileModel
+    from app.models.user import User
+    from app.services.storage_accounting import reconcile_storage_usage
+
+    u = create_user("drift@test.com", "secret123")
+
+    class Listing:
+        def get_user_usage(self, user_id):
+            return 123 if user_id == u.id else 0
+
+    drift = reconcile_storage_usage(db_session, Listing())
+    assert {"user_id": u.id, "counter": 0, "actual": 123} in drift
+    db_session.refresh(u)
+    assert u.used_storage == 123
+
+
+    # An upload committed while the listing ran is kept: drift is applied as a delta
+    class SlowListing:
+        def get_user_usage(self, user_id):
+            if user_id == u.id:
+                db_session.execute(User.__table__.update().where(User.id == u.id).values(used_storage=User.used_storage + 50))
+                db_session.commit()
+                return 200
+            return 0
+
+    reconcile_storage_usage(db_session, SlowListing())
+    db_session.refresh(u)
+    assert u.used_storage == 250
+
+    # A deduplicated upload committed while an earlier user was listed is no drift either
+    other = create_user("drift-other@test.com", "secret123")
+    first, second = sorted([u.id, other.id])
+
+    class DedupListing:
+        def get_user_usage(self, user_id):
+            if user_id == first:
+                db_session.add(FileModel(user_id=second, filename="Shared.ifc", original_filename="Shared.ifc", file_size=70, content_type="application/octet-stream", blob_sha256="a" * 64, storage_path=f"blobs/{'a' * 64}"))
+                db_session.execute(User.__table__.update().where(User.id == second).values(used_storage=User.used_storage + 70))
+                db_session.commit()
+            return 250 if user_id == u.id else 0
+
+    drift = reconcile_storage_usage(db_session, DedupListing())
+    assert drift == []
+    db_session.expire_all()
+    assert db_session.get(User, u.id).used_storage == 250
+    assert db_session.get(User, other.id).used_storage == 70
+
+
+def test_quota_reservation_rejects_concurrent_overshoot(db_session, create_user):
+    import pytest
+    from fastapi import HTTPException
+    from app.api.uploads import StorageCleanup, UploadAllowance, stage_file_record
+    from app.models.user import User
+
+    u = create_user("reserve@test.com", "secret123")
+    u.storage_quota = 100
+    db_session.commit()
+    # Both uploads passed the check against the same snapshot
+    first = UploadAllowance(db_session, u.id, "a.ifc")
+    second = UploadAllowance(db_session, u.id, "b.ifc")
+    first.check(60)
+    second.check(60)
+
+    stage_file_record(db_session, u.id, "a.ifc", "a.ifc", "application/octet-stream", 60, None, first, StorageCleanup())
+    db_session.commit()
+    with pytest.raises(HTTPException) as exc:
+        stage_file_record(db_session, u.id, "b.ifc", "b.ifc", "application/octet-stream", 60, None, second, StorageCleanup())
+    assert exc.value.status_code == 413
+    db_session.rollback()
+    assert db_session.get(User, u.id).used_storage == 60
+
+
+def test_identical_uploads_share_one_blob(client, db_session, create_user):
+    import hashlib
+    import main as app_main
+    from app.models.blob import Blob
+    from app.models.file import File as FileModel
+    from app.storage.streams import HashingReader
+
+    objects = {}
+
+    class BlobStorage:
+        def store_blob(self, file_stream, content_type):
+            data = file_stream.read()
+            objects.setdefault(f"blobs/{file_stream.hexdigest()}", data)
+            return file_stream.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def delete_object(self, object_name):
+            return objects.pop(object_name, None) is not None
+
+        def delete_objects(self, object_names):
+            return [name for name in object_names if objects.pop(name, None) is None]
+
+        def delete_user_file(self, user_id, filename):
+            return False
+
+    app_main.app.dependency_overrides[get_storage_service] = BlobStorage
+    create_user("dedup@test.com", "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    token = client.post("/auth/login", json={"email": "dedup@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    payload = b"ISO-10303-21; dedup payload"
+    sha = hashlib.sha256(payload).hexdigest()
+    reader = HashingReader(io.BytesIO(payload))
+    assert reader.read() == payload and reader.hexdigest() == sha
+
+    for name in ("One.ifc", "Two.ifc"):
+        assert client.post("/files/upload", headers=auth, files={"file": (name, io.BytesIO(payload), "application/octet-stream")}).status_code == 200
+    assert list(objects) == [f"blobs/{sha}"]
+    blob = db_session.query(Blob).filter(Blob.sha256 == sha).first()
+    assert blob.ref_count == 2
+    assert {f.storage_path for f in db_session.query(FileModel).filter(FileModel.blob_sha256 == sha)} == {f"blobs/{sha}"}
+
+    # The shared object survives until its last reference is gone
+    assert client.delete("/files/delete/One.ifc", headers=auth).status_code == 200
+    db_session.expire_all()
+    assert db_session.query(Blob).filter(Blob.sha256 == sha).first().ref_count == 1
+    assert f"blobs/{sha}" in objects
+    assert client.delete("/files/delete/Two.ifc", headers=auth).status_code == 200
+    db_session.expire_all()
+    assert db_session.query(Blob).filter(Blob.sha256 == sha).first() is None
+    assert objects == {}
+
+
+def test_blob_purged_between_store_and_attach_is_restored(db_session, create_user):
+    from app.models.blob import Blob
+    from app.services.blob_store import attach_blob, purge_blobs, release_blobs
+    from app.storage.service import StorageService
+    from app.storage.streams import HashingReader
+
+    objects = {}
+
+    class FakeMinio:
+        def upload_file(self, object_name, data, content_type="application/octet-stream", length=-1):
+            objects[object_name] = data.read()
+            return True
+
+        def stat_file(self, object_name):
+            return types.SimpleNamespace(size=len(objects[object_name]), etag=None, last_modified=None, content_type=None) if object_name in objects else None
+
+        def copy_file(self, source_name, object_name):
+            objects[object_name] = objects[source_name]
+            return True
+
+        def delete_file(self, object_name):
+            return objects.pop(object_name, None) is not None
+
+        def delete_files(self, object_names):
+            return [name for name in object_names if objects.pop(name, None) is None]
+
+    payload = b"ISO-10303-21; raced blob"
+    storage = StorageService(FakeMinio())
+    sha = storage.store_blob(HashingReader(io.BytesIO(payload)), None)
+    attach_blob(db_session, sha, len(payload))
+    assert storage.settle_blobs() and list(objects) == [f"blobs/{sha}"]
+    db_session.commit()
+
+    # Last reference released; the row stays at ref_count 0 until purged
+    orphaned = release_blobs(db_session, [sha])
+    db_session.commit()
+    assert db_session.get(Blob, sha).ref_count == 0
+
+    # Another upload of the same content stages it, then the purge runs before its attach
+    sha = storage.store_blob(HashingReader(io.BytesIO(payload)), None)
+    assert purge_blobs(db_session, storage, orphaned) == [f"blobs/{sha}"]
+    assert f"blobs/{sha}" not in objects
+    attach_blob(db_session, sha, len(payload))
+    assert storage.settle_blobs()
+    db_session.commit()
+    assert objects == {f"blobs/{sha}": payload}
+
+    # Released again but re-attached before the purge: row and object are kept
+    orphaned = release_blobs(db_session, [sha])
+    db_session.commit()
+    attach_blob(db_session, sha, len(payload))
+    db_session.commit()
+    assert purge_blobs(db_session, storage, orphaned) == []
+    db_session.expire_all()
+    assert db_session.get(Blob, sha).ref_count == 1 and f"blobs/{sha}" in objects
+
+
+
+def test_failed_commit_on_overwrite_keeps_previous_blob(client, db_session, monkeypatch, create_user):
+    import hashlib
+    import main as app_main
+    from app.models.blob import Blob
+    from app.models.file import File as FileModel
+    from app.storage.service import StorageService
+
+    objects = {}
+
+    class FakeMinio:
+        def upload_file(self, object_name, data, content_type="application/octet-stream", length=-1):
+            objects[object_name] = data.read()
+            return True
+
+        def stat_file(self, object_name):
+            return types.SimpleNamespace(size=len(objects[object_name]), etag=None, last_modified=None, content_type=None) if object_name in objects else None
+
+        def copy_file(self, source_name, object_name):
+            objects[object_name] = objects[source_name]
+            return True
+
+        def delete_file(self, object_name):
+            return objects.pop(object_name, None) is not None
+
+        def delete_files(self, object_names):
+            return [name for name in object_names if objects.pop(name, None) is None]
+
+    minio = FakeMinio()
+    app_main.app.dependency_overrides[get_storage_service] = lambda: StorageService(minio)
+    create_user("overwrite@test.com", "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    token = client.post("/auth/login", json={"email": "overwrite@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    old, new = b"ISO-10303-21; old content", b"ISO-10303-21; new, longer content"
+    old_sha, new_sha = hashlib.sha256(old).hexdigest(), hashlib.sha256(new).hexdigest()
+    assert client.post("/files/upload", headers=auth, files={"file": ("One.ifc", io.BytesIO(old), "application/octet-stream")}).status_code == 200
+
+    # The blob object is written, then the commit of the overwrite fails
+    settle_blobs = StorageService.settle_blobs
+    commit = db_session.commit
+    failing = []
+
+    def settle_then_fail(self):
+        failing.append(True)
+        return settle_blobs(self)
+
+    def flaky_commit():
+        if failing:
+            failing.clear()
+            raise RuntimeError("commit failed")
+        commit()
+
+    monkeypatch.setattr(StorageService, "settle_blobs", settle_then_fail)
+    monkeypatch.setattr(db_session, "commit", flaky_commit)
+    r = client.post("/files/upload", headers=auth, files={"file": ("One.ifc", io.BytesIO(new), "application/octet-stream")})
+    assert r.status_code == 500
+
+    db_session.expire_all()
+    record = db_session.query(FileModel).filter(FileModel.filename == "One.ifc").one()
+    assert (record.blob_sha256, record.file_size) == (old_sha, len(old))
+    assert db_session.get(Blob, old_sha).ref_count == 1
+    assert db_session.get(Blob, new_sha) is None
+    assert objects == {f"blobs/{old_sha}": old}
+
+def test_batch_upload_and_delete(client, db_session, create_user):
+    import main as app_main
+    from app.models.file import File as FileModel
+    from app.models.user import User
+
+    objects = {}
+    calls = {"bulk_deletes": 0}
+
+    class BatchStorage:
+        def store_blob(self, file_stream, content_type):
+            data = file_stream.read()
+            objects.setdefault(f"blobs/{file_stream.hexdigest()}", data)
+            return file_stream.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def delete_objects(self, object_names):
+            calls["bulk_deletes"] += 1
+            return [name for name in object_names if objects.pop(name, None) is None]
+
+    app_main.app.dependency_overrides[get_storage_service] = BatchStorage
+    u = create_user("batch@test.com", "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    token = client.post("/auth/login", json={"email": "batch@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    files = [("files", (f"Part{i}.ifc", io.BytesIO(f"batch-{i}".encode()), "application/octet-stream")) for i in range(3)]
+    r = client.post("/api/files/upload", headers=auth, files=files)
+    assert r.status_code == 200
+    assert [f["filename"] for f in r.json()["data"]] == ["Part0.ifc", "Part1.ifc", "Part2.ifc"]
+    assert len(objects) == 3
+    db_session.expire_all()
+    assert db_session.query(User).filter(User.id == u.id).first().used_storage == 21
+
+    dup = [("files", ("Same.ifc", io.BytesIO(b"a"), "application/octet-stream")), ("files", ("Same.ifc", io.BytesIO(b"b"), "application/octet-stream"))]
+    assert client.post("/api/files/upload", headers=auth, files=dup).status_code == 400
+
+    r = client.request("DELETE", "/api/files", headers=auth, json={"filenames": ["Part0.ifc", "Part2.ifc", "Nope.ifc"]})
+    assert r.status_code == 200
+    assert r.json()["data"] == {"deleted": ["Part0.ifc", "Part2.ifc"], "missing": ["Nope.ifc"], "failed": []}
+    assert calls["bulk_deletes"] == 1
+    assert len(objects) == 1
+    db_session.expire_all()
+    assert [f.filename for f in db_session.query(FileModel).filter(FileModel.user_id == u.id)] == ["Part1.ifc"]
+    assert db_session.query(User).filter(User.id == u.id).first().used_storage == 7
+
+
+def test_batch_upload_stages_objects_and_stops_at_quota(client, db_session, create_user, monkeypatch):
+    import main as app_main
+    from app.models.user import User
+
+    objects = {}
+    read_bytes = []
+
+    class StagingStorage:
+        def stage_object(self, data, content_type):
+            chunks = []
+            while True:
+                chunk = data.read(4)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+                read_bytes.append(len(chunk))
+            name = f"staging/{len(objects)}-{len(read_bytes)}"
+            objects[name] = b"".join(chunks)
+            return name
+
+        def promote_staged(self, staging_name, object_name):
+            if object_name.endswith("/Broken.ifc"):
+                return False
+            objects[object_name] = objects.pop(staging_name)
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def backup_object(self, object_name):
+            if object_name not in objects:
+                return True, None
+            objects[f"backup/{object_name}"] = objects[object_name]
+            return True, f"backup/{object_name}"
+
+        def restore_object(self, object_name, backup_name):
+            if backup_name is None:
+                objects.pop(object_name, None)
+            else:
+                objects[object_name] = objects.pop(backup_name)
+            return True
+
+        def delete_objects(self, object_names):
+            return [name for name in object_names if objects.pop(name, None) is None]
+
+    monkeypatch.setattr(app_main.settings, "STORAGE_DEDUP_ENABLED", False)
+    app_main.app.dependency_overrides[get_storage_service] = StagingStorage
+    u = create_user("batchstage@test.com", "secret123", admin=False)
+    db_session.query(User).filter(User.id == u.id).update({User.storage_quota: 40})
+    db_session.commit()
+    csrf = client.get("/login").cookies.get("csrf_token")
+    token = client.post("/auth/login", json={"email": "batchstage@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    r = client.post("/api/files/upload", headers=auth, files=[("files", ("Keep.ifc", io.BytesIO(b"old"), "application/octet-stream"))])
+    assert r.status_code == 200
+    assert objects == {f"user_{u.id}/Keep.ifc": b"old"}
+
+    # Together the files pass the remaining quota: reading stops there, nothing is overwritten
+    read_bytes.clear()
+    files = [("files", ("Keep.ifc", io.BytesIO(b"n" * 200), "application/octet-stream")),
+             ("files", ("More.ifc", io.BytesIO(b"m" * 200), "application/octet-stream"))]
+    r = client.post("/api/files/upload", headers=auth, files=files)
+    assert r.status_code == 413
+    assert sum(read_bytes) <= 40 + 8
+    assert objects == {f"user_{u.id}/Keep.ifc": b"old"}
+    db_session.expire_all()
+    assert db_session.get(User, u.id).used_storage == 3
+
+    # A later file cannot be stored: the object already replaced is put back
+    files = [("files", ("Keep.ifc", io.BytesIO(b"new"), "application/octet-stream")),
+             ("files", ("Broken.ifc", io.BytesIO(b"x"), "application/octet-stream"))]
+    assert client.post("/api/files/upload", headers=auth, files=files).status_code == 500
+    assert objects == {f"user_{u.id}/Keep.ifc": b"old"}
+    db_session.expire_all()
+    assert db_session.get(User, u.id).used_storage == 3
+
+    # Single uploads are staged too; the replaced object's backup is dropped after the commit
+    r = client.post("/files/upload", headers=auth, files={"file": ("Keep.ifc", io.BytesIO(b"newer"), "application/octet-stream")})
+    assert r.status_code == 200
+    assert objects == {f"user_{u.id}/Keep.ifc": b"newer"}
+
+
+def test_upload_scans_ifc_metadata_for_listing_filters(client, db_session, create_user):
+    import main as app_main
+    from app.models.ifc_metadata import IfcMetadata
+    from tests.test_ifc import MODEL
+
+    class ScanStorage:
+        def store_blob(self, file_stream, content_type):
+            while file_stream.read(7):
+                pass
+            return file_stream.hexdigest()
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+    app_main.app.dependency_overrides[get_storage_service] = ScanStorage
+    create_user("scan@test.com", "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    token = client.post("/auth/login", json={"email": "scan@test.com", "password": "secret123"}, headers={"X-CSRF-Token": csrf}).json()["access_token"]
+    auth = {"Authorization": f"Bearer {token}"}
+
+    assert client.post("/files/upload", headers=auth, files={"file": ("Tower.ifc", io.BytesIO(MODEL), "application/octet-stream")}).status_code == 200
+    ifc2x3 = MODEL.replace(b"'IFC4'", b"'IFC2X3'").replace(b"'It''s", b"'Annex")
+    files = [("files", ("Annex.ifc", io.BytesIO(ifc2x3), "application/octet-stream")),
+             ("files", ("Annex.ifcxml", io.BytesIO(b"<ifcXML/>"), "application/xml"))]
+    assert client.post("/api/files/upload", headers=auth, files=files).status_code == 200
+
+    listing = {f["name"]: f for f in client.get("/api/files", headers=auth).json()["data"]}
+    assert listing["Tower.ifc"]["ifc"]["schema"] == "IFC4" and listing["Tower.ifc"]["ifc"]["entity_count"] == 9
+    assert listing["Annex.ifc"]["ifc"]["authoring_tool"] == "Revit 2024"
+    assert listing["Annex.ifcxml"]["ifc"] is None
+    assert [f["name"] for f in client.get("/api/files?schema=ifc2x3", headers=auth).json()["data"]] == ["Annex.ifc"]
+    assert [f["name"] for f in client.get("/api/files?project=annex", headers=auth).json()["data"]] == ["Annex.ifc"]
+
+    r = client.get(f"/api/files/{listing['Tower.ifc']['id']}/metadata", headers=auth)
+    assert r.status_code == 200 and r.json()["data"]["entity_histogram"]["IFCWALL"] == 2
+    assert client.get(f"/api/files/{listing['Annex.ifcxml']['id']}/metadata", headers=auth).status_code == 404
+
+    # Replacing the content with something that is not STEP drops the stale row
+    assert client.post("/files/upload", headers=auth, files={"file": ("Tower.ifc", io.BytesIO(b"garbage"), "application/octet-stream")}).status_code == 200
+    db_session.expire_all()
+    assert db_session.query(IfcMetadata).filter(IfcMetadata.file_id == listing["Tower.ifc"]["id"]).first() is None
+    assert client.request("DELETE", "/api/files", headers=auth, json={"filenames": ["Annex.ifc"]}).status_code == 200
+    assert db_session.query(IfcMetadata).filter(IfcMetadata.file_id == listing["Annex.ifc"]["id"]).first() is None
+
+
+def test_invalidation_bus_evicts_local_and_remote_keys(monkeypatch):
+    import json
+    from app.cache import invalidation
+    from app.cache.invalidation import InvalidationBus
+
+    class FakeRedis:
+        def publish(self, channel, message):
+            published.append((channel, json.loads(message)["keys"]))
+
+    published = []
+    monkeypatch.setattr(invalidation.redis_client, "call", lambda command: command(FakeRedis()))
+    bus = InvalidationBus("test:invalidate")
+    evicted = []
+    bus.register("user", evicted.append)
+
+    # Our own subscription is down: still published for the other workers, short TTL for new entries
+    assert bus.publish("user", ["id:1"]) is True
+    assert evicted == [["id:1"]] and published == [("test:invalidate", ["id:1"])]
+    assert bus.ttl(600) < 600
+
+    # Messages from other workers are applied, our own echoes are skipped
+    bus._on_message(json.dumps({"origin": "other", "ns": "user", "keys": ["email:a@b.c"]}))
+    bus._on_message(json.dumps({"origin": bus.origin, "ns": "user", "keys": ["id:1"]}))
+    assert evicted == [["id:1"], ["email:a@b.c"]]
+
+    bus._listening.set()
+    assert bus.ttl(600) == 600
+    bus.flush()
+    assert evicted[-1] is None
+
+
+def test_user_snapshot_loaded_across_an_invalidation_is_not_cached(db_session, create_user):
+    from app.auth import auth
+    from app.auth.auth import AuthService
+
+    user = create_user("generation@test.com", "secret123", admin=False)
+    auth._user_cache.clear()
+
+    class RacingSession:
+        """Commits an invalidation while the row is being read, like a concurrent password change."""
+
+        def query(self, model):
+            query = db_session.query(model)
+            first = query.filter
+
+            def _filter(*criteria):
+                result = first(*criteria)
+                row = result.first()
+                AuthService.invalidate_user(user.id)
+                return types.SimpleNamespace(first=lambda: row)
+
+            query.filter = _filter
+            return query
+
+    assert AuthService.get_user_by_id(RacingSession(), user.id).email == "generation@test.com"
+    assert auth._user_cache.get(("id", user.id)) is None
+    # Without an invalidation in between the snapshot is cached as usual
+    AuthService.get_user_by_id(db_session, user.id)
+    assert auth._user_cache.get(("id", user.id)) is not None
+
+
+def test_redis_circuit_breaker_skips_calls_while_open(monkeypatch):
+    import redis
+    from app.cache.redis_client import CircuitBreaker, RedisClient
+
+    client = RedisClient()
+    client.breaker = CircuitBreaker(threshold=2, reset_sec=60, max_reset_sec=60)
+    calls = []
+
+    def failing_get(key):
+        calls.append(key)
+        raise redis.ConnectionError("refused")
+
+    monkeypatch.setattr(client.redis_client, "get", failing_get)
+    monkeypatch.setattr(client.redis_client, "ping", lambda: (_ for _ in ()).throw(AssertionError("no PING on cache calls")))
+
+    assert client.get("a") is None
+    assert client.get("b") is None
+    assert not client.available()
+    # Circuit open: no more round trips until the backoff elapses
+    assert client.get("c") is None
+    assert calls == ["a", "b"]
+
+    client.breaker._open_until = 0  # backoff elapsed -> one trial call
+    monkeypatch.setattr(client.redis_client, "get", lambda key: '{"ok": 1}')
+    assert client.get("d") == {"ok": 1}
+    assert client.available()
+
+
+def test_async_cache_pipelines_multi_key_operations(monkeypatch):
+    import asyncio
+    from app.cache.async_cache import AsyncCacheService
+    from app.cache.redis_client import CircuitBreaker
+
+    store, round_trips = {}, []
+
+    class FakePipeline:
+        def __init__(self):
+            self.ops = []
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        def set(self, key, value, ex=None):
+            self.ops.append((key, value))
+
+        async def execute(self):
+            round_trips.append("pipeline")
+            store.update(self.ops)
+            return [True] * len(self.ops)
+
+    class FakeRedis:
+        def pipeline(self, transaction=True):
+            return FakePipeline()
+
+        async def mget(self, keys):
+            round_trips.append("mget")
+            return [store.get(k) for k in keys]
+
+    cache = AsyncCacheService()
+    cache.breaker = CircuitBreaker(threshold=3, reset_sec=1, max_reset_sec=1)
+    monkeypatch.setattr(cache, "_redis", lambda: FakeRedis())
+
+    async def scenario():
+        await cache.mset({"user:id:1": {"id": 1}, "files:list:1": [{"id": 7}]}, expire=60)
+        return await cache.mget(["user:id:1", "files:list:1", "user:id:2"])
+
+    assert asyncio.run(scenario()) == [{"id": 1}, [{"id": 7}], None]
+    assert round_trips == ["pipeline", "mget"]
+
+
+def test_cache_service_retries_redis_after_breaker_backoff(monkeypatch):
+    import redis
+    from app.cache import cache_service
+    from app.cache.redis_client import CircuitBreaker, RedisClient
+
+    client = RedisClient()
+    client.breaker = CircuitBreaker(threshold=2, reset_sec=60, max_reset_sec=60)
+    monkeypatch.setattr(cache_service, "redis_client", client)
+    calls = []
+
+    def failing_get(key):
+        calls.append(key)
+        raise redis.ConnectionError("refused")
+
+    monkeypatch.setattr(client.redis_client, "get", failing_get)
+    cache = cache_service.CacheService()
+    for key in ("a", "b", "c"):
+        assert cache.get(key) is None
+    assert calls == ["a", "b"]
+
+    client.breaker._open_until = 0  # backoff elapsed
+    monkeypatch.setattr(client.redis_client, "get", lambda key: '{"ok": 1}')
+    assert cache.get("d") == {"ok": 1}
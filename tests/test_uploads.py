@@ -0,0 +1,175 @@
+import hashlib
+
+from app.storage.service import get_storage_service
+
+
+def _multipart_storage(objects):
+    class MultipartStorage:
+        uploads = {}
+
+        def create_multipart(self, object_name, content_type):
+            upload_id = f"mp-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = {}
+            return upload_id
+
+        def upload_part(self, object_name, upload_id, part_number, data, content_md5=None):
+            self.uploads[upload_id][part_number] = data
+            return hashlib.md5(data).hexdigest()
+
+        def complete_multipart(self, object_name, upload_id, parts):
+            stored = self.uploads.pop(upload_id)
+            objects[object_name] = b"".join(stored[number] for number, _ in parts)
+            return True
+
+        def abort_multipart(self, object_name, upload_id):
+            return self.uploads.pop(upload_id, None) is not None
+
+        def promote_blob(self, staging_name):
+            data = objects.pop(staging_name)
+            sha = hashlib.sha256(data).hexdigest()
+            objects[f"blobs/{sha}"] = data
+            return sha
+
+        def promote_staged(self, staging_name, object_name):
+            objects[object_name] = objects.pop(staging_name)
+            return True
+
+        def backup_object(self, object_name):
+            if object_name not in objects:
+                return True, None
+            backup_name = f"staging/backup-{len(objects)}"
+            objects[backup_name] = objects[object_name]
+            return True, backup_name
+
+        def restore_object(self, object_name, backup_name):
+            if backup_name is None:
+                objects.pop(object_name, None)
+            else:
+                objects[object_name] = objects.pop(backup_name)
+            return True
+
+        def settle_blobs(self):
+            return True
+
+        def drop_staged_blobs(self):
+            pass
+
+        def delete_object(self, object_name):
+            return objects.pop(object_name, None) is not None
+
+        def delete_objects(self, object_names):
+            return [name for name in object_names if objects.pop(name, None) is None]
+
+    return MultipartStorage
+
+
+def _login(client, create_user, email):
+    create_user(email, "secret123", admin=False)
+    csrf = client.get("/login").cookies.get("csrf_token")
+    r = client.post("/auth/login", json={"email": email, "password": "secret123"}, headers={"X-CSRF-Token": csrf})
+    return {"Authorization": f"Bearer {r.json().get('access_token')}"}
+
+
+def test_resumable_upload_resumes_from_acknowledged_offset(client, db_session, monkeypatch, create_user):
+    import main as app_main
+    from app.api import uploads
+    from app.models.file import File as FileModel
+
+    objects = {}
+    monkeypatch.setattr(uploads, "UPLOAD_PART_SIZE", 4)
+    app_main.app.dependency_overrides[get_storage_service] = _multipart_storage(objects)
+    auth = _login(client, create_user, "resume@test.com")
+
+    payload = b"ISO-10303-21;"
+    r = client.post("/api/uploads", json={"filename": "Site Model.ifc", "size": len(payload)}, headers=auth)
+    assert r.status_code == 200
+    upload_id = r.json()["data"]["upload_id"]
+    assert r.json()["data"]["part_size"] == 4
+
+    # Part 2 arrives first; the resume offset only counts the contiguous prefix
+    assert client.put(f"/api/uploads/{upload_id}/parts/2", content=payload[4:8], headers=auth).status_code == 200
+    r = client.put(f"/api/uploads/{upload_id}/parts/1", content=payload[:4], headers=auth)
+    assert r.json()["data"]["offset"] == 8
+
+    # A corrupted part is rejected by its checksum and can be re-sent
+    bad = client.put(f"/api/uploads/{upload_id}/parts/3", content=b"XXXX", headers={**auth, "X-Checksum-SHA256": hashlib.sha256(payload[8:12]).hexdigest()})
+    assert bad.status_code == 400
+    assert client.put(f"/api/uploads/{upload_id}/parts/3", content=b"x" * 5, headers=auth).status_code == 413
+    assert client.put(f"/api/uploads/{upload_id}/parts/3", content=payload[8:12], headers={**auth, "X-Checksum-SHA256": hashlib.sha256(payload[8:12]).hexdigest()}).status_code == 200
+
+    # Incomplete upload cannot be finalized yet
+    assert client.post(f"/api/uploads/{upload_id}/complete", headers=auth).status_code == 409
+    assert client.put(f"/api/uploads/{upload_id}/parts/4", content=payload[12:], headers=auth).status_code == 200
+    state = client.get(f"/api/uploads/{upload_id}", headers=auth).json()["data"]
+    assert state["offset"] == len(payload) and [p["part_number"] for p in state["parts"]] == [1, 2, 3, 4]
+
+    r = client.post(f"/api/uploads/{upload_id}/complete", headers=auth)
+    assert r.status_code == 200
+    assert r.json()["data"] == {"filename": "Site_Model.ifc", "size": len(payload)}
+    sha = hashlib.sha256(payload).hexdigest()
+    assert objects == {f"blobs/{sha}": payload}
+    record = db_session.query(FileModel).filter(FileModel.filename == "Site_Model.ifc").first()
+    assert record.blob_sha256 == sha and record.file_size == len(payload)
+    assert client.put(f"/api/uploads/{upload_id}/parts/1", content=b"ISO-", headers=auth).status_code == 409
+
+
+def test_resumable_upload_validates_type_and_quota(client, db_session, monkeypatch, create_user):
+    import main as app_main
+    from app.api import uploads
+    from app.models.user import User
+
+    objects = {}
+    storage_cls = _multipart_storage(objects)
+    monkeypatch.setattr(uploads, "UPLOAD_PART_SIZE", 4)
+    app_main.app.dependency_overrides[get_storage_service] = storage_cls
+    auth = _login(client, create_user, "resumequota@test.com")
+
+    assert client.post("/api/uploads", json={"filename": "notes.txt"}, headers=auth).status_code == 400
+
+    upload_id = client.post("/api/uploads", json={"filename": "Big.ifc"}, headers=auth).json()["data"]["upload_id"]
+    for number in (1, 2):
+        assert client.put(f"/api/uploads/{upload_id}/parts/{number}", content=b"abcd", headers=auth).status_code == 200
+
+    # Quota shrinks while the upload is in flight: completion is refused and the session aborted
+    db_session.query(User).filter(User.email == "resumequota@test.com").update({User.storage_quota: 6})
+    db_session.commit()
+    r = client.post(f"/api/uploads/{upload_id}/complete", headers=auth)
+    assert r.status_code == 413
+    assert client.get(f"/api/uploads/{upload_id}", headers=auth).json()["data"]["status"] == "aborted"
+    assert storage_cls.uploads == {} and objects == {}
+
+
+def test_resumable_upload_without_dedup_replaces_user_object_only_on_commit(client, db_session, monkeypatch, create_user):
+    import main as app_main
+    from app.api import uploads
+    from app.models.file import File as FileModel
+    from app.models.user import User
+
+    objects = {}
+    monkeypatch.setattr(uploads, "UPLOAD_PART_SIZE", 4)
+    monkeypatch.setattr(uploads.settings, "STORAGE_DEDUP_ENABLED", False)
+    app_main.app.dependency_overrides[get_storage_service] = _multipart_storage(objects)
+    auth = _login(client, create_user, "resumelegacy@test.com")
+    user = db_session.query(User).filter(User.email == "resumelegacy@test.com").first()
+
+    def upload(payload):
+        upload_id = client.post("/api/uploads", json={"filename": "Keep.ifc"}, headers=auth).json()["data"]["upload_id"]
+        for number, start in enumerate(range(0, len(payload), 4), start=1):
+            assert client.put(f"/api/uploads/{upload_id}/parts/{number}", content=payload[start:start + 4], headers=auth).status_code == 200
+        return client.post(f"/api/uploads/{upload_id}/complete", headers=auth)
+
+    assert upload(b"old!").status_code == 200
+    assert objects == {f"user_{user.id}/Keep.ifc": b"old!"}
+
+    # The reservation fails after the parts were assembled: the live object is untouched
+    monkeypatch.setattr(uploads, "reserve_used_storage", lambda db, user_id, delta: False)
+    assert upload(b"new content!").status_code == 413
+    assert objects == {f"user_{user.id}/Keep.ifc": b"old!"}
+
+    monkeypatch.undo()
+    monkeypatch.setattr(uploads, "UPLOAD_PART_SIZE", 4)
+    monkeypatch.setattr(uploads.settings, "STORAGE_DEDUP_ENABLED", False)
+    assert upload(b"new content!").status_code == 200
+    assert objects == {f"user_{user.id}/Keep.ifc": b"new content!"}
+    db_session.expire_all()
+    assert db_session.query(FileModel).filter(FileModel.user_id == user.id).one().file_size == 12